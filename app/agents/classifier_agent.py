@@ -1,46 +1,146 @@
 from crewai import Agent, Task, Crew
 from langchain.tools import BaseTool
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Optional
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
 import logging
+import os
 import re
 
-logger = logging.getLogger(__name__)
+from app.schemas import OpportunityClassification
+from app.core.tokens import count_tokens
+from app.core.cache import get_cache
 
+logger = logging.getLogger(__name__)
 
-# 🔹 Tool 1: Classificação de texto
-class TextClassifierTool(BaseTool):
-    name = "text_classifier"
-    description = "Classifica texto por categoria e tipo"
 
-    def _run(self, text: str) -> str:
-        text_lower = text.lower()
+CATEGORY_KEYWORDS = {
+    'Inteligência Artificial': ['ia', 'artificial intelligence', 'machine learning', 'deep learning', 'ai'],
+    'Saúde': ['saúde', 'health', 'medicina', 'medical', 'biotecnologia', 'biotech'],
+    'Energia': ['energia', 'energy', 'sustentabilidade', 'renewable', 'solar', 'eólica'],
+    'Fintech': ['fintech', 'financeiro', 'financial', 'blockchain', 'crypto'],
+    'Agtech': ['agtech', 'agricultura', 'agriculture', 'agronegócio', 'farming'],
+    'Educação': ['educação', 'education', 'edtech', 'ensino', 'learning'],
+    'Mobilidade': ['mobilidade', 'mobility', 'transporte', 'transport', 'logística'],
+    'Indústria 4.0': ['indústria', 'industry', 'manufatura', 'iot', 'automação']
+}
+
+TYPE_KEYWORDS = {
+    'edital': ['edital', 'chamada pública', 'concurso', 'seleção pública'],
+    'bolsa': ['bolsa', 'scholarship', 'fellowship', 'auxílio'],
+    'investimento': ['investimento', 'investment', 'funding', 'capital', 'venture']
+}
+
+CONFIDENCE_THRESHOLD = float(os.getenv("CLASSIFIER_CONFIDENCE_THRESHOLD", "0.5"))
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "3000"))
+LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", "20"))
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "4"))
+LLM_DESCRIPTION_CHARS = 1000
+
+
+class KeywordClassifier:
+    """Deterministic classifier over CATEGORY_KEYWORDS and TYPE_KEYWORDS.
+
+    All keywords are compiled into a single alternation, so one scan of the
+    text scores every category and type at once. Confidence combines how much
+    the best category leads the runner-up with how many hits support it.
+    """
+
+    def __init__(
+        self,
+        categories: Dict[str, List[str]] = CATEGORY_KEYWORDS,
+        types: Dict[str, List[str]] = TYPE_KEYWORDS
+    ):
+        self.categories = list(categories)
+        self.types = list(types)
+        self.labels: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        for group, table in (('category', categories), ('type', types)):
+            for label, keywords in table.items():
+                for kw in keywords:
+                    self.labels[kw.lower()].append((group, label))
+
+        # Mais longas primeiro para "machine learning" vencer "learning"
+        alternation = '|'.join(re.escape(kw) for kw in sorted(self.labels, key=len, reverse=True))
+        self.pattern = re.compile(rf'\b(?:{alternation})\b')
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        scores = {'category': Counter(), 'type': Counter()}
+        matched = []
+        for match in self.pattern.finditer(text.lower()):
+            keyword = match.group(0)
+            if keyword not in matched:
+                matched.append(keyword)
+            for group, label in self.labels[keyword]:
+                scores[group][label] += 1
+
+        category, category_confidence = self._best(scores['category'], 'Geral')
+        opp_type, type_confidence = self._best(scores['type'], 'edital')
 
-        categories = {
-            'Inteligência Artificial': ['ia', 'artificial intelligence', 'machine learning', 'deep learning', 'ai'],
-            'Saúde': ['saúde', 'health', 'medicina', 'medical', 'biotecnologia', 'biotech'],
-            'Energia': ['energia', 'energy', 'sustentabilidade', 'renewable', 'solar', 'eólica'],
-            'Fintech': ['fintech', 'financeiro', 'financial', 'blockchain', 'crypto'],
-            'Agtech': ['agtech', 'agricultura', 'agriculture', 'agronegócio', 'farming'],
-            'Educação': ['educação', 'education', 'edtech', 'ensino', 'learning'],
-            'Mobilidade': ['mobilidade', 'mobility', 'transporte', 'transport', 'logística'],
-            'Indústria 4.0': ['indústria', 'industry', 'manufatura', 'iot', 'automação']
+        return {
+            "category": category,
+            "type": opp_type,
+            "keywords": matched[:5],
+            "relevance": 70.0 if matched else 50.0,
+            "confidence": category_confidence,
+            "type_confidence": type_confidence
         }
 
-        types = {
-            'edital': ['edital', 'chamada pública', 'concurso', 'seleção pública'],
-            'bolsa': ['bolsa', 'scholarship', 'fellowship', 'auxílio'],
-            'investimento': ['investimento', 'investment', 'funding', 'capital', 'venture']
-        }
+    @staticmethod
+    def _best(scores: Counter, default: str) -> Tuple[str, float]:
+        ranked = scores.most_common(2)
+        if not ranked:
+            return default, 0.0
+        best = ranked[0][1]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0
+        margin = (best - runner_up) / best
+        support = min(1.0, best / 2)
+        return ranked[0][0], round(margin * support, 3)
+
+
+keyword_classifier = KeywordClassifier()
+
+# Muda sempre que as regras de classificação mudam, invalidando o cache
+CLASSIFIER_VERSION = "1-" + hashlib.sha256(
+    json.dumps([CATEGORY_KEYWORDS, TYPE_KEYWORDS, CONFIDENCE_THRESHOLD], sort_keys=True).encode()
+).hexdigest()[:8]
+
+CLASSIFICATION_CACHE_TTL = int(os.getenv("CLASSIFICATION_CACHE_TTL", str(30 * 24 * 3600)))
+CLASSIFICATION_CACHE_SIZE = int(os.getenv("CLASSIFICATION_CACHE_SIZE", str(256 * 1024 * 1024)))
+
+
+class ClassificationCache:
+    """Persistent classification results keyed by normalized content and classifier version."""
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else get_cache(
+            "classifications",
+            size_limit=CLASSIFICATION_CACHE_SIZE,
+            eviction_policy="least-recently-used"
+        )
 
-        # Categoria
-        category_scores = {cat: sum(1 for kw in kws if kw in text_lower) for cat, kws in categories.items()}
-        best_category = max(category_scores, key=category_scores.get) if any(category_scores.values()) else "Geral"
+    @staticmethod
+    def key(opp: Dict[str, Any]) -> str:
+        text = f"{opp.get('title') or ''}\n{opp.get('description') or ''}"
+        normalized = ' '.join(text.lower().split())
+        return hashlib.sha256(f"{CLASSIFIER_VERSION}\n{normalized}".encode()).hexdigest()
 
-        # Tipo
-        type_scores = {tp: sum(1 for kw in kws if kw in text_lower) for tp, kws in types.items()}
-        best_type = max(type_scores, key=type_scores.get) if any(type_scores.values()) else "edital"
+    def get(self, opp: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.cache.get(self.key(opp))
 
-        return f"Categoria: {best_category}, Tipo: {best_type}"
+    def set(self, opp: Dict[str, Any], classification: Dict[str, Any]) -> None:
+        self.cache.set(self.key(opp), classification, expire=CLASSIFICATION_CACHE_TTL)
+
+
+# 🔹 Tool 1: Classificação de texto
+class TextClassifierTool(BaseTool):
+    name = "text_classifier"
+    description = "Classifica texto por categoria e tipo"
+
+    def _run(self, text: str) -> str:
+        result = keyword_classifier.classify(text)
+        return f"Categoria: {result['category']}, Tipo: {result['type']}"
 
     async def _arun(self, text: str) -> str:
         raise NotImplementedError("Execução assíncrona não implementada.")
@@ -77,7 +177,13 @@ class KeywordExtractorTool(BaseTool):
 # 🔹 ClassifierAgent usando BaseTool
 class ClassifierAgent:
     def __init__(self):
-        self.agent = Agent(
+        self.agent = self._build_agent()
+        self.cache = ClassificationCache()
+        self.last_run_stats: Dict[str, Any] = {}
+
+    @staticmethod
+    def _build_agent() -> Agent:
+        return Agent(
             role="Classificador de Oportunidades",
             goal="Classificar oportunidades por categoria, tipo e relevância",
             backstory=(
@@ -93,84 +199,148 @@ class ClassifierAgent:
     def classify_opportunities(self, opportunities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         logger.info(f"Starting classification of {len(opportunities)} opportunities...")
 
-        classified_opportunities = []
+        classifications: List[Optional[Dict[str, Any]]] = []
+        escalated: List[int] = []
+        hits = 0
+
+        for i, opp in enumerate(opportunities):
+            cached = self.cache.get(opp)
+            if cached is not None:
+                hits += 1
+                classifications.append(cached)
+                continue
+
+            text_content = f"{opp.get('title', '')} {opp.get('description', '')}"
+            classification = keyword_classifier.classify(text_content)
+            classifications.append(classification)
+
+            # Só os casos ambíguos vão para o LLM
+            if classification["confidence"] < CONFIDENCE_THRESHOLD:
+                escalated.append(i)
+            else:
+                self.cache.set(opp, classification)
+
+        if escalated:
+            llm_results = self._classify_with_llm([opportunities[i] for i in escalated])
+            for i, result in zip(escalated, llm_results):
+                if result is not None:
+                    classifications[i] = result
+                    self.cache.set(opportunities[i], result)
+
+        self.last_run_stats = {
+            "cache_hits": hits,
+            "cache_misses": len(opportunities) - hits,
+            "cache_hit_rate": hits / len(opportunities) if opportunities else 0.0,
+            "escalated": len(escalated)
+        }
 
-        for opp in opportunities:
-            try:
-                text_content = f"{opp.get('title', '')} {opp.get('description', '')}"
-
-                task = Task(
-                    description=f"""
-                    Analise o seguinte conteúdo e classifique a oportunidade:
-
-                    Título: {opp.get('title', '')}
-                    Descrição: {opp.get('description', '')}
-
-                    Determine:
-                    1. Categoria principal (área de conhecimento)
-                    2. Tipo de oportunidade (edital, bolsa, investimento)
-                    3. Palavras-chave relevantes
-                    4. Nível de relevância (1-10)
-
-                    Forneça uma classificação estruturada.
-                    """,
-                    agent=self.agent
-                )
-
-                crew = Crew(
-                    agents=[self.agent],
-                    tasks=[task],
-                    verbose=False
-                )
-
-                result = crew.kickoff()
-
-                classification = self._parse_classification_result(str(result))
-
-                classified_opp = opp.copy()
-                classified_opp.update({
-                    "category": classification.get("category", "Geral"),
-                    "type": classification.get("type", "edital"),
-                    "tags": classification.get("keywords", []),
-                    "relevance_score": classification.get("relevance", 50.0)
-                })
-
-                classified_opportunities.append(classified_opp)
-
-            except Exception as e:
-                logger.error(f"Failed to classify opportunity {opp.get('title', '')}: {e}")
-                classified_opp = opp.copy()
-                classified_opp.update({
-                    "category": "Geral",
-                    "type": "edital",
-                    "tags": [],
-                    "relevance_score": 50.0
-                })
-                classified_opportunities.append(classified_opp)
-
-        logger.info(f"Classification completed for {len(classified_opportunities)} opportunities")
+        classified_opportunities = []
+        for opp, classification in zip(opportunities, classifications):
+            classified_opp = opp.copy()
+            classified_opp.update({
+                "category": classification.get("category", "Geral"),
+                "type": classification.get("type", "edital"),
+                "tags": classification.get("keywords", []),
+                "relevance_score": classification.get("relevance", 50.0)
+            })
+            classified_opportunities.append(classified_opp)
+
+        logger.info(
+            f"Classification completed for {len(classified_opportunities)} opportunities "
+            f"({hits} from cache, {len(escalated)} escalated to the LLM)"
+        )
         return classified_opportunities
 
-    def _parse_classification_result(self, result: str) -> Dict[str, Any]:
-        result_lower = result.lower()
-
-        categories = [
-            'Inteligência Artificial', 'Saúde', 'Energia', 'Fintech',
-            'Agtech', 'Educação', 'Mobilidade', 'Indústria 4.0'
-        ]
-        category = next((c for c in categories if c.lower() in result_lower), "Geral")
-
-        types = ["edital", "bolsa", "investimento"]
-        opp_type = next((t for t in types if t in result_lower), "edital")
+    def _pack_batches(self, opportunities: List[Dict[str, Any]]) -> List[List[Tuple[int, str]]]:
+        """Group rendered opportunities into batches that fit the prompt token budget."""
+        batches: List[List[Tuple[int, str]]] = []
+        current: List[Tuple[int, str]] = []
+        current_tokens = 0
+
+        for i, opp in enumerate(opportunities):
+            rendered = (
+                f"[{i}] Título: {opp.get('title', '')}\n"
+                f"Descrição: {(opp.get('description') or '')[:LLM_DESCRIPTION_CHARS]}"
+            )
+            tokens = count_tokens(rendered)
+            if current and (current_tokens + tokens > LLM_BATCH_TOKEN_BUDGET or len(current) >= LLM_BATCH_MAX_ITEMS):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append((i, rendered))
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _classify_with_llm(self, opportunities: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Classify opportunities with one prompt per batch, several batches at a time.
+
+        Returns one result per opportunity, in order; None where the LLM never
+        produced a valid answer, so the caller keeps its fallback.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(opportunities)
+        batches = self._pack_batches(opportunities)
+
+        with ThreadPoolExecutor(max_workers=LLM_BATCH_CONCURRENCY) as executor:
+            for batch_results in executor.map(self._classify_batch, batches):
+                for i, result in batch_results.items():
+                    results[i] = result
+
+        logger.info(f"LLM classified {len(opportunities)} opportunities in {len(batches)} batches")
+        return results
+
+    def _classify_batch(self, batch: List[Tuple[int, str]]) -> Dict[int, Dict[str, Any]]:
+        try:
+            return self._run_batch(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Failed to classify opportunity {batch[0][0]}: {e}")
+                return {}
+            # Resposta inválida: divide o lote e tenta as metades
+            logger.warning(f"Malformed LLM batch of {len(batch)} ({e}), splitting")
+            middle = len(batch) // 2
+            return {**self._classify_batch(batch[:middle]), **self._classify_batch(batch[middle:])}
+
+    def _run_batch(self, batch: List[Tuple[int, str]]) -> Dict[int, Dict[str, Any]]:
+        items = "\n\n".join(rendered for _, rendered in batch)
+        # Lotes rodam em paralelo e o Agent do CrewAI guarda estado da tarefa: um por lote
+        agent = self._build_agent()
+        task = Task(
+            description=f"""
+            Classifique cada oportunidade de financiamento abaixo:
+
+            {items}
+
+            Categorias possíveis: {', '.join(CATEGORY_KEYWORDS)} ou Geral.
+            Tipos possíveis: {', '.join(TYPE_KEYWORDS)}.
+
+            Responda somente com um array JSON, um objeto por oportunidade, no formato
+            {{"index": <número entre colchetes>, "category": "...", "type": "...",
+              "keywords": ["..."], "relevance": <0-100>}}
+            """,
+            expected_output="Array JSON com uma classificação por oportunidade",
+            agent=agent
+        )
+        crew = Crew(agents=[agent], tasks=[task], verbose=False)
+        raw = str(crew.kickoff())
 
-        keywords = [kw for kw in ["ia", "saúde", "energia", "fintech", "agtech", "educação", "mobilidade", "indústria"]
-                    if kw in result_lower]
+        match = re.search(r'\[.*\]', raw, re.DOTALL)
+        if not match:
+            raise ValueError("no JSON array in response")
+        parsed = [OpportunityClassification(**item) for item in json.loads(match.group(0))]
 
-        relevance = 70.0 if keywords else 50.0
+        expected = {i for i, _ in batch}
+        by_index = {item.index: item for item in parsed if item.index in expected}
+        if set(by_index) != expected:
+            raise ValueError(f"expected {len(expected)} classifications, got {len(by_index)}")
 
         return {
-            "category": category,
-            "type": opp_type,
-            "keywords": keywords[:5],
-            "relevance": relevance
+            i: {
+                "category": item.category if item.category in CATEGORY_KEYWORDS else "Geral",
+                "type": item.type if item.type in TYPE_KEYWORDS else "edital",
+                "keywords": item.keywords[:5],
+                "relevance": min(100.0, max(0.0, item.relevance))
+            }
+            for i, item in by_index.items()
         }
@@ -1,43 +1,74 @@
-from crewai import Agent
+from crewai import Agent, Task, Crew
 from crewai.tools import BaseTool
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import asyncio
+import hashlib
+import json
 import logging
+import os
 from datetime import datetime, timedelta
 import re
 
+from app.core.crawler import AsyncCrawler, run_sync
+from app.core.http_cache import http_cache, REVALIDATED
+from app.core.html_extract import listing_text, page_text
+from app.agents.source_extractors import get_extractor
+
 logger = logging.getLogger(__name__)
 
-# ---------- TOOLS ----------
+FAST_MODE = os.getenv("SCRAPER_FAST_MODE", "true").lower() == "true"
 
-class WebScraperTool(BaseTool):
-    name: str = "web_scraper"
-    description: str = "Extrai informações de páginas web e retorna texto limpo"
+OPPORTUNITY_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in [
+        r'edital\s+n[º°]?\s*(\d+/\d+)',
+        r'chamada\s+pública\s+n[º°]?\s*(\d+/\d+)',
+        r'bolsa\s+de\s+(\w+)',
+        r'financiamento\s+de\s+até\s+r\$\s*([\d.,]+)',
+        r'prazo\s+até\s+(\d{1,2}/\d{1,2}/\d{4})',
+    ]
+]
 
-    def _run(self, url: str) -> str:
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
 
-            soup = BeautifulSoup(response.content, 'html.parser')
+def html_to_text(content: bytes, fast: bool = FAST_MODE) -> str:
+    """Fast mode keeps only the listing containers, without the length cutoff."""
+    if fast:
+        text = listing_text(content)
+        if text:
+            return text
+    return page_text(content)
 
-            # Remove script e style
-            for script in soup(["script", "style"]):
-                script.decompose()
 
-            text = soup.get_text()
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
+# ---------- TOOLS ----------
 
-            return text[:5000]  # limita tamanho
-        except Exception as e:
-            logger.error(f"Failed to scrape {url}: {e}")
-            return f"Erro ao acessar {url}: {str(e)}"
+class WebScraperTool(BaseTool):
+    name: str = "web_scraper"
+    description: str = "Extrai informações de páginas web e retorna texto limpo (aceita várias URLs separadas por vírgula)"
+    fast_mode: bool = FAST_MODE
+
+    def _run(self, url: str) -> str:
+        urls = [u.strip() for u in url.split(',') if u.strip()]
+        pages = run_sync(AsyncCrawler(cache=http_cache).fetch_urls(urls))
+        # 304 de uma página já gravada pela coleta, mas cujo texto nunca foi
+        # guardado: o corpo não veio, então baixa de novo sem validadores
+        stale = [i for i, page in enumerate(pages) if page['cache_status'] == REVALIDATED and page['parsed'] is None]
+        if stale:
+            refetched = run_sync(AsyncCrawler().fetch_urls([pages[i]['url'] for i in stale]))
+            for i, page in zip(stale, refetched):
+                pages[i] = page
+
+        texts = []
+        for page in pages:
+            if page['error']:
+                texts.append(f"Erro ao acessar {page['url']}: {page['error']}")
+            elif not page['changed'] and page['parsed'] is not None:
+                # 304 ou corpo idêntico: reaproveita o texto já extraído
+                texts.append(page['parsed'])
+            else:
+                text = html_to_text(page['content'], self.fast_mode)
+                http_cache.store_parsed(page['url'], text)
+                texts.append(text)
+        return '\n\n'.join(texts)
 
 
 class ContentParserTool(BaseTool):
@@ -47,16 +78,8 @@ class ContentParserTool(BaseTool):
     def _run(self, content: str) -> str:
         try:
             opportunities = []
-            patterns = [
-                r'edital\s+n[º°]?\s*(\d+/\d+)',
-                r'chamada\s+pública\s+n[º°]?\s*(\d+/\d+)',
-                r'bolsa\s+de\s+(\w+)',
-                r'financiamento\s+de\s+até\s+r\$\s*([\d.,]+)',
-                r'prazo\s+até\s+(\d{1,2}/\d{1,2}/\d{4})',
-            ]
-
-            for pattern in patterns:
-                matches = re.findall(pattern, content, re.IGNORECASE)
+            for pattern in OPPORTUNITY_PATTERNS:
+                matches = pattern.findall(content)
                 if matches:
                     opportunities.extend(matches)
 
@@ -69,8 +92,12 @@ class ContentParserTool(BaseTool):
 # ---------- AGENTE PRINCIPAL ----------
 
 class CollectorAgent:
-    def __init__(self):
-        self.sources = {
+    def __init__(self, sources: Optional[Dict[str, str]] = None, crawler: Optional[AsyncCrawler] = None):
+        self.crawler = crawler or AsyncCrawler(cache=http_cache)
+        self.last_crawl_report: Dict[str, Dict[str, Any]] = {}
+        # Páginas extraídas na última coleta, confirmadas no cache só depois de persistidas
+        self.extracted_urls: List[str] = []
+        self.sources = sources or {
             "finep": "https://www.finep.gov.br/chamadas-publicas",
             "cnpq": "https://www.gov.br/cnpq/pt-br/acesso-a-informacao/acoes-e-programas/programas",
             "fapesp": "https://fapesp.br/oportunidades/",
@@ -88,33 +115,112 @@ class CollectorAgent:
             tools=[WebScraperTool(), ContentParserTool()]  # agora só BaseTool
         )
 
-    def collect_opportunities(self) -> List[Dict[str, Any]]:
+    async def acollect_opportunities(self) -> List[Dict[str, Any]]:
+        """Crawl all sources concurrently and extract their opportunities."""
         try:
-            url = "https://api.exemplo.com/oportunidades"
-            response = requests.get(url, timeout=10)
-
-            if response.status_code == 200:
-                data = response.json()
-                opportunities = [
-                    {
-                        "id": item["id"],
-                        "title": item.get("title", ""),
-                        "category": item.get("category", ""),
-                        "type": item.get("type", ""),
-                        "region": item.get("region", ""),
-                        "amount": item.get("amount", ""),
-                        "source": "API Exemplo"
-                    }
-                    for item in data.get("results", [])
-                ]
-                return opportunities
-            else:
-                logger.error(f"Erro ao coletar oportunidades: {response.status_code}")
-                return []
+            pages = await self.crawler.crawl(self.sources)
+            self.last_crawl_report = {
+                name: {
+                    'status_code': page['status_code'],
+                    'cache_status': page['cache_status'],
+                    'elapsed': round(page['elapsed'], 3),
+                    'error': page['error']
+                }
+                for name, page in pages.items()
+            }
+
+            # Páginas sem mudança (304 ou mesmo hash) só são puladas se a coleta anterior foi confirmada
+            pending = [
+                page for page in pages.values()
+                if not page['error'] and (page['changed'] or not page.get('processed'))
+            ]
+            extractions = [asyncio.to_thread(self._extract_opportunities, page['name'], page) for page in pending]
+            opportunities = []
+            self.extracted_urls = []
+            for page, extracted in zip(pending, await asyncio.gather(*extractions)):
+                if extracted is None:
+                    continue
+                opportunities.extend(extracted)
+                self.extracted_urls.append(page['url'])
+
+            logger.info(f"Coletadas {len(opportunities)} oportunidades de {len(extractions)}/{len(pages)} fontes")
+            return opportunities
         except Exception as e:
             logger.error(f"Falha na coleta de oportunidades: {e}")
             return []
 
+    def collect_opportunities(self) -> List[Dict[str, Any]]:
+        return run_sync(self.acollect_opportunities())
+
+    def mark_collected(self) -> None:
+        """Record in the HTTP cache that the last collected pages were stored."""
+        for url in self.extracted_urls:
+            http_cache.mark_processed(url)
+        self.extracted_urls = []
+
+    def _extract_opportunities(self, name: str, page: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Opportunities found on the page, or None when extraction failed."""
+        extractor = get_extractor(name)
+        if extractor is None:
+            return self._extract_with_agent(name, page)
+
+        try:
+            items = extractor(page['content'], page['url'])
+            return [
+                {**item, 'source': name.upper(), 'collected_at': datetime.now()}
+                for item in items
+            ]
+        except Exception as e:
+            logger.error(f"Falha no extrator de {name}: {e}")
+            return None
+
+    def _extract_with_agent(self, name: str, page: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        try:
+            text = html_to_text(page['content'])
+
+            task = Task(
+                description=f"""
+                Identifique os editais, bolsas e chamadas de financiamento no conteúdo abaixo,
+                extraído de {page['url']}:
+
+                {text}
+
+                Responda apenas com uma lista JSON de objetos com os campos
+                title, description, deadline (DD/MM/AAAA), amount e source_url.
+                """,
+                expected_output="Lista JSON de oportunidades",
+                agent=self.agent
+            )
+            crew = Crew(agents=[self.agent], tasks=[task], verbose=False)
+            result = str(crew.kickoff())
+
+            match = re.search(r'\[.*\]', result, re.DOTALL)
+            items = json.loads(match.group(0)) if match else []
+            return [self._normalize_item(name, page['url'], item) for item in items if item.get('title')]
+        except Exception as e:
+            logger.error(f"Falha ao extrair oportunidades de {name}: {e}")
+            return None
+
+    def _normalize_item(self, name: str, url: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        title = item['title'].strip()
+        deadline = None
+        if item.get('deadline'):
+            try:
+                deadline = datetime.strptime(item['deadline'], '%d/%m/%Y')
+            except ValueError:
+                pass
+
+        return {
+            'external_id': item.get('external_id') or f"{name}_{hashlib.sha1(title.encode()).hexdigest()[:12]}",
+            'title': title,
+            'description': item.get('description', ''),
+            'deadline': deadline,
+            'amount': item.get('amount', ''),
+            'source': name.upper(),
+            'source_url': item.get('source_url') or url,
+            'collected_at': datetime.now()
+        }
+
     def get_mock_opportunities(self) -> List[Dict[str, Any]]:
         return [
             {
@@ -124,7 +230,7 @@ class CollectorAgent:
                 'category': 'Inteligência Artificial',
                 'type': 'edital',
                 'region': 'Brasil',
-                'deadline': datetime.now() + timedelta(days=45),
+                'deadline': datetime.utcnow() + timedelta(days=45),
                 'amount': 'R$ 500.000',
                 'source': 'FINEP',
                 'source_url': self.sources["finep"],
@@ -138,7 +244,7 @@ class CollectorAgent:
                 'category': 'Saúde',
                 'type': 'bolsa',
                 'region': 'Brasil',
-                'deadline': datetime.now() + timedelta(days=30),
+                'deadline': datetime.utcnow() + timedelta(days=30),
                 'amount': 'R$ 3.000/mês',
                 'source': 'CNPq',
                 'source_url': self.sources["cnpq"],
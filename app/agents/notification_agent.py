@@ -6,6 +6,7 @@ from datetime import datetime
 import os
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
+from app.core.amounts import amount_in_brl
 
 logger = logging.getLogger(__name__)
 
@@ -210,13 +211,20 @@ class NotificationAgent:
         filtered = []
         user_categories = user.get('preferred_categories', [])
         user_regions = user.get('preferred_regions', [])
-        min_amount = user.get('min_amount', '0')
+        min_amount = user.get('min_amount_brl')
+        if min_amount is None:
+            min_amount = amount_in_brl(user.get('min_amount'))
 
         for opp in opportunities:
             if user_categories and opp.get('category') not in user_categories:
                 continue
             if user_regions and opp.get('region') not in user_regions:
                 continue
+            if min_amount:
+                # Valor desconhecido não exclui a oportunidade
+                amount = opp['amount_brl'] if 'amount_brl' in opp else amount_in_brl(opp.get('amount'))
+                if amount is not None and amount < min_amount:
+                    continue
             if opp.get('relevance_score', 0) < 60:
                 continue
             filtered.append(opp)
@@ -1,10 +1,11 @@
 from typing import List, Dict, Any, Optional
 import logging
-import re
 from datetime import datetime
 from langchain.tools import BaseTool
 
 from app.core.langchain_rag import rag_system
+from app.core.ranking_engine import RankingEngine, ranking_engine
+from app.core.amounts import amount_in_brl
 
 logger = logging.getLogger(__name__)
 
@@ -52,8 +53,9 @@ class ProfileMatcherTool(BaseTool):
             except:
                 pass
 
-            min_amount = profile.get('valor mínimo', '0')
-            if min_amount and min_amount != '0':
+            min_amount = amount_in_brl(profile.get('valor mínimo'))
+            opp_amount = amount_in_brl(opportunity.get('valor'))
+            if min_amount and (opp_amount is None or opp_amount >= min_amount):
                 score += 15
 
             return f"Score de compatibilidade: {score}/{max_score} ({score/max_score*100:.1f}%)"
@@ -111,9 +113,10 @@ class RelevanceScorerTool(BaseTool):
 
 
 class RankingAgent:
-    def __init__(self):
+    def __init__(self, engine: Optional[RankingEngine] = None):
         self.profile_matcher = ProfileMatcherTool()
         self.relevance_scorer = RelevanceScorerTool()
+        self.engine = engine or ranking_engine
 
     def rank_opportunities(
         self,
@@ -127,94 +130,61 @@ class RankingAgent:
                 opp['relevance_score'] = opp.get('relevance_score', 50.0)
             return sorted(opportunities, key=lambda x: x['relevance_score'], reverse=True)
 
-        ranked_opportunities = []
-        for opp in opportunities:
-            try:
-                profile_text = f"""
-                PERFIL:
-                Segmento: {user_profile.get('startup_segment', '')}
-                TRL: {user_profile.get('startup_trl', '')}
-                Área: {user_profile.get('startup_area', '')}
-                Regiões Preferidas: {', '.join(user_profile.get('preferred_regions', []))}
-                Categorias: {', '.join(user_profile.get('preferred_categories', []))}
-                Valor Mínimo: {user_profile.get('min_amount', '')}
-
-                OPORTUNIDADE:
-                Título: {opp.get('title', '')}
-                Categoria: {opp.get('category', '')}
-                Tipo: {opp.get('type', '')}
-                Região: {opp.get('region', '')}
-                Valor: {opp.get('amount', '')}
-                Fonte: {opp.get('source', '')}
-                """
-
-                profile_result = self.profile_matcher.run(profile_text)
-                relevance_result = self.relevance_scorer.run(profile_text)
-
-                score = self._parse_ranking_result(profile_result + " " + relevance_result)
-
-                ranked_opp = opp.copy()
-                ranked_opp['relevance_score'] = score
-                ranked_opp['ranking_details'] = {
-                    "profile_match": profile_result,
-                    "relevance_score": relevance_result,
-                }
-
-                ranked_opportunities.append(ranked_opp)
-
-            except Exception as e:
-                logger.error(f"Failed to rank opportunity {opp.get('title', '')}: {e}")
-                ranked_opp = opp.copy()
-                ranked_opp['relevance_score'] = 50.0
-                ranked_opportunities.append(ranked_opp)
-
-        ranked_opportunities.sort(key=lambda x: x['relevance_score'], reverse=True)
+        try:
+            ranked_opportunities = self.engine.rank(opportunities, user_profile)
+        except Exception as e:
+            logger.error(f"Failed to rank opportunities: {e}")
+            ranked_opportunities = [{**opp, 'relevance_score': 50.0} for opp in opportunities]
+
         logger.info(f"Ranking completed for {len(ranked_opportunities)} opportunities")
         return ranked_opportunities
 
-    def _parse_ranking_result(self, result: str) -> float:
-        try:
-            patterns = [
-                r'score[:\s]+(\d+)(?:/100)?',
-                r'(\d+)\s*pontos',
-                r'(\d+)%',
-                r'relevância[:\s]+(\d+)'
-            ]
-            for pattern in patterns:
-                match = re.search(pattern, result.lower())
-                if match:
-                    score = float(match.group(1))
-                    if score > 100:
-                        score = score / 10
-                    return min(100.0, max(0.0, score))
-            return 50.0
-        except Exception as e:
-            logger.error(f"Failed to parse ranking result: {e}")
-            return 50.0
+    @staticmethod
+    def _blend_semantic(opportunities: List[Dict[str, Any]], similarities: Dict[int, float]) -> List[Dict[str, Any]]:
+        # Cosseno em [0, 1] vira 0-100 e pesa 60% contra o score já calculado
+        for opp in opportunities:
+            similarity = similarities.get(opp.get('id'))
+            if similarity is not None:
+                existing_score = opp.get('relevance_score', 50.0)
+                opp['relevance_score'] = (max(0.0, similarity) * 100 * 0.6) + (existing_score * 0.4)
+
+        opportunities.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
+        return opportunities
 
     def semantic_ranking(
         self,
         query: str,
         opportunities: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
-        if not rag_system.enabled:
+        """Blend each opportunity's cosine similarity to the query into its score.
+
+        Only the candidates are scored, against their stored vectors; the
+        index is not searched.
+        """
+        if not rag_system.enabled or not opportunities:
             return opportunities
         try:
-            results = rag_system.semantic_search(query, top_k=len(opportunities))
-            semantic_scores = {
-                result.get('metadata', {}).get('opportunity_id'): (len(results) - i) / len(results) * 100
-                for i, result in enumerate(results)
-            }
-
-            for opp in opportunities:
-                opp_id = opp.get('id')
-                if opp_id in semantic_scores:
-                    existing_score = opp.get('relevance_score', 50.0)
-                    semantic_score = semantic_scores[opp_id]
-                    opp['relevance_score'] = (semantic_score * 0.6) + (existing_score * 0.4)
+            embedding = rag_system.create_query_embedding(query)
+            similarities = rag_system.similarity_scores(embedding, [opp.get('id') for opp in opportunities])
+            return self._blend_semantic(opportunities, similarities)
+        except Exception as e:
+            logger.error(f"Failed to perform semantic ranking: {e}")
+            return opportunities
 
-            opportunities.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
+    def profile_ranking(
+        self,
+        user_profile: Dict[str, Any],
+        opportunities: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Like semantic_ranking, but against the (cached) embedding of the user's profile."""
+        if not rag_system.enabled or not opportunities:
             return opportunities
+        try:
+            embedding = rag_system.profile_embedding(user_profile)
+            if embedding is None:
+                return opportunities
+            similarities = rag_system.similarity_scores(embedding, [opp.get('id') for opp in opportunities])
+            return self._blend_semantic(opportunities, similarities)
         except Exception as e:
-            logger.error(f"Failed to perform semantic ranking: {e}")
+            logger.error(f"Failed to perform profile ranking: {e}")
             return opportunities
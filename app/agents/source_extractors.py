@@ -0,0 +1,149 @@
+from bs4 import BeautifulSoup
+from typing import List, Dict, Any, Optional, Callable
+from urllib.parse import urljoin
+from datetime import datetime
+import hashlib
+import logging
+import re
+
+from app.core.html_extract import best_parser
+
+logger = logging.getLogger(__name__)
+
+Extractor = Callable[[bytes, str], List[Dict[str, Any]]]
+
+# Extratores determinísticos por fonte (chave = nome em CollectorAgent.sources)
+EXTRACTORS: Dict[str, Extractor] = {}
+
+DATE_PATTERN = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})')
+# Escalas mais longas primeiro, senão "milhões" vira "mil"
+AMOUNT_PATTERN = re.compile(r'(?:R\$|US\$|€|\$)\s*[\d.,]+(?:\s*(?:bilhões|bilhão|milhões|milhão|mil)\b)?(?:\s*/\s*mês)?', re.IGNORECASE)
+CALL_NUMBER_PATTERN = re.compile(r'n[º°o.]*\s*(\d+/\d{4})', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+PDF_LINK_SELECTOR = 'a[href$=".pdf"], a[href*=".pdf?"], a[href$=".PDF"]'
+
+
+def register_extractor(source_name: str):
+    """Register a structured extractor for a collector source."""
+    def decorator(func: Extractor) -> Extractor:
+        EXTRACTORS[source_name] = func
+        return func
+    return decorator
+
+
+def get_extractor(source_name: str) -> Optional[Extractor]:
+    return EXTRACTORS.get(source_name)
+
+
+def _clean(text: str) -> str:
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def _parse_deadline(text: str) -> Optional[datetime]:
+    # Usa a última data do bloco: listagens costumam trazer "de X até Y"
+    matches = DATE_PATTERN.findall(text)
+    for day, month, year in reversed(matches):
+        try:
+            return datetime(int(year), int(month), int(day))
+        except ValueError:
+            continue
+    return None
+
+
+def _external_id(source: str, title: str, url: str) -> str:
+    # O número da chamada se repete entre programas e cards sem link caem todos na URL
+    # da listagem, então a chave sempre inclui o título e a URL do card
+    digest = hashlib.sha1(f"{url}\n{title}".encode()).hexdigest()
+    number = CALL_NUMBER_PATTERN.search(title)
+    if number:
+        return f"{source}_{number.group(1).replace('/', '_')}_{digest[:8]}"
+    return f"{source}_{digest[:12]}"
+
+
+def _extract_cards(
+    source: str,
+    content: bytes,
+    base_url: str,
+    card_selector: str,
+    title_selector: str,
+    description_selector: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    soup = BeautifulSoup(content, best_parser())
+    opportunities = []
+    seen = set()
+
+    for card in soup.select(card_selector):
+        link = card.select_one(title_selector)
+        if link is None:
+            continue
+
+        title = _clean(link.get_text(' '))
+        if not title:
+            continue
+
+        source_url = urljoin(base_url, link.get('href') or base_url)
+        card_text = _clean(card.get_text(' '))
+        external_id = _external_id(source, title, source_url)
+        if external_id in seen:
+            continue
+        seen.add(external_id)
+
+        description = ''
+        if description_selector:
+            node = card.select_one(description_selector)
+            description = _clean(node.get_text(' ')) if node else ''
+
+        amount = AMOUNT_PATTERN.search(card_text)
+        pdf_link = card.select_one(PDF_LINK_SELECTOR)
+        opportunities.append({
+            'external_id': external_id,
+            'title': title,
+            'description': description,
+            'deadline': _parse_deadline(card_text),
+            'amount': amount.group(0) if amount else '',
+            'source_url': source_url,
+            'pdf_url': urljoin(base_url, pdf_link['href']) if pdf_link else None
+        })
+
+    return opportunities
+
+
+@register_extractor("finep")
+def extract_finep(content: bytes, base_url: str) -> List[Dict[str, Any]]:
+    return _extract_cards(
+        "finep", content, base_url,
+        card_selector="div.item, table.chamadas tr",
+        title_selector="h3 a, td a",
+        description_selector="p, div.descricao"
+    )
+
+
+@register_extractor("cnpq")
+def extract_cnpq(content: bytes, base_url: str) -> List[Dict[str, Any]]:
+    return _extract_cards(
+        "cnpq", content, base_url,
+        card_selector="article.tileItem, div.tileItem",
+        title_selector="h2.tileHeadline a, .tileHeadline a",
+        description_selector="p.tileBody, .description"
+    )
+
+
+@register_extractor("fapesp")
+def extract_fapesp(content: bytes, base_url: str) -> List[Dict[str, Any]]:
+    return _extract_cards(
+        "fapesp", content, base_url,
+        card_selector="div.oportunidades li, ul.list-oportunidades li",
+        title_selector="a",
+        description_selector="span, p"
+    )
+
+
+@register_extractor("capes")
+def extract_capes(content: bytes, base_url: str) -> List[Dict[str, Any]]:
+    return _extract_cards(
+        "capes", content, base_url,
+        card_selector="article.tileItem, div.tileItem",
+        title_selector="h2.tileHeadline a, .tileHeadline a",
+        description_selector="p.tileBody, .description"
+    )
@@ -0,0 +1,119 @@
+from typing import Dict, Any, Optional
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Reais por unidade de cada moeda; sobrescreva com FX_RATES='{"USD": 5.4}'
+DEFAULT_FX_RATES = {"BRL": 1.0, "USD": 5.0, "EUR": 5.5, "GBP": 6.3}
+
+CURRENCY_PATTERNS = [
+    ("USD", re.compile(r"US\$|U\$|\bUSD\b|d[óo]lar(?:es)?|dollars?", re.IGNORECASE)),
+    ("BRL", re.compile(r"R\$|\bBRL\b|\breais\b|\breal\b", re.IGNORECASE)),
+    ("EUR", re.compile(r"€|\bEUR\b|euros?", re.IGNORECASE)),
+    ("GBP", re.compile(r"£|\bGBP\b|libras?|pounds?", re.IGNORECASE)),
+    ("USD", re.compile(r"\$")),
+]
+PERIODICITY_PATTERNS = [
+    ("monthly", re.compile(r"/\s*m[êe]s|por m[êe]s|mensa(?:l|is)|/\s*month|per month|monthly", re.IGNORECASE)),
+    ("yearly", re.compile(r"/\s*ano|por ano|anua(?:l|is)|/\s*year|per year|yearly|annual", re.IGNORECASE)),
+]
+AMOUNT_PATTERN = re.compile(
+    r"(?<![\w/])(\d+(?:[.,]\d+)*)\s*"
+    r"(bilh(?:ão|ões|ao|oes)|billions?|bi\b|milh(?:ão|ões|ao|oes)|millions?|mi\b|mil\b|thousands?|k\b)?",
+    re.IGNORECASE
+)
+# Prefixos mais longos primeiro: "mil" não pode casar com "milhão"/"million"
+SCALES = [("bi", 1e9), ("milh", 1e6), ("million", 1e6), ("mil", 1e3), ("mi", 1e6), ("thousand", 1e3), ("k", 1e3)]
+# amount_brl compara valores recorrentes pelo que pagam em um ano; "total" fica como está
+PERIODS_PER_YEAR = {"monthly": 12, "yearly": 1, "total": 1}
+
+
+def load_fx_rates() -> Dict[str, float]:
+    """DEFAULT_FX_RATES overridden by the FX_RATES env var (JSON object)."""
+    rates = dict(DEFAULT_FX_RATES)
+    raw = os.getenv("FX_RATES")
+    if raw:
+        try:
+            rates.update({currency.upper(): float(rate) for currency, rate in json.loads(raw).items()})
+        except (ValueError, AttributeError) as e:
+            logger.error(f"Invalid FX_RATES, using defaults: {e}")
+    return rates
+
+
+FX_RATES = load_fx_rates()
+
+
+def _number(digits: str) -> float:
+    """Numbers written as 500.000, 2.000.000,50, 1,5, 1.5 or 1,000,000.
+
+    The last separator is decimal unless it is followed by exactly three
+    digits and every other group is also three digits long.
+    """
+    groups = re.split(r"[.,]", digits)
+    if len(groups) == 1:
+        return float(digits)
+
+    separators = re.findall(r"[.,]", digits)
+    thousands = len(groups[-1]) == 3 and all(len(g) == 3 for g in groups[1:-1]) and len(set(separators)) == 1
+    if thousands:
+        return float("".join(groups))
+    return float("".join(groups[:-1]) + "." + groups[-1])
+
+
+def _scale(word: Optional[str]) -> float:
+    if not word:
+        return 1.0
+    word = word.lower()
+    for prefix, factor in SCALES:
+        if word.startswith(prefix):
+            return factor
+    return 1.0
+
+
+def parse_amount(text: Optional[str], fx_rates: Optional[Dict[str, float]] = None) -> Optional[Dict[str, Any]]:
+    """Parse a free-text amount ("R$ 3.000/mês", "€ 2 milhões") into numbers.
+
+    Returns ``{"amount", "currency", "amount_brl", "periodicity"}`` for the
+    largest value mentioned (ranges are usually "até X"), or None when the
+    text has no number or its currency has no FX rate. Text without a
+    currency is taken as BRL; periodicity is "monthly", "yearly" or "total".
+    ``amount`` is the value as written; ``amount_brl`` is annualized
+    (R$ 3.000/mês -> 36.000), so recurring and total amounts, and a
+    minimum written either way, are compared on the same basis.
+    """
+    if not text:
+        return None
+
+    values = [_number(match.group(1)) * _scale(match.group(2)) for match in AMOUNT_PATTERN.finditer(text)]
+    if not values:
+        return None
+
+    currency = next((code for code, pattern in CURRENCY_PATTERNS if pattern.search(text)), "BRL")
+    rate = (fx_rates or FX_RATES).get(currency)
+    if rate is None:
+        return None
+
+    amount = max(values)
+    periodicity = next((name for name, pattern in PERIODICITY_PATTERNS if pattern.search(text)), "total")
+    amount_brl = amount * rate * PERIODS_PER_YEAR[periodicity]
+    return {"amount": amount, "currency": currency, "amount_brl": amount_brl, "periodicity": periodicity}
+
+
+def amount_columns(text: Optional[str]) -> Dict[str, Any]:
+    """Values of Opportunity.amount_brl / amount_currency / amount_periodicity for ``text``."""
+    parsed = parse_amount(text)
+    if parsed is None:
+        return {"amount_brl": None, "amount_currency": None, "amount_periodicity": None}
+    return {
+        "amount_brl": parsed["amount_brl"],
+        "amount_currency": parsed["currency"],
+        "amount_periodicity": parsed["periodicity"],
+    }
+
+
+def amount_in_brl(text: Optional[str]) -> Optional[float]:
+    parsed = parse_amount(text)
+    return parsed["amount_brl"] if parsed else None
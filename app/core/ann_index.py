@@ -0,0 +1,166 @@
+import numpy as np
+from typing import Optional
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50_000
+ASSIGN_CHUNK = 8192
+
+
+class IVFIndex:
+    """Inverted-file (cluster-based) candidate generator for LocalVectorIndex.
+
+    Vectors are assigned to the nearest of ``nlist`` spherical k-means
+    centroids. A query only scores the rows of its ``nprobe`` closest
+    clusters, so ``nprobe`` trades recall for latency. Rows are assigned on
+    upsert and removed on delete; the centroids are retrained when the index
+    has grown well beyond the size they were trained on.
+
+    The row -> list assignments live in a memory-mapped ``.npy`` file, so an
+    upsert or delete only writes the entries it changed; the centroids are
+    written once per training. The lists themselves are kept as one array
+    of rows grouped by list plus offsets, rebuilt on the first query after
+    a change.
+    """
+
+    def __init__(self, path: str, nlist: int = 0, nprobe: int = 8, min_train_size: int = 4096):
+        self.dir = path
+        self.path = os.path.join(path, "ivf.npz")
+        self.nlist_setting = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+
+        self.centroids: Optional[np.ndarray] = None
+        self.assign = np.full(0, -1, dtype=np.int32)
+        self.trained_size = 0
+        self.generation = 0
+        self._list_rows = np.zeros(0, dtype=np.int64)
+        self._list_offsets = np.zeros(1, dtype=np.int64)
+        self._lists_dirty = True
+        self._load()
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _assign_path(self, generation: int) -> str:
+        return os.path.join(self.dir, f"ivf_assign.{generation}.npy")
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        data = np.load(self.path)
+        generation = int(data["generation"]) if "generation" in data else 0
+        if not os.path.exists(self._assign_path(generation)):
+            logger.warning("IVF assignments are missing; the index will be retrained")
+            return
+        self.centroids = data["centroids"]
+        self.trained_size = int(data["trained_size"])
+        self.generation = generation
+        self.assign = np.load(self._assign_path(generation), mmap_mode="r+")
+
+    def save(self) -> None:
+        """Flush the assignments changed since the last call."""
+        if self.trained:
+            self.assign.flush()
+
+    def _write_assign(self, assign: np.ndarray, generation: int) -> np.memmap:
+        tmp_path = self._assign_path(generation) + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.int32, shape=assign.shape)
+        grown[:] = assign
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self._assign_path(generation))
+        return np.load(self._assign_path(generation), mmap_mode="r+")
+
+    def _ensure_capacity(self, capacity: int) -> None:
+        if capacity <= self.assign.size:
+            return
+        size = max(capacity, 2 * self.assign.size)
+        assign = np.full(size, -1, dtype=np.int32)
+        assign[:self.assign.size] = self.assign
+        self.assign = self._write_assign(assign, self.generation) if self.trained else assign
+
+    def _nearest(self, vectors: np.ndarray) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_CHUNK):
+            block = np.asarray(vectors[start:start + ASSIGN_CHUNK], dtype=np.float32)
+            labels[start:start + ASSIGN_CHUNK] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def train(self, matrix: np.ndarray, rows: np.ndarray) -> None:
+        """Spherical k-means over (a sample of) the active rows, then reassign all of them."""
+        rng = np.random.default_rng(0)
+        nlist = self.nlist_setting or max(1, int(np.sqrt(len(rows))))
+        sample = rows if len(rows) <= KMEANS_SAMPLE else rng.choice(rows, KMEANS_SAMPLE, replace=False)
+        data = np.asarray(matrix[np.sort(sample)], dtype=np.float32)
+
+        self.centroids = data[rng.choice(len(data), min(nlist, len(data)), replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            labels = self._nearest(data)
+            for c in range(len(self.centroids)):
+                members = data[labels == c]
+                # Cluster vazio recebe um ponto aleatório
+                centroid = members.sum(axis=0) if len(members) else data[rng.integers(len(data))]
+                norm = np.linalg.norm(centroid)
+                self.centroids[c] = centroid / norm if norm else centroid
+
+        assign = np.full(max(matrix.shape[0], self.assign.size), -1, dtype=np.int32)
+        assign[rows] = self._nearest(matrix[rows])
+
+        # Assinalamentos novos em um arquivo novo, depois os centróides que apontam
+        # para ele: uma queda no meio deixa o par antigo inteiro
+        old_generation = self.generation if os.path.exists(self.path) else None
+        self.generation += 1
+        self.assign = self._write_assign(assign, self.generation)
+        self.trained_size = len(rows)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, trained_size=self.trained_size, generation=self.generation)
+        os.replace(tmp_path, self.path)
+        if old_generation is not None and os.path.exists(self._assign_path(old_generation)):
+            os.remove(self._assign_path(old_generation))
+        self._lists_dirty = True
+        logger.info(f"Trained IVF index with {len(self.centroids)} lists over {len(rows)} vectors")
+
+    def needs_training(self, active_count: int) -> bool:
+        if not self.trained:
+            return active_count >= self.min_train_size
+        return active_count > 4 * self.trained_size
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        if not self.trained or len(rows) == 0:
+            return
+        self._ensure_capacity(int(rows.max()) + 1)
+        self.assign[rows] = self._nearest(vectors)
+        self._lists_dirty = True
+
+    def remove(self, rows: np.ndarray) -> None:
+        if not self.trained:
+            return
+        rows = rows[rows < self.assign.size]
+        self.assign[rows] = -1
+        self._lists_dirty = True
+
+    def _rebuild_lists(self) -> None:
+        """Rows grouped by list (ascending within each) and where each list starts."""
+        assigned = np.flatnonzero(self.assign >= 0)
+        labels = self.assign[assigned]
+        self._list_rows = assigned[np.argsort(labels, kind="stable")]
+        counts = np.bincount(labels, minlength=len(self.centroids))
+        self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._lists_dirty = False
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        if self._lists_dirty:
+            self._rebuild_lists()
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        scores = self.centroids @ query
+        probes = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        rows = np.concatenate([
+            self._list_rows[self._list_offsets[c]:self._list_offsets[c + 1]] for c in probes
+        ])
+        rows.sort()
+        return rows
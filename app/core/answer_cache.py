@@ -0,0 +1,87 @@
+from typing import List, Optional, Sequence, Iterable, Any
+import hashlib
+import os
+import threading
+
+from app.core.cache import get_cache
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", str(256 * 1024 * 1024)))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+
+
+class AnswerCache:
+    """Generated answers keyed by (model, normalized query, ordered context opportunity ids).
+
+    A second cache maps each opportunity id to the answer keys whose context
+    included it, so an answer is dropped as soon as any of its opportunities
+    changes. That index is never evicted by size; it is pruned of expired
+    answers whenever an entry is rewritten. Ids are normalized with
+    ``_id_key``, so the float ids Pinecone returns in metadata (5.0) match
+    the integer ids used on invalidation (5).
+    """
+
+    def __init__(self, cache=None, index=None):
+        self.cache = cache if cache is not None else get_cache(
+            "answers",
+            size_limit=ANSWER_CACHE_SIZE,
+            eviction_policy="least-recently-used"
+        )
+        self.index = index if index is not None else get_cache("answer_index", eviction_policy="none")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    @staticmethod
+    def _id_key(opportunity_id: Any) -> str:
+        # Metadados numéricos do Pinecone voltam como float: 5.0 e 5 são a mesma oportunidade
+        try:
+            return str(int(float(opportunity_id)))
+        except (TypeError, ValueError):
+            return str(opportunity_id)
+
+    @classmethod
+    def key(cls, model: str, query: str, opportunity_ids: Sequence[Any]) -> str:
+        normalized = " ".join(query.lower().split())
+        ids = ",".join(cls._id_key(i) for i in opportunity_ids)
+        return hashlib.sha256(f"{model}\n{normalized}\n{ids}".encode()).hexdigest()
+
+    def get(self, model: str, query: str, opportunity_ids: Sequence[Any]) -> Optional[str]:
+        answer = self.cache.get(self.key(model, query, opportunity_ids))
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return answer
+
+    def set(self, model: str, query: str, opportunity_ids: Sequence[Any], answer: str) -> None:
+        key = self.key(model, query, opportunity_ids)
+        self.cache.set(key, answer, expire=ANSWER_CACHE_TTL)
+        with self.index.transact():
+            for opportunity_id in {self._id_key(i) for i in opportunity_ids if i is not None}:
+                keys = [k for k in self.index.get(opportunity_id, []) if k != key and k in self.cache]
+                self.index.set(opportunity_id, keys + [key])
+
+    def invalidate(self, opportunity_ids: Iterable[Any]) -> int:
+        """Drop every cached answer whose context included one of these opportunities."""
+        removed = 0
+        with self.index.transact():
+            keys: List[str] = []
+            for opportunity_id in opportunity_ids:
+                keys.extend(self.index.pop(self._id_key(opportunity_id), default=[]))
+        for key in set(keys):
+            removed += bool(self.cache.delete(key))
+        with self._lock:
+            self.invalidated += removed
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "invalidated": self.invalidated
+            }
@@ -0,0 +1,245 @@
+import numpy as np
+from typing import List, Dict, Any, Optional, Iterable
+from collections import Counter, defaultdict
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Termos do título contam como se aparecessem TITLE_WEIGHT vezes
+TITLE_WEIGHT = 2
+# Constante da reciprocal rank fusion (valor usual da literatura)
+RRF_K = 60
+
+# Mantém números de chamada como "04/2024" em um único termo
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:/[a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a o as os de da do das dos e em no na nos nas para por com um uma que ao aos "
+    "se sua seu suas seus ou the of and for to in".split()
+)
+
+# Campos do metadata devolvido, os mesmos dos vetores em RAGSystem.process_documents
+METADATA_FIELDS = ["title", "category", "type", "region", "amount", "source"]
+
+
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [token for token in TOKEN_PATTERN.findall(text) if token not in STOPWORDS]
+
+
+def _matches(metadata: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    """Equality / $eq / $in / $ne / $nin subset of the Pinecone filter syntax."""
+    for key, condition in filters.items():
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op == "$eq" and value != operand:
+                return False
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$nin" and value in operand:
+                return False
+    return True
+
+
+def reciprocal_rank_fusion(
+    result_lists: Iterable[List[Dict[str, Any]]],
+    key: str = "opportunity_id",
+    k: int = RRF_K
+) -> List[Dict[str, Any]]:
+    """Merge ranked result lists by sum of 1 / (k + rank).
+
+    Results are matched on ``metadata[key]``; the first list a result appears
+    in provides its metadata. Each fused result carries ``score`` (the RRF
+    score) and ``sources`` (the index of every list it came from).
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for list_index, results in enumerate(result_lists):
+        for rank, result in enumerate(results, start=1):
+            doc_key = result.get("metadata", {}).get(key)
+            if doc_key is None:
+                continue
+            entry = fused.setdefault(doc_key, {**result, "score": 0.0, "sources": []})
+            entry["score"] += 1.0 / (k + rank)
+            entry["sources"].append(list_index)
+
+    return sorted(fused.values(), key=lambda r: r["score"], reverse=True)
+
+
+class BM25Index:
+    """In-process BM25 inverted index over opportunity title, description and tags.
+
+    Documents are keyed by opportunity id and can be added, replaced or
+    removed one at a time, so the collection pipeline keeps the index current
+    without rebuilding it. Each document gets a dense slot; the postings of a
+    term are turned into (slots, term frequencies) arrays the first time a
+    query needs them after a change, so scoring is vectorized even for terms
+    that appear in every document. Search results have the same shape as
+    vector query results ({id, score, metadata}) so both can be fused.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.loaded = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_terms: Dict[int, Counter] = {}
+        self.metadata: Dict[int, Dict[str, Any]] = {}
+        self.slots: Dict[int, int] = {}
+        self.slot_docs: List[Optional[int]] = []
+        self.free_slots: List[int] = []
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.total_len = 0
+        self._arrays: Dict[str, tuple] = {}
+        self._norms: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    @staticmethod
+    def _terms(opp: Dict[str, Any]) -> Counter:
+        terms = Counter()
+        for _ in range(TITLE_WEIGHT):
+            terms.update(tokenize(opp.get("title") or ""))
+        terms.update(tokenize(opp.get("description") or ""))
+        terms.update(tokenize(" ".join(opp.get("tags") or [])))
+        return terms
+
+    def _remove(self, doc_id: int) -> None:
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            self._arrays.pop(term, None)
+            if not postings:
+                del self.postings[term]
+
+        slot = self.slots.pop(doc_id)
+        self.total_len -= int(self.doc_len[slot])
+        self.doc_len[slot] = 0
+        self.slot_docs[slot] = None
+        self.free_slots.append(slot)
+        self.metadata.pop(doc_id, None)
+        self._norms = None
+
+    def _add(self, doc_id: int, opp: Dict[str, Any]) -> None:
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            slot = len(self.slot_docs)
+            self.slot_docs.append(None)
+            if slot >= self.doc_len.size:
+                self.doc_len = np.concatenate([self.doc_len, np.zeros(max(1024, slot), dtype=np.float32)])
+
+        terms = self._terms(opp)
+        for term, tf in terms.items():
+            self.postings[term][doc_id] = tf
+            self._arrays.pop(term, None)
+
+        self.slots[doc_id] = slot
+        self.slot_docs[slot] = doc_id
+        self.doc_terms[doc_id] = terms
+        self.doc_len[slot] = sum(terms.values())
+        self.total_len += int(self.doc_len[slot])
+        self.metadata[doc_id] = {
+            **{field: opp.get(field) or "" for field in METADATA_FIELDS},
+            "opportunity_id": doc_id
+        }
+        self._norms = None
+
+    def add_documents(self, opportunities: List[Dict[str, Any]]) -> None:
+        """Index (or re-index) opportunities that have an ``id``; inactive ones are removed."""
+        with self._lock:
+            for opp in opportunities:
+                doc_id = opp.get("id")
+                if doc_id is None:
+                    continue
+                self._remove(doc_id)
+                if opp.get("is_active", True):
+                    self._add(doc_id, opp)
+
+    def remove_documents(self, doc_ids: Iterable[int]) -> None:
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+
+    def load_from_db(self, db) -> int:
+        """Rebuild the index from the active opportunities in the database."""
+        from app.models import Opportunity
+
+        rows = db.query(Opportunity).filter(Opportunity.is_active == True).all()
+        with self._lock:
+            self._reset()
+            self.add_documents([
+                {column: getattr(row, column) for column in ["id", "description", "tags", *METADATA_FIELDS]}
+                for row in rows
+            ])
+            self.loaded = True
+        logger.info(f"BM25 index built with {len(self)} opportunities")
+        return len(self)
+
+    def _term_arrays(self, term: str) -> tuple:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self.postings[term]
+            slots = np.fromiter((self.slots[d] for d in postings), dtype=np.int64, count=len(postings))
+            tfs = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            arrays = self._arrays[term] = (slots, tfs)
+        return arrays
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            terms = {term for term in tokenize(query) if term in self.postings}
+            if not terms or not self.slots:
+                return []
+
+            n_docs = len(self.slots)
+            if self._norms is None:
+                avg_len = self.total_len / n_docs
+                self._norms = self.k1 * (1 - self.b + self.b * self.doc_len / avg_len)
+
+            scores = np.zeros(self.doc_len.size, dtype=np.float32)
+            for term in terms:
+                slots, tfs = self._term_arrays(term)
+                idf = math.log(1 + (n_docs - len(slots) + 0.5) / (len(slots) + 0.5))
+                scores[slots] += idf * tfs * (self.k1 + 1) / (tfs + self._norms[slots])
+
+            matched = np.flatnonzero(scores)
+            if not filters and matched.size > top_k:
+                matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+            ordered = matched[np.argsort(-scores[matched], kind="stable")]
+
+            results = []
+            for slot in ordered:
+                doc_id = self.slot_docs[slot]
+                if filters and not _matches(self.metadata[doc_id], filters):
+                    continue
+                results.append({"id": f"opp_{doc_id}", "score": float(scores[slot]), "metadata": self.metadata[doc_id]})
+                if len(results) == top_k:
+                    break
+            return results
+
+
+# Global instance
+bm25_index = BM25Index()
@@ -0,0 +1,12 @@
+from diskcache import Cache
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_DIR = os.getenv("CACHE_DIR", "./.cache")
+
+
+def get_cache(name: str, **settings) -> Cache:
+    """Open (or create) a named persistent cache under CACHE_DIR."""
+    return Cache(os.path.join(CACHE_DIR, name), **settings)
@@ -0,0 +1,193 @@
+import httpx
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import os
+import random
+import time
+
+from app.core.http_cache import HttpCache, MISS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# Falhas transitórias que valem nova tentativa
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def run_sync(coro):
+    """Run a coroutine from sync code, even when an event loop is already running."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+class AsyncCrawler:
+    """Fetches many pages concurrently over one pooled HTTP client.
+
+    Requests are limited per host, each one has its own timeout and the whole
+    crawl has a total deadline; transient failures are retried with
+    exponential backoff. With a cache, requests are conditional and each
+    result carries its cache status and whether the body changed.
+    """
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        per_host_limit: Optional[int] = None,
+        request_timeout: Optional[float] = None,
+        total_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: float = 0.5,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        headers: Optional[Dict[str, str]] = None,
+        cache: Optional[HttpCache] = None
+    ):
+        self.max_connections = max_connections or int(os.getenv("CRAWLER_MAX_CONNECTIONS", "20"))
+        self.per_host_limit = per_host_limit or int(os.getenv("CRAWLER_PER_HOST_LIMIT", "2"))
+        self.request_timeout = request_timeout or float(os.getenv("CRAWLER_REQUEST_TIMEOUT", "15"))
+        self.total_timeout = total_timeout or float(os.getenv("CRAWLER_TOTAL_TIMEOUT", "60"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("CRAWLER_MAX_RETRIES", "3"))
+        self.backoff_base = backoff_base
+        self.transport = transport
+        self.headers = headers or DEFAULT_HEADERS
+        self.cache = cache
+
+    def client(self) -> httpx.AsyncClient:
+        """A new pooled client with the crawler's headers, timeouts, limits and transport.
+
+        Callers own it and should use it as ``async with crawler.client() as client``.
+        """
+        return httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(self.request_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ),
+            follow_redirects=True,
+            transport=self.transport
+        )
+
+    async def _fetch(
+        self,
+        client: httpx.AsyncClient,
+        host_limits: Dict[str, asyncio.Semaphore],
+        name: str,
+        url: str
+    ) -> Dict[str, Any]:
+        result = {
+            'name': name,
+            'url': url,
+            'status_code': None,
+            'content': b'',
+            'headers': {},
+            'error': None,
+            'attempts': 0,
+            'elapsed': 0.0,
+            'cache_status': None,
+            'changed': True,
+            'parsed': None,
+            'processed': False
+        }
+        request_headers = self.cache.conditional_headers(url) if self.cache else {}
+        host = urlparse(url).netloc
+        semaphore = host_limits.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+        start = time.perf_counter()
+
+        for attempt in range(self.max_retries + 1):
+            result['attempts'] = attempt + 1
+            try:
+                async with semaphore:
+                    response = await client.get(url, headers=request_headers)
+
+                if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    raise httpx.HTTPStatusError(
+                        f"Retryable status {response.status_code}",
+                        request=response.request,
+                        response=response
+                    )
+
+                if response.status_code != 304 or not self.cache:
+                    response.raise_for_status()
+                result['status_code'] = response.status_code
+                result['content'] = response.content
+                result['headers'] = dict(response.headers)
+                result['error'] = None
+
+                if self.cache:
+                    cached = self.cache.update(url, response.status_code, result['headers'], response.content)
+                    result['cache_status'] = cached['cache_status']
+                    result['changed'] = cached['cache_status'] == MISS
+                    result['parsed'] = cached['parsed']
+                    result['processed'] = cached['processed']
+                break
+
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                status_code = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+                result['status_code'] = status_code
+                result['error'] = str(e)
+                if status_code is not None and status_code not in RETRY_STATUS_CODES:
+                    break
+                if attempt < self.max_retries:
+                    delay = self.backoff_base * (2 ** attempt) + random.uniform(0, self.backoff_base)
+                    logger.warning(f"Retrying {url} in {delay:.1f}s ({e})")
+                    await asyncio.sleep(delay)
+
+        result['elapsed'] = time.perf_counter() - start
+        if result['error']:
+            logger.error(f"Failed to fetch {url}: {result['error']}")
+        return result
+
+    async def crawl(self, sources: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch every source concurrently; results are keyed by source name."""
+        if not sources:
+            return {}
+
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        async with self.client() as client:
+            tasks = {
+                asyncio.create_task(self._fetch(client, host_limits, name, url)): name
+                for name, url in sources.items()
+            }
+            done, pending = await asyncio.wait(tasks, timeout=self.total_timeout)
+
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        results = {}
+        for task, name in tasks.items():
+            if task in done and not task.cancelled() and task.exception() is None:
+                results[name] = task.result()
+            else:
+                logger.error(f"Crawl of {name} did not finish within {self.total_timeout}s")
+                results[name] = {
+                    'name': name,
+                    'url': sources[name],
+                    'status_code': None,
+                    'content': b'',
+                    'headers': {},
+                    'error': 'total timeout exceeded',
+                    'attempts': 0,
+                    'elapsed': self.total_timeout,
+                    'cache_status': None,
+                    'changed': True,
+                    'parsed': None,
+                    'processed': False
+                }
+        return results
+
+    async def fetch_urls(self, urls: List[str]) -> List[Dict[str, Any]]:
+        results = await self.crawl({url: url for url in urls})
+        return [results[url] for url in urls]
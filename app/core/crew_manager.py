@@ -1,5 +1,5 @@
 from crewai import Crew
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 import logging
 from datetime import datetime
 import asyncio
@@ -11,6 +11,13 @@ from app.agents.ranking_agent import RankingAgent
 from app.agents.notification_agent import NotificationAgent
 from app.core.langchain_rag import rag_system
 from app.core.pinecone_client import pinecone_client
+from app.core.http_cache import http_cache
+from app.core.pdf_ingestion import ingest_pdfs
+from app.core.opportunity_store import upsert_opportunities, unindexed_opportunities, set_pinecone_ids
+from app.core.bm25_index import bm25_index, reciprocal_rank_fusion, RRF_K
+from app.core.user_rankings import update_rankings
+from app.core.expiry import expiry_engine
+from app.database import SessionLocal
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +27,6 @@ class CrewManager:
         self.classifier = ClassifierAgent()
         self.ranker = RankingAgent()
         self.notifier = NotificationAgent()
-        self.collector.collect_opportunities()
         
         self.crew = Crew(
             agents=[
@@ -42,6 +48,9 @@ class CrewManager:
             'start_time': datetime.now(),
             'collected': 0,
             'classified': 0,
+            'inserted': 0,
+            'updated': 0,
+            'unchanged': 0,
             'indexed': 0,
             'errors': []
         }
@@ -53,30 +62,93 @@ class CrewManager:
             if use_mock:
               raw_opportunities = self.collector.get_mock_opportunities()
             else:
-                raw_opportunities = self.collector.collect_opportunities()
+                raw_opportunities = await self.collector.acollect_opportunities()
+                pipeline_results['sources'] = self.collector.last_crawl_report
+                pipeline_results['http_cache'] = http_cache.stats()
             pipeline_results['collected'] = len(raw_opportunities)
             
             if not raw_opportunities:
                 logger.warning("No opportunities collected")
                 return pipeline_results
             
+            # Step 1b: Read linked edital PDFs
+            logger.info("Step 1b: Extracting linked edital PDFs...")
+            pipeline_results['pdfs'] = await ingest_pdfs(raw_opportunities)
+
             # Step 2: Classify opportunities
             logger.info("Step 2: Classifying opportunities...")
             classified_opportunities = self.classifier.classify_opportunities(raw_opportunities)
             pipeline_results['classified'] = len(classified_opportunities)
+            pipeline_results['classification_cache_hit_rate'] = self.classifier.last_run_stats.get('cache_hit_rate', 0.0)
             
-            # Step 3: Create embeddings and index in Pinecone
-            logger.info("Step 3: Creating embeddings and indexing...")
-            if rag_system.enabled and pinecone_client.enabled:
-                vectors = rag_system.process_documents(classified_opportunities)
-                if vectors:
-                    success = pinecone_client.upsert_vectors(vectors)
-                    if success:
-                        pipeline_results['indexed'] = len(vectors)
-                        
-                        
-            logger.info("Step 4: Storing in database...")
-            
+            # Step 3: Store in database
+            logger.info("Step 3: Storing in database...")
+            db = SessionLocal()
+            try:
+                store_stats = upsert_opportunities(db, classified_opportunities)
+                # Só agora as páginas coletadas podem ser puladas quando não mudarem
+                self.collector.mark_collected()
+                pipeline_results['inserted'] = store_stats['inserted']
+                pipeline_results['updated'] = store_stats['updated']
+                pipeline_results['unchanged'] = store_stats['unchanged']
+
+                # Só oportunidades novas ou alteradas mudam os índices; is_active é o gravado,
+                # que segue o prazo (uma prorrogada volta, uma já fechada sai)
+                changed = set(store_stats['changed'])
+                inactive = set(store_stats['inactive'])
+                to_index = {}
+                for opp in classified_opportunities:
+                    external_id = str(opp.get('external_id'))
+                    if external_id in changed and external_id in store_stats['ids']:
+                        to_index[external_id] = {
+                            **opp,
+                            'id': store_stats['ids'][external_id],
+                            'is_active': external_id not in inactive,
+                        }
+                bm25_index.add_documents(list(to_index.values()))
+                closed = [opp['id'] for opp in to_index.values() if not opp['is_active']]
+                if closed and pinecone_client.enabled:
+                    pinecone_client.delete_vectors([f"opp_{opp_id}" for opp_id in closed])
+                rag_system.answer_cache.invalidate(opp['id'] for opp in to_index.values())
+                expiry_engine.schedule(to_index.values())
+
+                # Step 4: Create embeddings and index in Pinecone
+                # Tudo o que ainda não tem vetor: alteradas agora, falhas anteriores e
+                # linhas gravadas enquanto o RAG estava desligado
+                logger.info("Step 4: Creating embeddings and indexing...")
+                to_embed = unindexed_opportunities(db) if rag_system.enabled and pinecone_client.enabled else []
+                pipeline_results['index_backlog'] = len(to_embed)
+                to_rank = {opp['id'] for opp in to_index.values()}
+                if to_embed:
+                    vectors = rag_system.process_documents(to_embed)
+                    pipeline_results['embedding_cache'] = rag_system.embedding_cache.stats()
+                    if rag_system.last_embedding_failures:
+                        pipeline_results['errors'].extend(
+                            f"Embedding batch failed: {failure['error']}"
+                            for failure in rag_system.last_embedding_failures
+                        )
+                    if vectors:
+                        chunk_results = await pinecone_client.aupsert_vectors(vectors)
+                        upserted = {vector_id for r in chunk_results if r['ok'] for vector_id in r['ids']}
+                        pipeline_results['indexed'] = len(upserted)
+                        pipeline_results['errors'].extend(
+                            f"Vector upsert failed for {r['size']} vectors: {r['error']}"
+                            for r in chunk_results if not r['ok']
+                        )
+                        indexed_ids = {
+                            vector['metadata']['opportunity_id']: vector['id']
+                            for vector in vectors
+                            if vector['id'] in upserted
+                        }
+                        set_pinecone_ids(db, indexed_ids)
+                        to_rank.update(indexed_ids)
+
+                # Depois dos vetores: o ranking materializado mistura a similaridade com o perfil,
+                # então entram também as linhas antigas que só agora ganharam vetor
+                pipeline_results['rankings'] = update_rankings(to_rank)
+            finally:
+                db.close()
+
             pipeline_results['end_time'] = datetime.now()
             pipeline_results['duration'] = (pipeline_results['end_time'] - pipeline_results['start_time']).total_seconds()
             
@@ -99,6 +171,11 @@ class CrewManager:
         
         try:
             ranked_opportunities = self.ranker.rank_opportunities(opportunities, user_profile)
+            if user_profile:
+                # Similaridade com o embedding do perfil (em cache) entra como 60% do score
+                ranked_opportunities = await asyncio.to_thread(
+                    self.ranker.profile_ranking, user_profile, ranked_opportunities
+                )
             logger.info(f"Ranking completed for {len(ranked_opportunities)} opportunities")
             return ranked_opportunities
             
@@ -123,38 +200,76 @@ class CrewManager:
             logger.error(f"Notification pipeline failed: {e}")
             return {'sent': 0, 'failed': len(users), 'error': str(e)}
     
+    def _ensure_keyword_index(self) -> None:
+        if bm25_index.loaded:
+            return
+        db = SessionLocal()
+        try:
+            bm25_index.load_from_db(db)
+        finally:
+            db.close()
+
+    def _retrieve(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]],
+        top_k: int
+    ) -> tuple:
+        """Hybrid retrieval: BM25 and vector results fused by reciprocal rank.
+
+        Without RAG the BM25 results are returned on their own. Returns the
+        fused raw results and the same results in opportunity format.
+        """
+        self._ensure_keyword_index()
+
+        # Cada lista traz mais candidatos que top_k para a fusão
+        pool = top_k * 3
+        keyword_results = bm25_index.search(query, pool, filters)
+        vector_results = rag_system.semantic_search(query, filters, pool)
+        result_lists = [vector_results, keyword_results] if vector_results else [keyword_results]
+        search_results = reciprocal_rank_fusion(result_lists)[:top_k]
+
+        # Convert search results to opportunity format
+        max_score = len(result_lists) / (RRF_K + 1)
+        opportunities = []
+        for result in search_results:
+            metadata = result.get('metadata', {})
+            opportunity = {
+                'id': metadata.get('opportunity_id'),
+                'title': metadata.get('title', ''),
+                'category': metadata.get('category', ''),
+                'type': metadata.get('type', ''),
+                'region': metadata.get('region', ''),
+                'amount': metadata.get('amount', ''),
+                'source': metadata.get('source', ''),
+                'relevance_score': result['score'] / max_score * 100,
+                'is_semantic_result': bool(vector_results) and 0 in result['sources']
+            }
+            opportunities.append(opportunity)
+
+        return search_results, opportunities
+
+    @staticmethod
+    def _keyword_response(search_results: List[Dict[str, Any]]) -> str:
+        return f"{len(search_results)} oportunidades encontradas por palavras-chave."
+
     async def semantic_search(
         self, 
         query: str, 
         filters: Optional[Dict[str, Any]] = None,
         top_k: int = 10
     ) -> Dict[str, Any]:
-        """Perform semantic search using RAG"""
+        """Perform hybrid search and generate an answer with RAG"""
         logger.info(f"Performing semantic search for: {query}")
         
         try:
-            # Get semantic search results
-            search_results = rag_system.semantic_search(query, filters, top_k)
+            search_results, opportunities = self._retrieve(query, filters, top_k)
             
             # Generate natural language response
-            response_text = rag_system.generate_response(query, search_results)
-            
-            # Convert search results to opportunity format
-            opportunities = []
-            for result in search_results:
-                metadata = result.get('metadata', {})
-                opportunity = {
-                    'id': metadata.get('opportunity_id'),
-                    'title': metadata.get('title', ''),
-                    'category': metadata.get('category', ''),
-                    'type': metadata.get('type', ''),
-                    'region': metadata.get('region', ''),
-                    'amount': metadata.get('amount', ''),
-                    'source': metadata.get('source', ''),
-                    'relevance_score': result.get('score', 0) * 100,
-                    'is_semantic_result': True
-                }
-                opportunities.append(opportunity)
+            if rag_system.enabled:
+                response_text = rag_system.generate_response(query, search_results)
+            else:
+                response_text = self._keyword_response(search_results)
             
             return {
                 'query': query,
@@ -171,6 +286,36 @@ class CrewManager:
                 'total': 0,
                 'response_text': f"Desculpe, não foi possível processar sua consulta: {str(e)}"
             }
+
+    async def stream_semantic_search(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: int = 10
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield search events: the results first, then answer tokens, then done.
+
+        Each event is {'event': name, 'data': payload}; the results are sent
+        as soon as retrieval finishes, before the LLM starts generating.
+        """
+        logger.info(f"Performing streaming semantic search for: {query}")
+
+        try:
+            search_results, opportunities = await asyncio.to_thread(self._retrieve, query, filters, top_k)
+        except Exception as e:
+            logger.error(f"Semantic search failed: {e}")
+            yield {'event': 'error', 'data': {'detail': f"Desculpe, não foi possível processar sua consulta: {str(e)}"}}
+            return
+
+        yield {'event': 'results', 'data': {'query': query, 'results': opportunities, 'total': len(opportunities)}}
+
+        if rag_system.enabled:
+            async for token in rag_system.astream_response(query, search_results):
+                yield {'event': 'token', 'data': {'text': token}}
+        else:
+            yield {'event': 'token', 'data': {'text': self._keyword_response(search_results)}}
+
+        yield {'event': 'done', 'data': {}}
     
     def get_agent_status(self) -> List[Dict[str, Any]]:
         """Get status of all agents"""
@@ -0,0 +1,52 @@
+import numpy as np
+from typing import List, Optional, Sequence
+import hashlib
+import os
+import threading
+
+from app.core.cache import get_cache
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", str(1024 * 1024 * 1024)))
+
+
+class EmbeddingCache:
+    """Document embeddings keyed by (model, sha256 of text), stored as float32 blobs."""
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else get_cache(
+            "embeddings",
+            size_limit=EMBEDDING_CACHE_SIZE,
+            eviction_policy="least-recently-used"
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return f"{model}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        found = []
+        for text in texts:
+            blob = self.cache.get(self.key(model, text))
+            found.append(np.frombuffer(blob, dtype=np.float32).tolist() if blob is not None else None)
+
+        hits = sum(1 for embedding in found if embedding is not None)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(found) - hits
+        return found
+
+    def set_many(self, model: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]]) -> None:
+        for text, embedding in zip(texts, embeddings):
+            self.cache.set(self.key(model, text), np.asarray(embedding, dtype=np.float32).tobytes())
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
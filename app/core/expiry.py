@@ -0,0 +1,230 @@
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional, Callable, Iterable, Tuple
+from datetime import datetime, timedelta
+import heapq
+import logging
+import os
+import threading
+
+from app.database import SessionLocal
+from app.models import Opportunity
+from app.core.opportunity_store import closes_at
+from app.core.pinecone_client import pinecone_client
+from app.core.bm25_index import bm25_index
+from app.core.user_rankings import update_rankings
+
+logger = logging.getLogger(__name__)
+
+# Só prazos dentro da janela ficam na fila; a janela é recarregada quando acaba
+EXPIRY_HORIZON_HOURS = int(os.getenv("EXPIRY_HORIZON_HOURS", "24"))
+# Espera antes de tentar de novo quando uma execução falha (ex.: banco fora do ar)
+EXPIRY_RETRY_SECONDS = int(os.getenv("EXPIRY_RETRY_SECONDS", "60"))
+
+
+class ExpiryEngine:
+    """Deactivates opportunities the moment their deadline passes.
+
+    Active deadlines inside the next horizon are kept in a min-heap and a
+    single timer thread sleeps until the earliest one (or the end of the
+    horizon, when the next window is loaded with one range query on the
+    (is_active, deadline, id) index). The collection pipeline feeds new and
+    changed opportunities through ``schedule``; a changed deadline leaves
+    the old heap entry behind, which is skipped when popped.
+
+    The queue holds ``closes_at`` times, so "31/05/2024" expires at the end
+    of that day. Like every stored timestamp, deadlines are naive UTC and
+    compared with ``datetime.utcnow()``.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        horizon: timedelta = timedelta(hours=EXPIRY_HORIZON_HOURS)
+    ):
+        self.session_factory = session_factory
+        self.horizon = horizon
+        self._lock = threading.RLock()
+        self._heap: List[Tuple[datetime, int]] = []
+        # Prazo atual de cada oportunidade na fila; entradas do heap que não batem estão obsoletas
+        self._deadlines: Dict[int, datetime] = {}
+        self._loaded_until: Optional[datetime] = None
+        self._timer: Optional[threading.Timer] = None
+        self._wake_at: Optional[datetime] = None
+        self.running = False
+        self.expired = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                logger.warning("Expiry engine is already running")
+                return
+            self.running = True
+        self._run()
+        logger.info(f"Expiry engine started with {len(self._deadlines)} pending deadlines")
+
+    def stop(self) -> None:
+        with self._lock:
+            self.running = False
+            if self._timer:
+                self._timer.cancel()
+            self._timer = None
+            self._wake_at = None
+        logger.info("Expiry engine stopped")
+
+    def schedule(self, opportunities: Iterable[Dict[str, Any]]) -> None:
+        """Track (or stop tracking) the deadlines of stored opportunities."""
+        with self._lock:
+            for opp in opportunities:
+                opp_id, deadline = opp.get("id"), opp.get("deadline")
+                if opp_id is None:
+                    continue
+                if not isinstance(deadline, datetime) or not opp.get("is_active", True):
+                    self._deadlines.pop(opp_id, None)
+                    continue
+                deadline = closes_at(deadline)
+                # Prazos além da janela entram na próxima recarga
+                if self._loaded_until is None or deadline > self._loaded_until:
+                    self._deadlines.pop(opp_id, None)
+                    continue
+                if self._deadlines.get(opp_id) != deadline:
+                    self._deadlines[opp_id] = deadline
+                    heapq.heappush(self._heap, (deadline, opp_id))
+            self._arm()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self.running,
+                "pending": len(self._deadlines),
+                "expired": self.expired,
+                "next_run": self._wake_at,
+                "loaded_until": self._loaded_until,
+            }
+
+    def _load_window(self, now: datetime) -> None:
+        until = now + self.horizon
+        db = self.session_factory()
+        try:
+            # closes_at >= deadline: o range no índice cobre a janela; o excesso fica para a próxima
+            rows = db.execute(
+                select(Opportunity.id, Opportunity.deadline)
+                .where(Opportunity.is_active == True, Opportunity.deadline <= until)
+            ).all()
+        finally:
+            db.close()
+        closing = [(opp_id, closes_at(deadline)) for opp_id, deadline in rows]
+        closing = [(opp_id, closes) for opp_id, closes in closing if closes <= until]
+
+        with self._lock:
+            self._deadlines = dict(closing)
+            self._heap = [(closes, opp_id) for opp_id, closes in closing]
+            heapq.heapify(self._heap)
+            self._loaded_until = until
+
+    def _pop_due(self, now: datetime) -> List[int]:
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, opp_id = heapq.heappop(self._heap)
+                if self._deadlines.get(opp_id) == deadline:
+                    del self._deadlines[opp_id]
+                    due.append(opp_id)
+        return due
+
+    def _arm(self, retry_at: Optional[datetime] = None) -> None:
+        """(Re)start the timer for the earliest deadline, the end of the window or a retry."""
+        with self._lock:
+            if not self.running:
+                return
+            wake_times = [retry_at] if retry_at else []
+            if self._loaded_until is not None:
+                wake_times.append(min(self._heap[0][0], self._loaded_until) if self._heap else self._loaded_until)
+            if not wake_times:
+                return
+            wake_at = min(wake_times)
+            if self._timer and self._wake_at is not None and self._wake_at <= wake_at:
+                return
+            if self._timer:
+                self._timer.cancel()
+            delay = max(0.0, (wake_at - datetime.utcnow()).total_seconds())
+            self._timer = threading.Timer(delay, self._run)
+            self._timer.daemon = True
+            self._wake_at = wake_at
+            self._timer.start()
+
+    def _run(self) -> None:
+        with self._lock:
+            if not self.running:
+                return
+            self._timer = None
+            self._wake_at = None
+
+        now = datetime.utcnow()
+        try:
+            if self._loaded_until is None or self._loaded_until <= now:
+                self._load_window(now)
+            due = self._pop_due(now)
+            if due:
+                self.expire(due, now)
+        except Exception as e:
+            logger.error(f"Expiry run failed, retrying in {EXPIRY_RETRY_SECONDS}s: {e}")
+            # A janela é recarregada na nova tentativa: ids já tirados da fila continuam ativos no banco
+            with self._lock:
+                self._loaded_until = None
+            self._arm(retry_at=now + timedelta(seconds=EXPIRY_RETRY_SECONDS))
+            return
+        self._arm()
+
+    def expire(self, opportunity_ids: List[int], now: Optional[datetime] = None) -> List[int]:
+        """Deactivate the opportunities that have closed and drop their vectors.
+
+        The deadline is checked again in the database, so an id whose deadline
+        was extended after it was queued is left alone.
+        """
+        now = now or datetime.utcnow()
+        db = self.session_factory()
+        try:
+            rows = db.execute(
+                select(Opportunity.id, Opportunity.deadline).where(
+                    Opportunity.id.in_(opportunity_ids),
+                    Opportunity.is_active == True,
+                    Opportunity.deadline <= now
+                )
+            ).all()
+            expired = [opp_id for opp_id, deadline in rows if closes_at(deadline) <= now]
+            if not expired:
+                return []
+            db.execute(
+                update(Opportunity)
+                .where(Opportunity.id.in_(expired), Opportunity.deadline <= now)
+                .values(is_active=False, pinecone_id=None)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        # Remoções no índice vetorial também limpam os caches de busca e de respostas
+        if pinecone_client.enabled:
+            pinecone_client.delete_vectors([f"opp_{opp_id}" for opp_id in expired])
+        bm25_index.remove_documents(expired)
+        update_rankings(expired, self.session_factory)
+
+        with self._lock:
+            self.expired += len(expired)
+        logger.info(f"Expired {len(expired)} opportunities")
+        return expired
+
+
+# Global instance
+expiry_engine = ExpiryEngine()
+
+
+def start_expiry_engine():
+    """Start the global expiry engine"""
+    expiry_engine.start()
+
+
+def stop_expiry_engine():
+    """Stop the global expiry engine"""
+    expiry_engine.stop()
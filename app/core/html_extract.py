@@ -0,0 +1,68 @@
+from bs4 import BeautifulSoup, SoupStrainer, FeatureNotFound
+from typing import List, Optional
+from functools import lru_cache
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Ordem de preferência: lxml é bem mais rápido, html.parser sempre existe
+PARSER_BACKENDS = ["lxml", "html.parser"]
+
+# Elementos que contêm os itens das listagens de editais/chamadas
+LISTING_TAGS = ["article", "li", "tr", "h2", "h3", "h4", "dt", "dd"]
+LISTING_STRAINER = SoupStrainer(LISTING_TAGS)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1)
+def available_backends() -> List[str]:
+    backends = []
+    for backend in PARSER_BACKENDS:
+        try:
+            BeautifulSoup("<p></p>", backend)
+            backends.append(backend)
+        except FeatureNotFound:
+            continue
+    return backends
+
+
+def best_parser() -> str:
+    return available_backends()[0]
+
+
+def page_text(content: bytes, parser: str = "html.parser", max_chars: Optional[int] = 5000) -> str:
+    """Full-DOM text of a page, with script/style removed."""
+    soup = BeautifulSoup(content, parser)
+
+    # Remove script e style
+    for script in soup(["script", "style"]):
+        script.decompose()
+
+    text = soup.get_text()
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    text = ' '.join(chunk for chunk in chunks if chunk)
+
+    return text[:max_chars] if max_chars else text
+
+
+def listing_items(content: bytes, parser: Optional[str] = None) -> List[str]:
+    """Text of each listing container, parsing only those elements.
+
+    The strainer makes BeautifulSoup skip everything outside the listing tags,
+    so the rest of the page (menus, footers, scripts) never becomes a tree.
+    """
+    soup = BeautifulSoup(content, parser or best_parser(), parse_only=LISTING_STRAINER)
+    items = []
+    for element in soup.find_all(LISTING_TAGS, recursive=False):
+        text = _WHITESPACE.sub(" ", element.get_text(" ")).strip()
+        if text:
+            items.append(text)
+    return items
+
+
+def listing_text(content: bytes, parser: Optional[str] = None) -> str:
+    """One line per listing item, without the 5,000 character cutoff."""
+    return "\n".join(listing_items(content, parser))
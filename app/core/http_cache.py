@@ -0,0 +1,100 @@
+from typing import Dict, Any
+import hashlib
+import logging
+import threading
+
+from app.core.cache import get_cache
+
+logger = logging.getLogger(__name__)
+
+HIT = "hit"                  # corpo baixado, mas idêntico ao anterior
+MISS = "miss"                # conteúdo novo ou alterado
+REVALIDATED = "revalidated"  # servidor respondeu 304 Not Modified
+
+
+class HttpCache:
+    """Persistent validator cache for conditional GETs.
+
+    For each URL it keeps the ETag/Last-Modified validators, a hash of the
+    last body and, optionally, whatever the caller parsed from that body, so
+    unchanged pages never have to be parsed again. A cached parse result
+    says nothing about what was stored from the page: a body only counts as
+    processed once ``mark_processed`` confirms it, and until then a HIT
+    still has to be handled as new. Validators are only sent for processed
+    bodies, since a 304 comes without one.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else get_cache("http")
+        self._lock = threading.Lock()
+        self.counters = {HIT: 0, MISS: 0, REVALIDATED: 0, 'bytes_downloaded': 0, 'bytes_saved': 0}
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        entry = self.cache.get(url)
+        # Sem resultado confirmado o chamador ainda precisa do corpo, então um 304 não serve
+        if not entry or not self._is_processed(entry):
+            return {}
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def update(self, url: str, status_code: int, headers: Dict[str, str], content: bytes) -> Dict[str, Any]:
+        """Record a response and return its cache status and any cached parse result."""
+        entry = self.cache.get(url) or {}
+        headers = {k.lower(): v for k, v in headers.items()}
+
+        if status_code == 304 and entry:
+            status = REVALIDATED
+            saved = entry.get('size', 0)
+            downloaded = 0
+        else:
+            body_hash = hashlib.sha256(content).hexdigest()
+            status = HIT if entry.get('body_hash') == body_hash else MISS
+            saved = 0
+            downloaded = len(content)
+            if status == MISS:
+                entry = {'body_hash': body_hash, 'size': len(content), 'parsed': None}
+
+        entry['etag'] = headers.get('etag', entry.get('etag'))
+        entry['last_modified'] = headers.get('last-modified', entry.get('last_modified'))
+        self.cache.set(url, entry)
+
+        with self._lock:
+            self.counters[status] += 1
+            self.counters['bytes_downloaded'] += downloaded
+            self.counters['bytes_saved'] += saved
+
+        return {'cache_status': status, 'parsed': entry.get('parsed'), 'processed': self._is_processed(entry)}
+
+    @staticmethod
+    def _is_processed(entry: Dict[str, Any]) -> bool:
+        return entry.get('processed_hash') is not None and entry.get('processed_hash') == entry.get('body_hash')
+
+    def store_parsed(self, url: str, parsed: Any) -> None:
+        """Cache what was parsed from the current body of ``url``; it does not mark it processed."""
+        entry = self.cache.get(url)
+        if entry is not None:
+            entry['parsed'] = parsed
+            self.cache.set(url, entry)
+
+    def mark_processed(self, url: str) -> None:
+        """Confirm that the current body of ``url`` was fully handled downstream."""
+        entry = self.cache.get(url)
+        if entry is not None:
+            entry['processed_hash'] = entry.get('body_hash')
+            self.cache.set(url, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+        total = stats[HIT] + stats[MISS] + stats[REVALIDATED]
+        stats['reuse_rate'] = (stats[HIT] + stats[REVALIDATED]) / total if total else 0.0
+        return stats
+
+
+# Global instance
+http_cache = HttpCache()
@@ -5,34 +5,89 @@ from langchain_community.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
-from typing import List, Dict, Any, Optional
+import numpy as np
+from cachetools import TTLCache
+from typing import List, Dict, Any, Optional, AsyncIterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
 import os
 import logging
+import random
+import re
+import threading
+import time
 from dotenv import load_dotenv
 
 from app.core.pinecone_client import pinecone_client  # mantém seu wrapper
+from app.core.embedding_cache import EmbeddingCache
+from app.core.answer_cache import AnswerCache
+from app.core.tokens import count_tokens
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "512"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+
+# Cache de consultas: L1 = texto normalizado -> embedding,
+# L2 = (texto, filtros, top_k) -> resultados, limpo a cada mudança no índice
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+QUERY_EMBEDDING_CACHE_TTL = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", str(24 * 3600)))
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "2048"))
+SEARCH_RESULT_CACHE_TTL = int(os.getenv("SEARCH_RESULT_CACHE_TTL", "600"))
+# Vetores das oportunidades usados no ranking por perfil, limpos a cada mudança no índice
+OPPORTUNITY_VECTOR_CACHE_SIZE = int(os.getenv("OPPORTUNITY_VECTOR_CACHE_SIZE", "20000"))
+OPPORTUNITY_VECTOR_CACHE_TTL = int(os.getenv("OPPORTUNITY_VECTOR_CACHE_TTL", "3600"))
+
+# Oportunidades usadas como contexto da resposta (e na chave do cache de respostas)
+ANSWER_CONTEXT_DOCS = 5
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _WHITESPACE.sub(" ", query).strip().lower()
+
 
 class RAGSystem:
-    def __init__(self):
+    def __init__(
+        self,
+        embeddings=None,
+        llm=None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        answer_cache: Optional[AnswerCache] = None
+    ):
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        self.embedding_cache = embedding_cache or EmbeddingCache()
+        self.answer_cache = answer_cache or AnswerCache()
+        self.last_embedding_failures: List[Dict[str, Any]] = []
 
-        if not self.openai_api_key:
+        self._query_cache_lock = threading.Lock()
+        self.query_embedding_cache = TTLCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL)
+        self.search_result_cache = TTLCache(SEARCH_RESULT_CACHE_SIZE, SEARCH_RESULT_CACHE_TTL)
+        self.opportunity_vector_cache = TTLCache(OPPORTUNITY_VECTOR_CACHE_SIZE, OPPORTUNITY_VECTOR_CACHE_TTL)
+        self._index_generation = 0
+        self.query_cache_counts = {"embedding_hits": 0, "embedding_misses": 0, "result_hits": 0, "result_misses": 0}
+        pinecone_client.add_change_listener(self._on_index_change)
+
+        # Backends injetados (ex.: fakes em testes) dispensam a chave da OpenAI
+        if embeddings is None and not self.openai_api_key:
             logger.warning("OpenAI API key not found. RAG system will be disabled.")
             self.enabled = False
             return
 
         try:
             # embeddings e LLM atualizados
-            self.embeddings = OpenAIEmbeddings(api_key=self.openai_api_key)
-            self.llm = OpenAI(
+            self.embeddings = embeddings or OpenAIEmbeddings(api_key=self.openai_api_key)
+            self.llm = llm or OpenAI(
                 api_key=self.openai_api_key,
                 temperature=0.1,
                 max_tokens=1000,
             )
+            self.embedding_model = getattr(self.embeddings, "model", None) or type(self.embeddings).__name__
+            self.llm_model = getattr(self.llm, "model_name", None) or type(self.llm).__name__
 
             self.text_splitter = RecursiveCharacterTextSplitter(
                 chunk_size=1000,
@@ -47,31 +102,114 @@ class RAGSystem:
             logger.error(f"Failed to initialize RAG system: {e}")
             self.enabled = False
 
-    def create_embeddings(self, texts: List[str]) -> List[List[float]]:
-        if not self.enabled:
-            return []
-        try:
-            return self.embeddings.embed_documents(texts)
-        except Exception as e:
-            logger.error(f"Failed to create embeddings: {e}")
+    def _token_batches(self, texts: List[str]) -> List[List[int]]:
+        """Split text positions into batches bounded by token count and size."""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            tokens = count_tokens(text)
+            if current and (current_tokens + tokens > EMBEDDING_BATCH_TOKENS or len(current) >= EMBEDDING_BATCH_SIZE):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+                delay = 2 ** attempt + random.uniform(0, 1)
+                logger.warning(f"Embedding batch of {len(texts)} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def create_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed texts in token-bounded batches sent concurrently.
+
+        The result is aligned with ``texts``; positions whose batch failed after
+        all retries are None and are described in ``last_embedding_failures``.
+        """
+        self.last_embedding_failures = []
+        if not self.enabled or not texts:
             return []
 
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        batches = self._token_batches(texts)
+
+        with ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY) as executor:
+            futures = {
+                executor.submit(self._embed_batch, [texts[i] for i in batch]): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    for i, embedding in zip(batch, future.result()):
+                        embeddings[i] = embedding
+                except Exception as e:
+                    logger.error(f"Failed to create embeddings for {len(batch)} texts: {e}")
+                    self.last_embedding_failures.append({
+                        "positions": [batch[0], batch[-1]],
+                        "size": len(batch),
+                        "error": str(e)
+                    })
+
+        return embeddings
+
+    def _on_index_change(self, ids: List[str]) -> None:
+        # Resultados em cache podem citar (ou omitir) os vetores alterados
+        with self._query_cache_lock:
+            self._index_generation += 1
+            self.search_result_cache.clear()
+            for vector_id in ids:
+                self.opportunity_vector_cache.pop(vector_id, None)
+        self.answer_cache.invalidate(int(i[4:]) for i in ids if i.startswith("opp_") and i[4:].isdigit())
+
+    def _count(self, key: str) -> None:
+        with self._query_cache_lock:
+            self.query_cache_counts[key] += 1
+
+    def query_cache_stats(self) -> Dict[str, Any]:
+        with self._query_cache_lock:
+            stats = dict(self.query_cache_counts)
+            stats["embedding_entries"] = len(self.query_embedding_cache)
+            stats["result_entries"] = len(self.search_result_cache)
+        stats["answers"] = self.answer_cache.stats()
+        return stats
+
     def create_query_embedding(self, query: str) -> List[float]:
         if not self.enabled:
             return []
+
+        key = (self.embedding_model, normalize_query(query))
+        with self._query_cache_lock:
+            embedding = self.query_embedding_cache.get(key)
+        if embedding is not None:
+            self._count("embedding_hits")
+            return embedding
+
+        self._count("embedding_misses")
         try:
-            return self.embeddings.embed_query(query)
+            embedding = self.embeddings.embed_query(query)
         except Exception as e:
             logger.error(f"Failed to create query embedding: {e}")
             return []
 
-    def process_documents(self, opportunities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        if not self.enabled or not pinecone_client.enabled:
-            return []
+        with self._query_cache_lock:
+            self.query_embedding_cache[key] = embedding
+        return embedding
 
-        texts = []
-        for opp in opportunities:
-            text = f"""
+    @staticmethod
+    def render_document(opp: Dict[str, Any]) -> str:
+        text = f"""
             Título: {opp.get('title', '')}
             Descrição: {opp.get('description', '')}
             Categoria: {opp.get('category', '')}
@@ -79,16 +217,105 @@ class RAGSystem:
             Região: {opp.get('region', '')}
             Valor: {opp.get('amount', '')}
             Fonte: {opp.get('source', '')}
-            Tags: {', '.join(opp.get('tags', []))}
+            Tags: {', '.join(opp.get('tags') or [])}
             """
-            texts.append(text.strip())
+        return text.strip()
+
+    @staticmethod
+    def render_profile(profile: Dict[str, Any]) -> str:
+        """Text embedded for a user profile; empty when there is nothing to describe."""
+        parts = [
+            ("Segmento", profile.get("startup_segment")),
+            ("Área", profile.get("startup_area")),
+            ("Descrição", profile.get("startup_description")),
+        ]
+        return "\n".join(f"{label}: {value.strip()}" for label, value in parts if value and value.strip())
+
+    def profile_embedding(self, profile: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Normalized embedding of the profile text, cached by content in the embedding cache."""
+        text = self.render_profile(profile)
+        if not self.enabled or not text:
+            return None
+
+        embedding = self.embedding_cache.get_many(self.embedding_model, [text])[0]
+        if embedding is None:
+            try:
+                embedding = self.embeddings.embed_query(text)
+            except Exception as e:
+                logger.error(f"Failed to create profile embedding: {e}")
+                return None
+            self.embedding_cache.set_many(self.embedding_model, [text], [embedding])
+
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else None
 
-        embeddings = self.create_embeddings(texts)
-        if not embeddings:
+    def opportunity_vectors(self, opportunity_ids: List[int]) -> Dict[int, np.ndarray]:
+        """Normalized stored vectors of the opportunities; ids not in the index are left out."""
+        vector_ids = [f"opp_{opportunity_id}" for opportunity_id in opportunity_ids]
+        with self._query_cache_lock:
+            found = {i: self.opportunity_vector_cache.get(i) for i in vector_ids}
+            generation = self._index_generation
+        missing = [i for i, vector in found.items() if vector is None]
+
+        if missing and pinecone_client.enabled:
+            fetched = {}
+            for vector_id, values in pinecone_client.fetch_vectors(missing).items():
+                vector = np.asarray(values, dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                fetched[vector_id] = vector / norm if norm else vector
+            found.update(fetched)
+            with self._query_cache_lock:
+                if generation == self._index_generation:
+                    self.opportunity_vector_cache.update(fetched)
+
+        return {
+            opportunity_id: found[vector_id]
+            for opportunity_id, vector_id in zip(opportunity_ids, vector_ids)
+            if found.get(vector_id) is not None
+        }
+
+    def similarity_scores(self, embedding: Any, opportunity_ids: List[int]) -> Dict[int, float]:
+        """Cosine similarity of every opportunity to ``embedding`` in one matrix-vector product."""
+        vectors = self.opportunity_vectors(opportunity_ids)
+        if not vectors or embedding is None or len(embedding) == 0:
+            return {}
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return {}
+        scores = np.stack(list(vectors.values())) @ (query / norm)
+        return dict(zip(vectors.keys(), scores.tolist()))
+
+    def process_documents(self, opportunities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not self.enabled or not pinecone_client.enabled:
             return []
 
+        texts = [self.render_document(opp) for opp in opportunities]
+
+        # Só textos novos ou alterados chegam ao provedor de embeddings
+        embeddings = self.embedding_cache.get_many(self.embedding_model, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            created = self.create_embeddings([texts[i] for i in missing])
+            for i, embedding in zip(missing, created):
+                embeddings[i] = embedding
+            succeeded = [(texts[i], e) for i, e in zip(missing, created) if e is not None]
+            self.embedding_cache.set_many(
+                self.embedding_model, [t for t, _ in succeeded], [e for _, e in succeeded]
+            )
+
+        failed = sum(1 for embedding in embeddings if embedding is None)
+        logger.info(
+            f"Embeddings: {len(texts) - len(missing)} cached, "
+            f"{len(missing) - failed} created, {failed} failed"
+        )
+
         vectors = []
         for opp, embedding in zip(opportunities, embeddings):
+            if embedding is None:
+                continue
             vector = {
                 "id": f"opp_{opp['id']}",
                 "values": embedding,
@@ -112,35 +339,52 @@ class RAGSystem:
         if not self.enabled or not pinecone_client.enabled:
             return []
 
+        key = (normalize_query(query), json.dumps(filters, sort_keys=True, default=str), top_k)
+        with self._query_cache_lock:
+            results = self.search_result_cache.get(key)
+            generation = self._index_generation
+        if results is not None:
+            self._count("result_hits")
+            return results
+
+        self._count("result_misses")
         try:
             query_embedding = self.create_query_embedding(query)
             if not query_embedding:
                 return []
 
-            return pinecone_client.query_vectors(
+            results = pinecone_client.query_vectors(
                 vector=query_embedding, top_k=top_k, filter=filters
             )
+            with self._query_cache_lock:
+                # Não guarda resultados de uma consulta que correu durante uma mudança no índice
+                if generation == self._index_generation:
+                    self.search_result_cache[key] = results
+            return results
         except Exception as e:
             logger.error(f"Failed to perform semantic search: {e}")
             return []
 
-    def generate_response(self, query: str, context_docs: List[Dict[str, Any]]) -> str:
-        if not self.enabled:
-            return "Sistema RAG não disponível no momento."
+    @staticmethod
+    def _context_ids(context_docs: List[Dict[str, Any]]) -> List[Any]:
+        # O Pinecone devolve metadados numéricos como float (5.0); o cache usa o id inteiro
+        ids = (doc.get("metadata", {}).get("opportunity_id") for doc in context_docs[:ANSWER_CONTEXT_DOCS])
+        return [int(float(opp_id)) if isinstance(opp_id, (int, float)) else opp_id for opp_id in ids]
 
-        try:
-            context = "\n\n".join(
-                [
-                    f"Oportunidade: {doc.get('metadata', {}).get('title', '')}\n"
-                    f"Categoria: {doc.get('metadata', {}).get('category', '')}\n"
-                    f"Tipo: {doc.get('metadata', {}).get('type', '')}\n"
-                    f"Região: {doc.get('metadata', {}).get('region', '')}\n"
-                    f"Valor: {doc.get('metadata', {}).get('amount', '')}"
-                    for doc in context_docs[:5]
-                ]
-            )
+    @staticmethod
+    def build_prompt(query: str, context_docs: List[Dict[str, Any]]) -> str:
+        context = "\n\n".join(
+            [
+                f"Oportunidade: {doc.get('metadata', {}).get('title', '')}\n"
+                f"Categoria: {doc.get('metadata', {}).get('category', '')}\n"
+                f"Tipo: {doc.get('metadata', {}).get('type', '')}\n"
+                f"Região: {doc.get('metadata', {}).get('region', '')}\n"
+                f"Valor: {doc.get('metadata', {}).get('amount', '')}"
+                for doc in context_docs[:ANSWER_CONTEXT_DOCS]
+            ]
+        )
 
-            prompt = f"""
+        return f"""
             Com base nas seguintes oportunidades de financiamento:
 
             {context}
@@ -150,12 +394,53 @@ class RAGSystem:
             Forneça uma resposta detalhada e útil, incluindo informações específicas sobre as oportunidades mais relevantes.
             """
 
-            response = self.llm.invoke(prompt)  # invoke é o novo método recomendado
-            return response.strip()
+    def generate_response(self, query: str, context_docs: List[Dict[str, Any]]) -> str:
+        if not self.enabled:
+            return "Sistema RAG não disponível no momento."
+
+        context_ids = self._context_ids(context_docs)
+        cached = self.answer_cache.get(self.llm_model, query, context_ids)
+        if cached is not None:
+            return cached
+
+        try:
+            response = self.llm.invoke(self.build_prompt(query, context_docs))  # invoke é o novo método recomendado
+            answer = response.strip()
+            self.answer_cache.set(self.llm_model, query, context_ids, answer)
+            return answer
 
         except Exception as e:
             logger.error(f"Failed to generate response: {e}")
             return "Desculpe, não foi possível gerar uma resposta no momento."
 
+    async def astream_response(self, query: str, context_docs: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        """Yield the answer as the LLM produces it (``llm.astream``).
+
+        Errors after the first token end the stream with an apology instead of
+        raising, since the caller has already sent part of the answer.
+        """
+        if not self.enabled:
+            yield "Sistema RAG não disponível no momento."
+            return
+
+        context_ids = self._context_ids(context_docs)
+        cached = self.answer_cache.get(self.llm_model, query, context_ids)
+        if cached is not None:
+            yield cached
+            return
+
+        try:
+            parts = []
+            async for token in self.llm.astream(self.build_prompt(query, context_docs)):
+                # LLMs de chat devolvem mensagens; LLMs de texto, strings
+                text = token if isinstance(token, str) else getattr(token, "content", "")
+                if text:
+                    parts.append(text)
+                    yield text
+            self.answer_cache.set(self.llm_model, query, context_ids, "".join(parts).strip())
+        except Exception as e:
+            logger.error(f"Failed to stream response: {e}")
+            yield "Desculpe, não foi possível gerar uma resposta no momento."
+
 
 rag_system = RAGSystem()
@@ -0,0 +1,529 @@
+import numpy as np
+from typing import List, Dict, Any, Optional, Set
+from collections import defaultdict
+import asyncio
+import json
+import logging
+import os
+import threading
+
+from app.core.cache import CACHE_DIR
+from app.core.ann_index import IVFIndex
+from app.core.vector_events import VectorChangeNotifier
+
+logger = logging.getLogger(__name__)
+
+LOCAL_VECTOR_PATH = os.getenv("LOCAL_VECTOR_PATH", os.path.join(CACHE_DIR, "vectors"))
+# "ivf" ativa a busca aproximada; vazio = busca exata
+LOCAL_VECTOR_ANN = os.getenv("LOCAL_VECTOR_ANN", "").lower()
+LOCAL_VECTOR_NLIST = int(os.getenv("LOCAL_VECTOR_NLIST", "0"))
+LOCAL_VECTOR_NPROBE = int(os.getenv("LOCAL_VECTOR_NPROBE", "8"))
+# int8 (4x menor) ou float16 (2x menor, mais lento no numpy) para pontuar
+# com a cópia quantizada; vazio = só float32
+LOCAL_VECTOR_QUANTIZATION = os.getenv("LOCAL_VECTOR_QUANTIZATION", "").lower()
+# Candidatos por resultado re-pontuados em float32
+LOCAL_VECTOR_RESCORE = int(os.getenv("LOCAL_VECTOR_RESCORE", "4"))
+INITIAL_CAPACITY = 1024
+# O log de mudanças é compactado no index.json quando passa de max(isto, nº de linhas) entradas
+LOG_COMPACT_MIN_ENTRIES = 10000
+# Filtros que deixam poucas linhas são resolvidos com busca exata
+EXACT_SEARCH_MAX_ROWS = 2048
+
+QUANTIZATION_DTYPES = {"float16": np.float16, "int8": np.int8}
+SCAN_CHUNK = 16384
+
+_RANGE_OPS = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+}
+
+
+def _hashable(value: Any) -> Any:
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _grow_memmap(path: str, dtype: Any, old_shape: tuple, new_shape: tuple) -> np.memmap:
+    """Copy a memmap file into a larger one and reopen it read-write."""
+    grown_path = path + ".grow"
+    grown = np.memmap(grown_path, dtype=dtype, mode="w+", shape=new_shape)
+    if old_shape[0] and os.path.exists(path):
+        old = np.memmap(path, dtype=dtype, mode="r", shape=old_shape)
+        grown[:old_shape[0]] = old
+        del old
+    grown.flush()
+    del grown
+    os.replace(grown_path, path)
+    return np.memmap(path, dtype=dtype, mode="r+", shape=new_shape)
+
+
+def quantize(vectors: np.ndarray, mode: str) -> tuple:
+    """Scalar-quantize normalized vectors; returns (codes, per-row scales).
+
+    int8 maps each row onto [-127, 127] with its own scale, so a dot product
+    with the codes times the scale approximates the float32 dot product.
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    if mode == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+
+    scales = np.abs(vectors).max(axis=1) / 127
+    safe = np.where(scales > 0, scales, 1)
+    codes = np.rint(vectors / safe[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class LocalVectorIndex(VectorChangeNotifier):
+    """In-process vector index with the PineconeClient contract.
+
+    Vectors live L2-normalized in a memory-mapped float32 matrix, so cosine
+    similarity against every stored vector is one matrix-vector product.
+    Scalar metadata values are kept in postings lists to build filter masks
+    without scanning the metadata of every row. With ``ann="ivf"`` queries
+    only score the rows of the closest clusters (see IVFIndex).
+
+    With ``quantization`` set to ``float16`` or ``int8`` a compact copy of the
+    matrix is kept alongside it. Queries scan only that copy and re-score the
+    best ``rescore * top_k`` candidates against the float32 rows, so the full
+    precision matrix stays on disk instead of being paged in by every scan.
+
+    Ids and metadata are persisted as an ``index.json`` snapshot plus an
+    append-only ``index.log`` with one line per changed row, so an upsert or
+    delete writes only what it touched. The log is folded into a new
+    snapshot once it outgrows the index, or when the matrix is resized.
+    """
+
+    def __init__(
+        self,
+        path: str = LOCAL_VECTOR_PATH,
+        dimension: Optional[int] = None,
+        ann: str = LOCAL_VECTOR_ANN,
+        nlist: int = LOCAL_VECTOR_NLIST,
+        nprobe: int = LOCAL_VECTOR_NPROBE,
+        quantization: str = LOCAL_VECTOR_QUANTIZATION,
+        rescore: int = LOCAL_VECTOR_RESCORE
+    ):
+        if quantization and quantization not in QUANTIZATION_DTYPES:
+            raise ValueError(f"Unsupported quantization: {quantization}")
+
+        self.path = path
+        self.dimension = dimension
+        self.enabled = True
+        self.quantization = quantization or None
+        self.rescore = max(1, rescore)
+        self._lock = threading.RLock()
+
+        self.ids: List[Optional[str]] = []
+        self.metadata: List[Optional[Dict[str, Any]]] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.free_rows: List[int] = []
+        self.postings: Dict[str, Dict[Any, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self.capacity = 0
+        self.matrix: Optional[np.memmap] = None
+        self.codes: Optional[np.memmap] = None
+        self.scales: Optional[np.memmap] = None
+        self.active = np.zeros(0, dtype=bool)
+        self._log_entries = 0
+        self._header_dirty = False
+
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+        self.ann = IVFIndex(self.path, nlist=nlist, nprobe=nprobe) if ann == "ivf" else None
+        logger.info(f"Local vector index loaded with {len(self.id_to_row)} vectors from {self.path}")
+
+    # ---------- persistência ----------
+
+    @property
+    def _matrix_path(self) -> str:
+        return os.path.join(self.path, "vectors.f32")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "index.json")
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.path, "index.log")
+
+    @property
+    def _codes_path(self) -> str:
+        return os.path.join(self.path, f"vectors.{self.quantization}")
+
+    @property
+    def _scales_path(self) -> str:
+        return os.path.join(self.path, "scales.f32")
+
+    def _load(self) -> None:
+        if not os.path.exists(self._meta_path):
+            return
+
+        with open(self._meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+
+        self.dimension = meta["dimension"]
+        self.capacity = meta["capacity"]
+        self.ids = meta["ids"]
+        self.metadata = meta["metadata"]
+        self._replay_log()
+        self.matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dimension))
+        self.active = np.zeros(self.capacity, dtype=bool)
+
+        for row, vector_id in enumerate(self.ids):
+            if vector_id is None:
+                self.free_rows.append(row)
+            else:
+                self.id_to_row[vector_id] = row
+                self.active[row] = True
+                self._index_metadata(row, self.metadata[row])
+
+        if self.quantization:
+            self._load_codes(fresh=meta.get("quantization") == self.quantization)
+
+    def _load_codes(self, fresh: bool) -> None:
+        """Open the quantized copy, rebuilding it from the float32 matrix if missing."""
+        dtype = QUANTIZATION_DTYPES[self.quantization]
+        shape = (self.capacity, self.dimension)
+        expected = self.capacity * self.dimension * np.dtype(dtype).itemsize
+        if fresh and os.path.exists(self._codes_path) and os.path.getsize(self._codes_path) == expected \
+                and os.path.exists(self._scales_path):
+            self.codes = np.memmap(self._codes_path, dtype=dtype, mode="r+", shape=shape)
+            self.scales = np.memmap(self._scales_path, dtype=np.float32, mode="r+", shape=(self.capacity,))
+            return
+
+        self.codes = np.memmap(self._codes_path, dtype=dtype, mode="w+", shape=shape)
+        self.scales = np.memmap(self._scales_path, dtype=np.float32, mode="w+", shape=(self.capacity,))
+        for start in range(0, self.capacity, INITIAL_CAPACITY):
+            end = start + INITIAL_CAPACITY
+            self.codes[start:end], self.scales[start:end] = quantize(self.matrix[start:end], self.quantization)
+        self._header_dirty = True
+        logger.info(f"Built {self.quantization} copy of {self.capacity} vector rows")
+
+    def _flush(self) -> None:
+        for matrix in (self.matrix, self.codes, self.scales):
+            if matrix is not None:
+                matrix.flush()
+
+    def _replay_log(self) -> None:
+        if not os.path.exists(self._log_path):
+            return
+        with open(self._log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Última linha cortada por uma queda: as anteriores valem e o
+                    # próximo save grava um snapshot em vez de anexar depois dela
+                    self._header_dirty = True
+                    break
+                row = entry["row"]
+                if row >= len(self.ids):
+                    self.ids.extend([None] * (row + 1 - len(self.ids)))
+                    self.metadata.extend([None] * (row + 1 - len(self.metadata)))
+                self.ids[row] = entry["id"]
+                self.metadata[row] = entry["metadata"]
+                self._log_entries += 1
+
+    def _save(self, rows: List[int]) -> None:
+        """Persist the given rows: one log line each, or a full snapshot when due."""
+        self._flush()
+        if self._header_dirty or not os.path.exists(self._meta_path) \
+                or self._log_entries + len(rows) > max(LOG_COMPACT_MIN_ENTRIES, len(self.ids)):
+            self._snapshot()
+            return
+
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(
+                    {"row": row, "id": self.ids[row], "metadata": self.metadata[row]},
+                    ensure_ascii=False, default=str
+                ) + "\n")
+        self._log_entries += len(rows)
+
+    def _snapshot(self) -> None:
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "dimension": self.dimension,
+                "capacity": self.capacity,
+                "ids": self.ids,
+                "metadata": self.metadata,
+                "quantization": self.quantization
+            }, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self._meta_path)
+        # Reaplicar o log sobre o snapshot novo é inofensivo, então a ordem basta em caso de queda
+        if os.path.exists(self._log_path):
+            os.remove(self._log_path)
+        self._log_entries = 0
+        self._header_dirty = False
+
+    def _grow(self, needed: int) -> None:
+        if needed <= self.capacity:
+            return
+
+        capacity = max(INITIAL_CAPACITY, self.capacity)
+        while capacity < needed:
+            capacity *= 2
+
+        self._flush()
+        old_shape, new_shape = (self.capacity, self.dimension), (capacity, self.dimension)
+        self.matrix = None
+        self.matrix = _grow_memmap(self._matrix_path, np.float32, old_shape, new_shape)
+        if self.quantization:
+            dtype = QUANTIZATION_DTYPES[self.quantization]
+            self.codes = self.scales = None
+            self.codes = _grow_memmap(self._codes_path, dtype, old_shape, new_shape)
+            self.scales = _grow_memmap(self._scales_path, np.float32, (self.capacity,), (capacity,))
+        self.active = np.concatenate([self.active, np.zeros(capacity - self.capacity, dtype=bool)])
+        self.capacity = capacity
+        self._header_dirty = True
+
+    # ---------- metadados ----------
+
+    def _index_metadata(self, row: int, metadata: Optional[Dict[str, Any]]) -> None:
+        for key, value in (metadata or {}).items():
+            values = value if isinstance(value, list) else [value]
+            for v in values:
+                self.postings[key][_hashable(v)].add(row)
+
+    def _unindex_metadata(self, row: int, metadata: Optional[Dict[str, Any]]) -> None:
+        for key, value in (metadata or {}).items():
+            values = value if isinstance(value, list) else [value]
+            for v in values:
+                self.postings[key][_hashable(v)].discard(row)
+
+    def _rows_mask(self, rows: Set[int]) -> np.ndarray:
+        mask = np.zeros(self.capacity, dtype=bool)
+        if rows:
+            mask[list(rows)] = True
+        return mask
+
+    def _filter_mask(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Evaluate a Pinecone-style metadata filter into a row mask."""
+        mask = self.active.copy()
+
+        for key, condition in filter.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._filter_mask(sub)
+                continue
+            if key == "$or":
+                any_mask = np.zeros(self.capacity, dtype=bool)
+                for sub in condition:
+                    any_mask |= self._filter_mask(sub)
+                mask &= any_mask
+                continue
+
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+
+            for op, operand in condition.items():
+                postings = self.postings.get(key, {})
+                if op == "$eq":
+                    mask &= self._rows_mask(postings.get(_hashable(operand), set()))
+                elif op == "$ne":
+                    mask &= ~self._rows_mask(postings.get(_hashable(operand), set()))
+                elif op == "$in":
+                    mask &= self._rows_mask(set().union(*(postings.get(_hashable(v), set()) for v in operand)))
+                elif op == "$nin":
+                    mask &= ~self._rows_mask(set().union(*(postings.get(_hashable(v), set()) for v in operand)))
+                elif op in _RANGE_OPS:
+                    compare = _RANGE_OPS[op]
+                    rows = {
+                        row
+                        for value, value_rows in postings.items()
+                        if isinstance(value, (int, float)) and compare(value, operand)
+                        for row in value_rows
+                    }
+                    mask &= self._rows_mask(rows)
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+
+        return mask
+
+    # ---------- contrato do PineconeClient ----------
+
+    def upsert_vectors(self, vectors: List[Dict[str, Any]]) -> bool:
+        if not vectors:
+            return True
+
+        try:
+            with self._lock:
+                if self.dimension is None:
+                    self.dimension = len(vectors[0]["values"])
+
+                new_ids = [v["id"] for v in vectors if v["id"] not in self.id_to_row]
+                self._grow(len(self.ids) + max(0, len(set(new_ids)) - len(self.free_rows)))
+                written = []
+
+                for vector in vectors:
+                    values = np.asarray(vector["values"], dtype=np.float32)
+                    if values.shape != (self.dimension,):
+                        raise ValueError(f"Vector {vector['id']} has dimension {values.size}, expected {self.dimension}")
+
+                    row = self.id_to_row.get(vector["id"])
+                    if row is None:
+                        if self.free_rows:
+                            row = self.free_rows.pop()
+                        else:
+                            row = len(self.ids)
+                            self.ids.append(None)
+                            self.metadata.append(None)
+                        self.id_to_row[vector["id"]] = row
+                    else:
+                        self._unindex_metadata(row, self.metadata[row])
+
+                    norm = np.linalg.norm(values)
+                    self.matrix[row] = values / norm if norm else values
+                    if self.quantization:
+                        codes, scales = quantize(self.matrix[row], self.quantization)
+                        self.codes[row], self.scales[row] = codes[0], scales[0]
+                    self.ids[row] = vector["id"]
+                    self.metadata[row] = vector.get("metadata") or {}
+                    self.active[row] = True
+                    self._index_metadata(row, self.metadata[row])
+                    written.append(row)
+
+                if self.ann is not None:
+                    if self.ann.needs_training(len(self.id_to_row)):
+                        self.ann.train(self.matrix, np.flatnonzero(self.active))
+                    else:
+                        rows = np.unique(written)
+                        self.ann.add(rows, self.matrix[rows])
+                    self.ann.save()
+
+                self._save(written)
+
+            self._notify_change([v["id"] for v in vectors])
+            logger.info(f"Successfully upserted {len(vectors)} vectors")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to upsert vectors: {e}")
+            return False
+
+    def upsert_in_chunks(self, vectors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        ok = self.upsert_vectors(vectors)
+        return [{
+            "ids": [v["id"] for v in vectors],
+            "size": len(vectors),
+            "ok": ok,
+            "attempts": 1,
+            "error": None if ok else "local upsert failed"
+        }]
+
+    async def aupsert_vectors(self, vectors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.upsert_in_chunks, vectors)
+
+    def _scan(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Scores of the given rows, from the quantized copy when there is one."""
+        # Linhas contíguas evitam a cópia do fancy indexing
+        contiguous = rows.size == len(self.ids)
+        if self.codes is None:
+            return self.matrix[:rows.size] @ query if contiguous else self.matrix[rows] @ query
+
+        # Em blocos, para a conversão dos códigos não ocupar a memória que a
+        # quantização economiza. float16 é pontuado direto (o numpy acumula em
+        # float32, mas sem BLAS); int8 é convertido e usa o BLAS.
+        half_query = query.astype(np.float16)
+        scores = np.empty(rows.size, dtype=np.float32)
+        for start in range(0, rows.size, SCAN_CHUNK):
+            end = min(start + SCAN_CHUNK, rows.size)
+            block = slice(start, end) if contiguous else rows[start:end]
+            if self.quantization == "float16":
+                scores[start:end] = self.codes[block] @ half_query
+            else:
+                scores[start:end] = (self.codes[block].astype(np.float32) @ query) * self.scales[block]
+        return scores
+
+    def query_vectors(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Top-k cosine search over the rows that pass the filter.
+
+        Exact unless the IVF index is enabled, trained and the filter leaves
+        more than EXACT_SEARCH_MAX_ROWS rows. Returned scores are always
+        computed at full precision.
+        """
+        try:
+            with self._lock:
+                if not self.id_to_row:
+                    return []
+
+                mask = self._filter_mask(filter) if filter else self.active
+                query = np.asarray(vector, dtype=np.float32)
+                norm = np.linalg.norm(query)
+                if norm:
+                    query = query / norm
+
+                if self.ann is not None and self.ann.trained and mask.sum() > EXACT_SEARCH_MAX_ROWS:
+                    candidates = self.ann.candidates(query)
+                    rows = candidates[mask[candidates]]
+                else:
+                    rows = np.flatnonzero(mask)
+                if rows.size == 0:
+                    return []
+
+                scores = self._scan(rows, query)
+                k = min(top_k, rows.size)
+
+                if self.codes is not None:
+                    # Re-pontua os melhores candidatos com os vetores float32
+                    n = min(rows.size, k * self.rescore)
+                    rows = rows[np.argpartition(-scores, n - 1)[:n]]
+                    scores = self.matrix[rows] @ query
+
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+
+                return [
+                    {
+                        "id": self.ids[rows[i]],
+                        "score": float(scores[i]),
+                        "metadata": self.metadata[rows[i]]
+                    }
+                    for i in top
+                ]
+        except Exception as e:
+            logger.error(f"Failed to query vectors: {e}")
+            return []
+
+    def fetch_vectors(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored (normalized, float32) vectors by id; missing ids are left out."""
+        with self._lock:
+            found = [vector_id for vector_id in ids if vector_id in self.id_to_row]
+            if not found:
+                return {}
+            rows = np.fromiter((self.id_to_row[i] for i in found), dtype=np.int64, count=len(found))
+            return dict(zip(found, self.matrix[rows]))
+
+    def delete_vectors(self, ids: List[str]) -> bool:
+        try:
+            with self._lock:
+                removed, removed_ids = [], []
+                for vector_id in ids:
+                    row = self.id_to_row.pop(vector_id, None)
+                    if row is None:
+                        continue
+                    self._unindex_metadata(row, self.metadata[row])
+                    self.ids[row] = None
+                    self.metadata[row] = None
+                    self.active[row] = False
+                    self.free_rows.append(row)
+                    removed.append(row)
+                    removed_ids.append(vector_id)
+
+                if self.ann is not None and removed:
+                    self.ann.remove(np.asarray(removed))
+                    self.ann.save()
+                if removed:
+                    self._save(removed)
+
+            self._notify_change(removed_ids)
+            logger.info(f"Successfully deleted {len(ids)} vectors")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to delete vectors: {e}")
+            return False
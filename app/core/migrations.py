@@ -0,0 +1,161 @@
+from sqlalchemy import inspect, select, update, bindparam
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+from typing import List, Dict
+import logging
+import os
+
+from app.models import Base, User, Opportunity
+from app.core.amounts import amount_columns, amount_in_brl
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+# Índices que saíram dos modelos; removidos se um banco ainda os tiver
+OBSOLETE_INDEXES = {
+    "opportunities": ["ix_opportunities_open_deadline", "ix_opportunities_deadline", "ix_opportunities_listing"],
+}
+
+
+def add_missing_columns(engine: Engine) -> List[str]:
+    """ALTER TABLE ... ADD COLUMN for model columns an existing table lacks.
+
+    create_all only creates missing tables. Columns added to the models
+    since are nullable, so they can be added without a default and filled
+    afterwards; a NOT NULL column is reported instead.
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable:
+                    logger.error(f"Cannot add NOT NULL column {table.name}.{column.name}; migrate it by hand")
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}"
+                )
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def create_missing_indexes(engine: Engine) -> List[str]:
+    """CREATE INDEX for every model index an existing table lacks (create_all skips them too)."""
+    inspector = inspect(engine)
+    created = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    conn.execute(CreateIndex(index))
+                    created.append(index.name)
+    return created
+
+
+def drop_obsolete_indexes(engine: Engine) -> List[str]:
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    dropped = []
+    with engine.begin() as conn:
+        for table_name, index_names in OBSOLETE_INDEXES.items():
+            if not inspector.has_table(table_name):
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table_name)}
+            for name in index_names:
+                if name in existing:
+                    conn.exec_driver_sql(f"DROP INDEX {preparer.quote(name)}")
+                    dropped.append(name)
+    return dropped
+
+
+def backfill_amounts(engine: Engine, batch_size: int = MIGRATION_BATCH_SIZE) -> Dict[str, int]:
+    """Fill the normalized amount columns of rows stored before they existed.
+
+    Rows are visited once in id order; text that cannot be parsed stays
+    NULL and is simply read again on the next start.
+    """
+    opportunities = Opportunity.__table__
+    users = User.__table__
+    stats = {"opportunities": 0, "users": 0}
+
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(opportunities.c.id, opportunities.c.amount)
+                .where(
+                    opportunities.c.id > last_id,
+                    opportunities.c.amount_brl.is_(None),
+                    opportunities.c.amount.is_not(None)
+                )
+                .order_by(opportunities.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            values = [{"row_id": row.id, **amount_columns(row.amount)} for row in rows]
+            values = [v for v in values if v["amount_brl"] is not None]
+            if values:
+                conn.execute(
+                    update(opportunities).where(opportunities.c.id == bindparam("row_id")),
+                    values
+                )
+            stats["opportunities"] += len(values)
+
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(users.c.id, users.c.min_amount)
+                .where(
+                    users.c.id > last_id,
+                    users.c.min_amount_brl.is_(None),
+                    users.c.min_amount.is_not(None)
+                )
+                .order_by(users.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            values = [{"row_id": row.id, "min_amount_brl": amount_in_brl(row.min_amount)} for row in rows]
+            values = [v for v in values if v["min_amount_brl"] is not None]
+            if values:
+                conn.execute(
+                    update(users).where(users.c.id == bindparam("row_id")),
+                    values
+                )
+            stats["users"] += len(values)
+
+    return stats
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """Bring a database created by an older release up to the current models.
+
+    Runs after ``Base.metadata.create_all`` on every start; each step is a
+    no-op once the schema and data are current.
+    """
+    added = add_missing_columns(engine)
+    if added:
+        logger.info(f"Added columns: {', '.join(added)}")
+    created = create_missing_indexes(engine)
+    if created:
+        logger.info(f"Created indexes: {', '.join(created)}")
+    dropped = drop_obsolete_indexes(engine)
+    if dropped:
+        logger.info(f"Dropped indexes: {', '.join(dropped)}")
+    backfilled = backfill_amounts(engine)
+    if any(backfilled.values()):
+        logger.info(f"Backfilled normalized amounts: {backfilled}")
@@ -0,0 +1,188 @@
+from sqlalchemy import select, update, bindparam
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import List, Dict, Any, Iterable
+from datetime import datetime, time, timedelta
+import logging
+import os
+
+from app.models import Opportunity
+from app.core.amounts import amount_columns
+
+logger = logging.getLogger(__name__)
+
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "500"))
+# Máximo de oportunidades sem vetor enviadas à indexação por execução do pipeline
+INDEX_BACKLOG_LIMIT = int(os.getenv("INDEX_BACKLOG_LIMIT", "5000"))
+
+# Colunas que o pipeline pode escrever; o resto (id, created_at, ...) fica com o banco
+INDEXED_FIELDS = ["id", "title", "description", "category", "type", "region", "amount", "source", "tags"]
+PERSISTED_FIELDS = [
+    "title", "description", "category", "type", "region", "deadline",
+    "amount", "source", "source_url", "relevance_score", "tags", "is_active",
+    "amount_brl", "amount_currency", "amount_periodicity",
+]
+INSERT_DEFAULTS = {**{field: None for field in PERSISTED_FIELDS}, "relevance_score": 0.0, "is_active": True}
+
+
+def closes_at(deadline: datetime) -> datetime:
+    """Moment an opportunity closes: a date-only deadline (00:00) still accepts the whole day."""
+    if deadline.time() == time.min:
+        return deadline + timedelta(days=1)
+    return deadline
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _insert_for(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return pg_insert
+    if dialect == "sqlite":
+        return sqlite_insert
+    raise ValueError(f"Bulk upsert not supported for dialect: {dialect}")
+
+
+def _to_row(opp: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    row = {"external_id": str(opp["external_id"])}
+    for field in PERSISTED_FIELDS:
+        if field in opp:
+            row[field] = opp[field]
+    # Ativa enquanto o prazo não fechou: um prazo prorrogado reabre uma oportunidade expirada
+    if "deadline" in opp:
+        deadline = opp["deadline"]
+        row["is_active"] = opp.get("is_active", True) and (
+            not isinstance(deadline, datetime) or closes_at(deadline) > now
+        )
+    # Colunas numéricas sempre derivadas do texto de amount
+    if "amount" in opp:
+        row.update(amount_columns(opp["amount"]))
+    return row
+
+
+def _is_unchanged(row: Dict[str, Any], existing: Dict[str, Any]) -> bool:
+    return all(existing.get(field) == value for field, value in row.items())
+
+
+def upsert_opportunities(
+    db: Session,
+    opportunities: List[Dict[str, Any]],
+    batch_size: int = UPSERT_BATCH_SIZE
+) -> Dict[str, Any]:
+    """Insert or update opportunities by external_id using INSERT ... ON CONFLICT.
+
+    Rows identical to what is already stored are skipped. Returns the counts,
+    the external_ids that were inserted or updated, and an external_id -> id
+    map so callers can reference the stored rows. Updated rows get their
+    pinecone_id cleared, so ``unindexed_opportunities`` picks them up until
+    their new vector is written. ``is_active`` follows the deadline, and
+    ``inactive`` lists the changed external_ids that were stored closed.
+    """
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0, "ids": {}, "changed": [], "inactive": []}
+    now = datetime.utcnow()
+
+    rows_by_external_id: Dict[str, Dict[str, Any]] = {}
+    for opp in opportunities:
+        if not opp.get("external_id") or not opp.get("title"):
+            stats["skipped"] += 1
+            continue
+        # A última ocorrência de um external_id repetido vence
+        row = _to_row(opp, now)
+        rows_by_external_id[row["external_id"]] = row
+
+    if not rows_by_external_id:
+        return stats
+
+    insert = _insert_for(db)
+    columns = ["external_id"] + PERSISTED_FIELDS
+
+    for batch in _chunks(list(rows_by_external_id.values()), batch_size):
+        external_ids = [row["external_id"] for row in batch]
+        existing = {
+            r.external_id: r._asdict()
+            for r in db.execute(
+                select(Opportunity.id, *[getattr(Opportunity, c) for c in columns])
+                .where(Opportunity.external_id.in_(external_ids))
+            )
+        }
+
+        pending = []
+        for row in batch:
+            current = existing.get(row["external_id"])
+            if current is None:
+                stats["inserted"] += 1
+                base = dict(INSERT_DEFAULTS)
+            elif _is_unchanged(row, current):
+                stats["unchanged"] += 1
+                stats["ids"][row["external_id"]] = current["id"]
+                continue
+            else:
+                stats["updated"] += 1
+                base = {c: current[c] for c in PERSISTED_FIELDS}
+            stats["changed"].append(row["external_id"])
+            # Mesmo conjunto de chaves em todas as linhas para o executemany
+            pending.append({**base, **row, "updated_at": now})
+            if not pending[-1]["is_active"]:
+                stats["inactive"].append(row["external_id"])
+
+        if not pending:
+            continue
+
+        stmt = insert(Opportunity)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Opportunity.external_id],
+            set_={
+                **{c: getattr(stmt.excluded, c) for c in PERSISTED_FIELDS + ["updated_at"]},
+                "pinecone_id": None,
+            },
+        )
+        db.execute(stmt, pending)
+
+        stored = db.execute(
+            select(Opportunity.external_id, Opportunity.id)
+            .where(Opportunity.external_id.in_([row["external_id"] for row in pending]))
+        )
+        stats["ids"].update({external_id: opp_id for external_id, opp_id in stored})
+
+    db.commit()
+    logger.info(
+        f"Persisted opportunities: {stats['inserted']} inserted, "
+        f"{stats['updated']} updated, {stats['unchanged']} unchanged"
+    )
+    return stats
+
+
+def unindexed_opportunities(db: Session, limit: int = INDEX_BACKLOG_LIMIT) -> List[Dict[str, Any]]:
+    """Active opportunities without a stored vector (new, changed or whose embedding/upsert failed)."""
+    rows = db.execute(
+        select(*[getattr(Opportunity, c) for c in INDEXED_FIELDS])
+        .where(Opportunity.is_active == True, Opportunity.pinecone_id.is_(None))
+        .order_by(Opportunity.id)
+        .limit(limit)
+    )
+    return [row._asdict() for row in rows]
+
+
+def set_pinecone_ids(
+    db: Session,
+    pinecone_ids: Dict[int, str],
+    batch_size: int = UPSERT_BATCH_SIZE
+) -> int:
+    """Write back vector ids for stored opportunities in batched UPDATEs."""
+    if not pinecone_ids:
+        return 0
+
+    stmt = (
+        update(Opportunity.__table__)
+        .where(Opportunity.__table__.c.id == bindparam("opp_id"))
+        .values(pinecone_id=bindparam("vector_id"))
+    )
+    params = [{"opp_id": opp_id, "vector_id": vector_id} for opp_id, vector_id in pinecone_ids.items()]
+    for batch in _chunks(params, batch_size):
+        db.execute(stmt, batch)
+    db.commit()
+    return len(params)
@@ -0,0 +1,224 @@
+import pdfplumber
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+
+import httpx
+
+from app.core.cache import get_cache, CACHE_DIR
+from app.core.crawler import AsyncCrawler
+from app.agents.source_extractors import AMOUNT_PATTERN
+
+logger = logging.getLogger(__name__)
+
+PDF_DIR = os.getenv("PDF_DIR", os.path.join(CACHE_DIR, "pdfs"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
+PDF_DESCRIPTION_CHARS = int(os.getenv("PDF_DESCRIPTION_CHARS", "2000"))
+# Downloads vão direto para disco: no máximo PDF_DOWNLOAD_CONCURRENCY arquivos abertos e PDF_MAX_BYTES cada
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(50 * 1024 * 1024)))
+PDF_DOWNLOAD_CONCURRENCY = int(os.getenv("PDF_DOWNLOAD_CONCURRENCY", "4"))
+PDF_CHUNK_SIZE = 64 * 1024
+
+# Um período ("de 01/02/2025 a 10/03/2025") vale pela data final
+DEADLINE_PATTERN = re.compile(
+    r'(?:prazo|data\s+limite|até|inscriç\w+|submiss\w+|encerramento)[^0-9]{0,40}'
+    r'(\d{1,2})/(\d{1,2})/(\d{4})(?:\s*(?:a|até|-|–)\s*(\d{1,2})/(\d{1,2})/(\d{4}))?',
+    re.IGNORECASE
+)
+# Datas precedidas destes termos são o prazo de submissão; as demais podem ser
+# publicação, resultado, recurso ou vigência
+SUBMISSION_PATTERN = re.compile(r'submiss|inscriç|propostas?\b', re.IGNORECASE)
+SUBMISSION_CONTEXT_CHARS = 60
+
+
+def _page_facts(text: str) -> Dict[str, Any]:
+    deadlines = []
+    submission_deadlines = []
+    previous_end = 0
+    for match in DEADLINE_PATTERN.finditer(text):
+        day, month, year = match.group(4, 5, 6) if match.group(4) else match.group(1, 2, 3)
+        # O contexto de uma data não passa da data anterior
+        context_start = max(previous_end, match.start() - SUBMISSION_CONTEXT_CHARS)
+        previous_end = match.end()
+        try:
+            deadline = datetime(int(year), int(month), int(day)).isoformat()
+        except ValueError:
+            continue
+        deadlines.append(deadline)
+        if SUBMISSION_PATTERN.search(text, context_start, match.start(1)):
+            submission_deadlines.append(deadline)
+
+    return {
+        'text': text,
+        'deadlines': deadlines,
+        'submission_deadlines': submission_deadlines,
+        'amounts': [m.group(0) for m in AMOUNT_PATTERN.finditer(text)]
+    }
+
+
+def extract_pdf(path: str, file_hash: str, max_chars: int = PDF_DESCRIPTION_CHARS) -> Dict[str, Any]:
+    """Read a PDF one page at a time, reusing per-page results cached by file hash.
+
+    Only the running summary is kept in memory: each page is released as soon
+    as its text, deadlines and amounts have been extracted. The deadline is the
+    first date near a submission term, or else the first date in the document.
+    """
+    cache = get_cache("pdf_pages")
+    excerpt: List[str] = []
+    excerpt_len = 0
+    deadlines: List[str] = []
+    submission_deadlines: List[str] = []
+    amounts: List[str] = []
+
+    def consume(facts: Dict[str, Any]) -> None:
+        nonlocal excerpt_len
+        if excerpt_len < max_chars and facts['text']:
+            excerpt.append(facts['text'][:max_chars - excerpt_len])
+            excerpt_len += len(excerpt[-1])
+        deadlines.extend(facts['deadlines'])
+        submission_deadlines.extend(facts.get('submission_deadlines', []))
+        amounts.extend(facts['amounts'])
+
+    page_count = cache.get(f"{file_hash}:pages")
+    if page_count is not None and all(f"{file_hash}:{i}" in cache for i in range(page_count)):
+        for i in range(page_count):
+            consume(cache.get(f"{file_hash}:{i}"))
+    else:
+        with pdfplumber.open(path) as pdf:
+            page_count = len(pdf.pages)
+            for i, page in enumerate(pdf.pages):
+                key = f"{file_hash}:{i}"
+                facts = cache.get(key)
+                if facts is None:
+                    facts = _page_facts(page.extract_text() or '')
+                    cache.set(key, facts)
+                page.close()
+                consume(facts)
+        cache.set(f"{file_hash}:pages", page_count)
+
+    return {
+        'file_hash': file_hash,
+        'pages': page_count,
+        'text': '\n'.join(excerpt),
+        'deadline': (submission_deadlines or deadlines or [None])[0],
+        'amount': amounts[0] if amounts else None
+    }
+
+
+async def _download_pdf(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    url: str,
+    max_bytes: int = PDF_MAX_BYTES
+) -> Optional[Dict[str, str]]:
+    """Stream one PDF to PDF_DIR, hashing it on the way; None if it fails, is too big or is not a PDF."""
+    os.makedirs(PDF_DIR, exist_ok=True)
+    async with semaphore:
+        fd, tmp_path = tempfile.mkstemp(dir=PDF_DIR, suffix=".part")
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            head = b''
+            with os.fdopen(fd, 'wb') as f:
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    if int(response.headers.get('content-length') or 0) > max_bytes:
+                        raise ValueError(f"PDF larger than {max_bytes} bytes")
+                    async for chunk in response.aiter_bytes(PDF_CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > max_bytes:
+                            raise ValueError(f"PDF larger than {max_bytes} bytes")
+                        if len(head) < 4:
+                            head += chunk[:4 - len(head)]
+                        digest.update(chunk)
+                        f.write(chunk)
+            if head != b'%PDF':
+                raise ValueError("response is not a PDF")
+
+            file_hash = digest.hexdigest()
+            path = os.path.join(PDF_DIR, f"{file_hash}.pdf")
+            os.replace(tmp_path, path)
+            return {'path': path, 'file_hash': file_hash}
+        except (httpx.HTTPError, ValueError, OSError) as e:
+            logger.error(f"Failed to download PDF {url}: {e}")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+async def ingest_pdfs(
+    opportunities: List[Dict[str, Any]],
+    crawler: Optional[AsyncCrawler] = None,
+    max_workers: int = PDF_WORKERS
+) -> Dict[str, Any]:
+    """Download the edital PDFs linked from opportunities and merge what they contain.
+
+    Each PDF is streamed to disk (bounded in size and in concurrent downloads),
+    so no full body is ever held in memory.
+
+    Deadline and amount from the PDF fill fields the listing left empty, and the
+    beginning of the PDF text is appended to the description so the classifier
+    sees the actual edital. Opportunities are updated in place.
+    """
+    stats = {'pdfs': 0, 'parsed': 0, 'failed': 0}
+    with_pdf = [opp for opp in opportunities if opp.get('pdf_url')]
+    if not with_pdf:
+        return stats
+
+    crawler = crawler or AsyncCrawler()
+    urls = list({opp['pdf_url'] for opp in with_pdf})
+    stats['pdfs'] = len(urls)
+
+    files = {}
+    semaphore = asyncio.Semaphore(PDF_DOWNLOAD_CONCURRENCY)
+    async with crawler.client() as client:
+        downloads = await asyncio.gather(*(_download_pdf(client, semaphore, url) for url in urls))
+    for url, stored in zip(urls, downloads):
+        if stored:
+            files[url] = stored
+        else:
+            stats['failed'] += 1
+
+    if not files:
+        return stats
+
+    loop = asyncio.get_running_loop()
+    results = {}
+    # spawn: um fork herdaria as threads do servidor (e locks que elas seguram)
+    with ProcessPoolExecutor(
+        max_workers=min(max_workers, len(files)),
+        mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        futures = {
+            url: loop.run_in_executor(pool, extract_pdf, f['path'], f['file_hash'])
+            for url, f in files.items()
+        }
+        for url, future in futures.items():
+            try:
+                results[url] = await future
+                stats['parsed'] += 1
+            except Exception as e:
+                logger.error(f"Failed to extract PDF {url}: {e}")
+                stats['failed'] += 1
+
+    for opp in with_pdf:
+        result = results.get(opp['pdf_url'])
+        if not result:
+            continue
+        if not opp.get('deadline') and result['deadline']:
+            opp['deadline'] = datetime.fromisoformat(result['deadline'])
+        if not opp.get('amount') and result['amount']:
+            opp['amount'] = result['amount']
+        if result['text']:
+            opp['description'] = f"{opp.get('description') or ''}\n\n{result['text']}".strip()
+
+    logger.info(f"PDF ingestion: {stats['parsed']}/{stats['pdfs']} editais extracted")
+    return stats
@@ -1,15 +1,30 @@
 from pinecone import Pinecone, ServerlessSpec
 from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
 import os
+import random
+import time
 from dotenv import load_dotenv
 import logging
 
+from app.core.vector_events import VectorChangeNotifier
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Limites da API: até 1000 registros e 2 MB por requisição (com folga)
+UPSERT_MAX_VECTORS = int(os.getenv("PINECONE_UPSERT_MAX_VECTORS", "200"))
+UPSERT_MAX_BYTES = int(os.getenv("PINECONE_UPSERT_MAX_BYTES", str(1_800_000)))
+UPSERT_WORKERS = int(os.getenv("PINECONE_UPSERT_WORKERS", "8"))
+UPSERT_MAX_RETRIES = int(os.getenv("PINECONE_UPSERT_MAX_RETRIES", "3"))
+# Limite de ids por chamada do fetch do Pinecone
+FETCH_BATCH_SIZE = 1000
+
 
-class PineconeClient:
+class PineconeClient(VectorChangeNotifier):
     def __init__(self):
         self.api_key = os.getenv("PINECONE_API_KEY")
         self.index_name = os.getenv("PINECONE_INDEX_NAME", "funding-opportunities")
@@ -45,19 +60,68 @@ class PineconeClient:
             logger.error(f"Failed to initialize Pinecone: {e}")
             self.enabled = False
 
-    def upsert_vectors(self, vectors: List[Dict[str, Any]]) -> bool:
-        """Upsert vectors to Pinecone index"""
+    def _chunk_vectors(self, vectors: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Split vectors so each request stays under the record and payload limits."""
+        chunks: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        current_bytes = 0
+
+        for vector in vectors:
+            size = len(json.dumps(vector, default=str))
+            if current and (len(current) >= UPSERT_MAX_VECTORS or current_bytes + size > UPSERT_MAX_BYTES):
+                chunks.append(current)
+                current, current_bytes = [], 0
+            current.append(vector)
+            current_bytes += size
+
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _upsert_chunk(self, chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+        result = {"ids": [v["id"] for v in chunk], "size": len(chunk), "ok": False, "attempts": 0, "error": None}
+
+        for attempt in range(UPSERT_MAX_RETRIES + 1):
+            result["attempts"] = attempt + 1
+            try:
+                self.index.upsert(vectors=chunk)
+                result["ok"] = True
+                result["error"] = None
+                break
+            except Exception as e:
+                result["error"] = str(e)
+                if attempt < UPSERT_MAX_RETRIES:
+                    delay = 0.5 * 2 ** attempt + random.uniform(0, 0.5)
+                    logger.warning(f"Upsert of {len(chunk)} vectors failed ({e}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+
+        return result
+
+    def upsert_in_chunks(self, vectors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Upsert vectors in parallel chunks; returns one result per chunk."""
         if not self.enabled:
             logger.warning("Pinecone not enabled, skipping vector upsert")
-            return False
+            return []
 
-        try:
-            self.index.upsert(vectors=vectors)
-            logger.info(f"Successfully upserted {len(vectors)} vectors")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to upsert vectors: {e}")
-            return False
+        chunks = self._chunk_vectors(vectors)
+        with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as executor:
+            results = list(executor.map(self._upsert_chunk, chunks))
+
+        upserted = sum(r["size"] for r in results if r["ok"])
+        failed = [r for r in results if not r["ok"]]
+        logger.info(f"Upserted {upserted}/{len(vectors)} vectors in {len(chunks)} chunks")
+        for r in failed:
+            logger.error(f"Failed to upsert chunk of {r['size']} vectors: {r['error']}")
+        self._notify_change([vector_id for r in results if r["ok"] for vector_id in r["ids"]])
+        return results
+
+    async def aupsert_vectors(self, vectors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.upsert_in_chunks, vectors)
+
+    def upsert_vectors(self, vectors: List[Dict[str, Any]]) -> bool:
+        """Upsert vectors to Pinecone index"""
+        results = self.upsert_in_chunks(vectors)
+        return bool(results) and all(r["ok"] for r in results)
 
     def query_vectors(
         self,
@@ -82,6 +146,21 @@ class PineconeClient:
             logger.error(f"Failed to query vectors: {e}")
             return []
 
+    def fetch_vectors(self, ids: List[str]) -> Dict[str, List[float]]:
+        """Fetch stored vector values by id; missing ids are left out."""
+        if not self.enabled or not ids:
+            return {}
+
+        found = {}
+        try:
+            for start in range(0, len(ids), FETCH_BATCH_SIZE):
+                response = self.index.fetch(ids=ids[start:start + FETCH_BATCH_SIZE])
+                for vector_id, vector in response.vectors.items():
+                    found[vector_id] = list(vector.values)
+        except Exception as e:
+            logger.error(f"Failed to fetch vectors: {e}")
+        return found
+
     def delete_vectors(self, ids: List[str]) -> bool:
         """Delete vectors from Pinecone index"""
         if not self.enabled:
@@ -90,6 +169,7 @@ class PineconeClient:
 
         try:
             self.index.delete(ids=ids)
+            self._notify_change(ids)
             logger.info(f"Successfully deleted {len(ids)} vectors")
             return True
         except Exception as e:
@@ -97,5 +177,14 @@ class PineconeClient:
             return False
 
 
+def create_vector_client():
+    """Pick the vector backend from VECTOR_BACKEND (pinecone or local)."""
+    backend = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+    if backend == "local":
+        from app.core.local_vector_index import LocalVectorIndex
+        return LocalVectorIndex()
+    return PineconeClient()
+
+
 # Global instance
-pinecone_client = PineconeClient()
+pinecone_client = create_vector_client()
@@ -6,6 +6,7 @@ from datetime import datetime
 import asyncio
 
 from app.core.crew_manager import crew_manager
+from app.core.user_rankings import rebuild_all_rankings
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +40,7 @@ class TaskScheduler:
         schedule.every().day.at("09:00").do(self._run_daily_notifications)
         schedule.every().monday.at("08:00").do(self._run_weekly_notifications)
         schedule.every().hour.do(self._cleanup_old_data)
+        schedule.every().day.at("03:00").do(self._rebuild_rankings)
         
         logger.info("Scheduled tasks configured")
         
@@ -84,6 +86,15 @@ class TaskScheduler:
         except Exception as e:
             logger.error(f"Weekly notifications failed: {e}")
     
+    def _rebuild_rankings(self):
+        """Recompute every user's materialized ranking"""
+        logger.info("Rebuilding user rankings...")
+        try:
+            result = rebuild_all_rankings()
+            logger.info(f"Ranking rebuild completed: {result}")
+        except Exception as e:
+            logger.error(f"Ranking rebuild failed: {e}")
+    
     def _cleanup_old_data(self):
         """Clean up old data and logs"""
         logger.info("Running data cleanup...")
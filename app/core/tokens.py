@@ -0,0 +1,22 @@
+from functools import lru_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        # Aproximação usual: ~4 caracteres por token
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
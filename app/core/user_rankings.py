@@ -0,0 +1,345 @@
+import numpy as np
+from cachetools import TTLCache
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional, Callable, Iterable, Sequence, Hashable
+from datetime import datetime
+import logging
+import os
+import threading
+
+from app.database import SessionLocal
+from app.models import User, Opportunity, UserRanking
+from app.core.opportunity_store import _insert_for
+from app.core.langchain_rag import rag_system
+from app.core.ranking_engine import (
+    RankingEngine, OpportunityFeatures, ProfileVector, OPPORTUNITY_COLUMNS, ranking_engine
+)
+
+logger = logging.getLogger(__name__)
+
+RANKING_TOP_N = int(os.getenv("RANKING_TOP_N", "500"))
+RANKING_USER_CHUNK = int(os.getenv("RANKING_USER_CHUNK", "200"))
+# Melhores candidatos pelo score de regras que recebem a similaridade com o perfil
+RANKING_SIMILARITY_POOL = int(os.getenv("RANKING_SIMILARITY_POOL", "2000"))
+
+# Rankings calculados na hora (listagens filtradas), reaproveitados pelas páginas seguintes
+LIVE_RANKING_CACHE_SIZE = int(os.getenv("LIVE_RANKING_CACHE_SIZE", "256"))
+LIVE_RANKING_CACHE_TTL = int(os.getenv("LIVE_RANKING_CACHE_TTL", "300"))
+
+# user_id -> pedido de novo rebuild chegou enquanto o atual rodava
+_rebuilds: Dict[int, bool] = {}
+_rebuilds_lock = threading.Lock()
+
+# Campos do usuário usados pelo RankingEngine; mudar um deles exige recalcular o ranking
+PROFILE_FIELDS = [
+    "startup_segment", "startup_trl", "startup_area",
+    "preferred_regions", "preferred_categories", "min_amount",
+]
+# Campos que formam o texto do embedding do perfil (RAGSystem.render_profile);
+# também mudam o ranking, pela similaridade
+EMBEDDED_PROFILE_FIELDS = ["startup_segment", "startup_area", "startup_description"]
+FEATURE_COLUMNS = ["id", *OPPORTUNITY_COLUMNS]
+
+# (user_id, filtros, perfil) -> saída de rank_candidates
+_live_rankings: TTLCache = TTLCache(LIVE_RANKING_CACHE_SIZE, LIVE_RANKING_CACHE_TTL)
+_live_rankings_lock = threading.Lock()
+
+
+def user_profile(user: User) -> Dict[str, Any]:
+    profile = {field: getattr(user, field) for field in PROFILE_FIELDS}
+    profile["startup_description"] = user.startup_description
+    profile["min_amount_brl"] = user.min_amount_brl
+    profile["preferred_regions"] = profile["preferred_regions"] or []
+    profile["preferred_categories"] = profile["preferred_categories"] or []
+    return profile
+
+
+def _active_opportunities(db: Session, ids: Optional[Iterable[int]] = None) -> Dict[str, Sequence[Any]]:
+    """FEATURE_COLUMNS of the active opportunities, one sequence per column."""
+    query = select(*[getattr(Opportunity, c) for c in FEATURE_COLUMNS]).where(Opportunity.is_active == True)
+    if ids is not None:
+        query = query.where(Opportunity.id.in_(list(ids)))
+    rows = db.execute(query).all()
+    # zip(*rows) transpõe em C; sem linhas, cada coluna fica vazia
+    return dict(zip(FEATURE_COLUMNS, zip(*rows))) if rows else {c: () for c in FEATURE_COLUMNS}
+
+
+def _order(ids: np.ndarray, scores: np.ndarray, relevance: np.ndarray) -> np.ndarray:
+    """Row indices in UserRanking order: score, relevance and id, all descending."""
+    return np.lexsort((-ids, -relevance, -scores))
+
+
+def _blend_profile_similarity(profile: Dict[str, Any], ids: np.ndarray, result: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Blend the profile's cosine similarity into ``score`` (60/40, as RankingAgent.profile_ranking).
+
+    Only the best RANKING_SIMILARITY_POOL rows by rule score are looked up,
+    so a rebuild never fetches every stored vector; rows outside the pool or
+    without a vector keep their rule score, as in profile_ranking.
+    """
+    embedding = rag_system.profile_embedding(profile) if rag_system.enabled else None
+    if embedding is None:
+        return result
+
+    pool = result["order"][:RANKING_SIMILARITY_POOL]
+    pool_ids = ids[pool].tolist()
+    similarities = rag_system.similarity_scores(embedding, pool_ids)
+    if not similarities:
+        return result
+
+    similarity = np.array([similarities.get(i, np.nan) for i in pool_ids], dtype=np.float64)
+    known = pool[~np.isnan(similarity)]
+    scores = result["score"].astype(np.float64)
+    scores[known] = np.maximum(similarity[~np.isnan(similarity)], 0.0) * 100 * 0.6 + scores[known] * 0.4
+    return {**result, "score": scores, "order": _order(ids, scores, result["relevance"])}
+
+
+def _score(
+    engine: RankingEngine,
+    features: OpportunityFeatures,
+    ids: np.ndarray,
+    profile: Dict[str, Any]
+) -> Dict[str, np.ndarray]:
+    """Rule score plus profile similarity for every row, with ``order`` as in UserRanking."""
+    result = engine.score(features, ProfileVector(profile))
+    result["order"] = _order(ids, result["score"], result["relevance"])
+    try:
+        return _blend_profile_similarity(profile, ids, result)
+    except Exception as e:
+        logger.error(f"Profile similarity failed, using rule scores: {e}")
+        return result
+
+
+def _write_user_rankings(
+    db: Session,
+    user_id: int,
+    opportunity_ids: np.ndarray,
+    scores: np.ndarray,
+    relevance: np.ndarray,
+    replace: bool
+) -> None:
+    if replace:
+        db.execute(delete(UserRanking).where(UserRanking.user_id == user_id))
+
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": user_id, "opportunity_id": opp_id, "score": score, "relevance": rel, "updated_at": now}
+        for opp_id, score, rel in zip(opportunity_ids.tolist(), scores.tolist(), relevance.tolist())
+    ]
+    stmt = _insert_for(db)(UserRanking)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserRanking.user_id, UserRanking.opportunity_id],
+        set_={c: getattr(stmt.excluded, c) for c in ["score", "relevance", "updated_at"]},
+    )
+    db.execute(stmt, rows)
+
+    if not replace:
+        # Mantém só o top-N do usuário depois de mesclar as oportunidades novas
+        keep = (
+            select(UserRanking.opportunity_id)
+            .where(UserRanking.user_id == user_id)
+            .order_by(UserRanking.score.desc(), UserRanking.relevance.desc(), UserRanking.opportunity_id.desc())
+            .limit(RANKING_TOP_N)
+        )
+        db.execute(delete(UserRanking).where(
+            UserRanking.user_id == user_id,
+            UserRanking.opportunity_id.not_in(keep)
+        ))
+
+
+def _rank_users(
+    db: Session,
+    users: List[User],
+    opportunities: Dict[str, Sequence[Any]],
+    replace: bool,
+    engine: RankingEngine = ranking_engine
+) -> Dict[str, int]:
+    """Score the opportunities for each user and merge (or replace) their rows.
+
+    Opportunities are encoded once for the whole chunk. Each user is written
+    in its own savepoint, so one failing profile does not roll back the rest.
+    A full rebuild (``replace``) stamps ``User.rankings_built_at``, even when
+    there is nothing to rank.
+    """
+    stats = {"users": 0, "failed": 0}
+    features = OpportunityFeatures(opportunities) if opportunities["id"] else None
+    opportunity_ids = np.array(opportunities["id"], dtype=np.int64)
+
+    for user in users:
+        try:
+            with db.begin_nested():
+                if features is None:
+                    if replace:
+                        db.execute(delete(UserRanking).where(UserRanking.user_id == user.id))
+                else:
+                    result = _score(engine, features, opportunity_ids, user_profile(user))
+                    top = result["order"][:RANKING_TOP_N]
+                    _write_user_rankings(
+                        db, user.id, opportunity_ids[top], result["score"][top], result["relevance"][top], replace
+                    )
+                if replace:
+                    user.rankings_built_at = datetime.utcnow()
+            stats["users"] += 1
+        except Exception as e:
+            logger.error(f"Failed to update rankings for user {user.id}: {e}")
+            stats["failed"] += 1
+
+    db.commit()
+    return stats
+
+
+def _for_each_user_chunk(
+    session_factory: Callable[[], Session],
+    work: Callable[[Session, List[User]], Dict[str, int]],
+    chunk_size: int = RANKING_USER_CHUNK
+) -> Dict[str, int]:
+    """Run ``work`` over active users in id order, one session and commit per chunk."""
+    totals = {"users": 0, "failed": 0, "chunks": 0}
+    last_id = 0
+    while True:
+        db = session_factory()
+        users = None
+        try:
+            users = db.execute(
+                select(User)
+                .where(User.is_active == True, User.id > last_id)
+                .order_by(User.id)
+                .limit(chunk_size)
+            ).scalars().all()
+            if not users:
+                break
+            last_id = users[-1].id
+            stats = work(db, users)
+            totals["users"] += stats["users"]
+            totals["failed"] += stats["failed"]
+        except Exception as e:
+            logger.error(f"Ranking chunk after user {last_id} failed: {e}")
+            db.rollback()
+            if users is None:
+                break
+            totals["failed"] += len(users)
+        finally:
+            db.close()
+        totals["chunks"] += 1
+    return totals
+
+
+def rebuild_user_rankings(db: Session, users: List[User]) -> Dict[str, int]:
+    """Recompute the full top-N of the given users (e.g. after a profile change)."""
+    return _rank_users(db, users, _active_opportunities(db), replace=True)
+
+
+def request_user_rebuild(user_id: int, session_factory: Callable[[], Session] = SessionLocal) -> None:
+    """Rebuild one user's ranking in its own session (meant for a background task).
+
+    A request that arrives while the same user is being rebuilt is folded
+    into one more pass after the current one, so the last profile wins.
+    """
+    with _rebuilds_lock:
+        if user_id in _rebuilds:
+            _rebuilds[user_id] = True
+            return
+        _rebuilds[user_id] = False
+
+    try:
+        while True:
+            db = session_factory()
+            try:
+                user = db.get(User, user_id)
+                if user is not None and user.is_active:
+                    rebuild_user_rankings(db, [user])
+            finally:
+                db.close()
+            with _rebuilds_lock:
+                if not _rebuilds[user_id]:
+                    del _rebuilds[user_id]
+                    return
+                _rebuilds[user_id] = False
+    except Exception as e:
+        logger.error(f"Failed to rebuild rankings for user {user_id}: {e}")
+        with _rebuilds_lock:
+            _rebuilds.pop(user_id, None)
+
+
+def rank_candidates(query, user: User, engine: RankingEngine = ranking_engine) -> Dict[str, np.ndarray]:
+    """Score the opportunities selected by an ORM ``query`` for ``user`` on the fly.
+
+    Scores match the materialized ranking (profile similarity included) and
+    ``order`` follows it: score, relevance and id, all descending.
+    """
+    rows = query.with_entities(*[getattr(Opportunity, c) for c in FEATURE_COLUMNS]).all()
+    if not rows:
+        empty = np.zeros(0)
+        return {"id": empty.astype(np.int64), "score": empty, "relevance": empty, "order": empty.astype(np.int64)}
+
+    columns = dict(zip(FEATURE_COLUMNS, zip(*rows)))
+    ids = np.array(columns["id"], dtype=np.int64)
+    return {"id": ids, **_score(engine, OpportunityFeatures(columns), ids, user_profile(user))}
+
+
+def live_ranking(query, user: User, filters: Hashable) -> Dict[str, np.ndarray]:
+    """``rank_candidates`` for ``query``, cached per user, ``filters`` and profile.
+
+    The next pages of a filtered listing reuse the scores of the first one
+    instead of loading and scoring every candidate again. Entries expire
+    after LIVE_RANKING_CACHE_TTL and are dropped when opportunities change.
+    """
+    profile = user_profile(user)
+    key = (user.id, filters, tuple(
+        tuple(value) if isinstance(value, list) else value for value in profile.values()
+    ))
+    with _live_rankings_lock:
+        ranked = _live_rankings.get(key)
+    if ranked is None:
+        ranked = rank_candidates(query, user)
+        with _live_rankings_lock:
+            _live_rankings[key] = ranked
+    return ranked
+
+
+def clear_live_rankings() -> None:
+    with _live_rankings_lock:
+        _live_rankings.clear()
+
+
+def update_rankings(
+    opportunity_ids: Iterable[int],
+    session_factory: Callable[[], Session] = SessionLocal
+) -> Dict[str, int]:
+    """Merge new or changed opportunities into every user's top-N.
+
+    Opportunities that are no longer active are removed from all rankings.
+    Rows that fell out of a top-N are only recovered by the periodic rebuild.
+    """
+    opportunity_ids = list(opportunity_ids)
+    if not opportunity_ids:
+        return {"users": 0, "failed": 0, "chunks": 0}
+    clear_live_rankings()
+
+    db = session_factory()
+    try:
+        opportunities = _active_opportunities(db, opportunity_ids)
+        inactive = set(opportunity_ids) - set(opportunities["id"])
+        if inactive:
+            db.execute(delete(UserRanking).where(UserRanking.opportunity_id.in_(inactive)))
+            db.commit()
+    finally:
+        db.close()
+
+    if not opportunities["id"]:
+        return {"users": 0, "failed": 0, "chunks": 0}
+    return _for_each_user_chunk(session_factory, lambda db, users: _rank_users(db, users, opportunities, replace=False))
+
+
+def rebuild_all_rankings(session_factory: Callable[[], Session] = SessionLocal) -> Dict[str, int]:
+    """Recompute every user's top-N from scratch, one chunk of users at a time."""
+    clear_live_rankings()
+    db = session_factory()
+    try:
+        opportunities = _active_opportunities(db)
+    finally:
+        db.close()
+
+    stats = _for_each_user_chunk(session_factory, lambda db, users: _rank_users(db, users, opportunities, replace=True))
+    logger.info(f"Rebuilt rankings for {stats['users']} users ({stats['failed']} failed) in {stats['chunks']} chunks")
+    return stats
@@ -0,0 +1,22 @@
+from typing import Callable, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+ChangeListener = Callable[[List[str]], None]
+
+
+class VectorChangeNotifier:
+    """Mixin for vector clients: call registered listeners with the ids of vectors that changed."""
+
+    def add_change_listener(self, listener: ChangeListener) -> None:
+        self.__dict__.setdefault("_change_listeners", []).append(listener)
+
+    def _notify_change(self, ids: List[str]) -> None:
+        if not ids:
+            return
+        for listener in self.__dict__.get("_change_listeners", []):
+            try:
+                listener(ids)
+            except Exception as e:
+                logger.error(f"Vector change listener failed: {e}")
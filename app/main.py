@@ -11,11 +11,14 @@ from app.models import Base
 from app.routers import auth, opportunities, users, agents, search
 from app.core.crew_manager import CrewManager
 from app.core.scheduler import start_scheduler
+from app.core.expiry import start_expiry_engine
+from app.core.migrations import upgrade_schema
 
 load_dotenv()
 
-# Create tables
+# Create tables, then the columns, indexes and backfills create_all skips on existing tables
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 app = FastAPI(
     title="FundingAI API",
@@ -42,9 +45,10 @@ app.include_router(opportunities.router, prefix="/api/opportunities", tags=["opp
 app.include_router(agents.router, prefix="/api/agents", tags=["agents"])
 app.include_router(search.router, prefix="/api/search", tags=["search"])
 
-# Initialize CrewAI and scheduler
+# Initialize CrewAI, scheduler and deadline expiry
 crew_manager = CrewManager()
 start_scheduler()
+start_expiry_engine()
 
 @app.get("/")
 async def root():
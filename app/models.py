@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Float, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Float, ForeignKey, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -26,7 +26,11 @@ class User(Base):
     preferred_regions = Column(JSON)
     preferred_categories = Column(JSON)
     min_amount = Column(String)
+    # min_amount convertido por app.core.amounts
+    min_amount_brl = Column(Float)
     alert_frequency = Column(String, default="weekly")
+    # Último rebuild completo do UserRanking; vazio enquanto o ranking não reflete o perfil
+    rankings_built_at = Column(DateTime)
     
     # Relationships
     favorites = relationship("UserFavorite", back_populates="user")
@@ -44,6 +48,11 @@ class Opportunity(Base):
     region = Column(String)
     deadline = Column(DateTime)
     amount = Column(String)
+    # Valor normalizado de ``amount`` (app.core.amounts), anualizado quando é
+    # mensal/anual; vazio quando não dá para ler
+    amount_brl = Column(Float)
+    amount_currency = Column(String(3))
+    amount_periodicity = Column(String)  # total, monthly, yearly
     source = Column(String)
     source_url = Column(String)
     relevance_score = Column(Float, default=0.0)
@@ -58,6 +67,35 @@ class Opportunity(Base):
     # Relationships
     favorites = relationship("UserFavorite", back_populates="opportunity")
 
+    __table_args__ = (
+        # Um índice por filtro de igualdade da listagem, já na ordem por prazo; com
+        # vários filtros o planejador usa um e confere os outros sem ordenar
+        Index("ix_opportunities_category_deadline", "is_active", "category", "deadline", "id"),
+        Index("ix_opportunities_type_deadline", "is_active", "type", "deadline", "id"),
+        Index("ix_opportunities_region_deadline", "is_active", "region", "deadline", "id"),
+        # Listagem sem filtros (ordem por prazo) e janela do ExpiryEngine
+        Index("ix_opportunities_active_deadline", "is_active", "deadline", "id"),
+        # Filtro de valor mínimo como range scan
+        Index("ix_opportunities_active_amount", "is_active", "amount_brl"),
+    )
+
+class UserRanking(Base):
+    """Materialized top-N ranking of active opportunities for each user."""
+    __tablename__ = "user_rankings"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    opportunity_id = Column(Integer, ForeignKey("opportunities.id"), primary_key=True)
+    score = Column(Float, nullable=False)
+    # Desempate do RankingEngine (RelevanceScorerTool)
+    relevance = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Leitura por usuário na ordem do ranking (keyset)
+        Index("ix_user_rankings_order", "user_id", "score", "relevance", "opportunity_id"),
+        Index("ix_user_rankings_opportunity", "opportunity_id"),
+    )
+
 class UserFavorite(Base):
     __tablename__ = "user_favorites"
     
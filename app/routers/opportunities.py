@@ -1,114 +1,215 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from sqlalchemy import and_, tuple_
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime
 import asyncio
+import base64
+import json
 
 from app.database import get_db
-from app.models import User, Opportunity, UserFavorite
+from app.models import User, Opportunity, UserFavorite, UserRanking
 from app.schemas import Opportunity as OpportunitySchema
 from app.core.security import get_current_user
 from app.core.crew_manager import crew_manager
+from app.core.user_rankings import live_ranking, request_user_rebuild, user_profile
 
 router = APIRouter()
 
+def _encode_cursor(opp: Opportunity) -> str:
+    payload = {"deadline": opp.deadline.isoformat() if opp.deadline else None, "id": opp.id}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def _decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        deadline = datetime.fromisoformat(payload["deadline"]) if payload["deadline"] else None
+        return deadline, int(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _encode_ranking_cursor(score: float, relevance: float, opportunity_id: int) -> str:
+    payload = {"score": score, "relevance": relevance, "id": opportunity_id}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def _decode_ranking_cursor(cursor: str) -> Tuple[float, float, int]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(payload["score"]), float(payload["relevance"]), int(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _opportunity_to_dict(opp: Opportunity, is_favorite: bool = False) -> Dict[str, Any]:
+    return {
+        'id': opp.id,
+        'external_id': opp.external_id,
+        'title': opp.title,
+        'description': opp.description,
+        'category': opp.category,
+        'type': opp.type,
+        'region': opp.region,
+        'deadline': opp.deadline,
+        'amount': opp.amount,
+        'amount_brl': opp.amount_brl,
+        'amount_currency': opp.amount_currency,
+        'amount_periodicity': opp.amount_periodicity,
+        'source': opp.source,
+        'source_url': opp.source_url,
+        'relevance_score': opp.relevance_score or 0.0,
+        'tags': opp.tags or [],
+        'is_active': opp.is_active,
+        'created_at': opp.created_at,
+        'updated_at': opp.updated_at,
+        'is_favorite': is_favorite
+    }
+
+def _favorite_ids(db: Session, user: User, page: List[Opportunity]) -> set:
+    if not page:
+        return set()
+    return {
+        opportunity_id for (opportunity_id,) in db.query(UserFavorite.opportunity_id).filter(
+            UserFavorite.user_id == user.id,
+            UserFavorite.opportunity_id.in_([opp.id for opp in page])
+        )
+    }
+
+def _deadline_page(query, cursor: Optional[str], limit: int) -> List[Opportunity]:
+    """Up to ``limit + 1`` rows in (deadline, id) order, opportunities without a deadline last.
+
+    Each part is its own index range seek: dated rows after the cursor by a
+    row-value comparison, then the undated tail by id.
+    """
+    last_deadline, last_id = _decode_cursor(cursor) if cursor else (None, None)
+    page: List[Opportunity] = []
+    if cursor is None or last_deadline is not None:
+        dated = query.filter(Opportunity.deadline.is_not(None))
+        if last_deadline is not None:
+            dated = dated.filter(tuple_(Opportunity.deadline, Opportunity.id) > tuple_(last_deadline, last_id))
+        page = dated.order_by(Opportunity.deadline.asc(), Opportunity.id.asc()).limit(limit + 1).all()
+    if len(page) <= limit:
+        undated = query.filter(Opportunity.deadline.is_(None))
+        if cursor is not None and last_deadline is None:
+            undated = undated.filter(Opportunity.id > last_id)
+        page += undated.order_by(Opportunity.id.asc()).limit(limit + 1 - len(page)).all()
+    return page
+
+def _ranking_response(db: Session, user: User, response: Response, rows: List[tuple], limit: int):
+    """Page of (opportunity, score, relevance) rows in ranking order, with the next cursor."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        opp, score, relevance = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_ranking_cursor(score, relevance, opp.id)
+
+    favorite_ids = _favorite_ids(db, user, [opp for opp, _, _ in rows])
+    return [
+        {**_opportunity_to_dict(opp, opp.id in favorite_ids), 'relevance_score': score}
+        for opp, score, _ in rows
+    ]
+
+def _ranked_page(db: Session, query, user: User, response: Response, cursor: Optional[str], limit: int):
+    """One page of the user's materialized ranking: an index range scan on UserRanking."""
+    ranking_key = (UserRanking.score, UserRanking.relevance, UserRanking.opportunity_id)
+    query = query.join(UserRanking, and_(
+        UserRanking.opportunity_id == Opportunity.id,
+        UserRanking.user_id == user.id
+    ))
+    if cursor:
+        query = query.filter(tuple_(*ranking_key) < tuple_(*_decode_ranking_cursor(cursor)))
+
+    rows = (
+        query.add_columns(UserRanking.score, UserRanking.relevance)
+        .order_by(*(column.desc() for column in ranking_key))
+        .limit(limit + 1)
+        .all()
+    )
+    return _ranking_response(db, user, response, rows, limit)
+
+def _live_ranked_page(db: Session, query, user: User, filters: tuple, response: Response, cursor: Optional[str], limit: int):
+    """Same order and cursor as ``_ranked_page``, scoring the candidates of ``query`` now.
+
+    The scores are cached per user and ``filters``, so later pages only
+    apply the cursor.
+    """
+    ranked = live_ranking(query, user, filters)
+    ids, score, relevance, order = ranked["id"], ranked["score"], ranked["relevance"], ranked["order"]
+    if cursor:
+        last_score, last_relevance, last_id = _decode_ranking_cursor(cursor)
+        after = (score < last_score) | ((score == last_score) & (
+            (relevance < last_relevance) | ((relevance == last_relevance) & (ids < last_id))
+        ))
+        order = order[after[order]]
+    order = order[:limit + 1]
+
+    page_ids = ids[order].tolist()
+    by_id = {opp.id: opp for opp in db.query(Opportunity).filter(Opportunity.id.in_(page_ids))}
+    rows = [
+        (by_id[opp_id], s, r)
+        for opp_id, s, r in zip(page_ids, score[order].tolist(), relevance[order].tolist())
+        if opp_id in by_id
+    ]
+    return _ranking_response(db, user, response, rows, limit)
+
 @router.get("/", response_model=List[OpportunitySchema])
 async def get_opportunities(
+    response: Response,
+    background_tasks: BackgroundTasks,
     category: Optional[str] = Query(None),
     type: Optional[str] = Query(None),
     region: Optional[str] = Query(None),
+    min_amount: Optional[float] = Query(None, ge=0, description="Minimum amount in BRL (per year for recurring amounts)"),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(20, le=100),
+    sort: str = Query("deadline", pattern="^(deadline|relevance)$"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Get mock opportunities for demo
-    mock_opportunities = [
-        {
-            'id': 1,
-            'external_id': 'finep_2024_001',
-            'title': 'FINEP - Subvenção Econômica para Startups de IA',
-            'description': 'Programa de apoio financeiro para startups desenvolvedoras de soluções de inteligência artificial com foco em impacto social.',
-            'category': 'Inteligência Artificial',
-            'type': 'edital',
-            'region': 'Brasil',
-            'deadline': '2024-03-15T00:00:00',
-            'amount': 'R$ 500.000',
-            'source': 'FINEP',
-            'source_url': 'https://www.finep.gov.br/chamadas-publicas',
-            'relevance_score': 95.0,
-            'tags': ['IA', 'Startup', 'Inovação', 'Subvenção'],
-            'is_active': True,
-            'created_at': '2024-01-15T10:00:00',
-            'updated_at': '2024-01-15T10:00:00',
-            'is_favorite': False
-        },
-        {
-            'id': 2,
-            'external_id': 'cnpq_2024_002',
-            'title': 'CNPq - Bolsa de Desenvolvimento Tecnológico',
-            'description': 'Bolsa para desenvolvimento de tecnologias disruptivas em healthtech com duração de 24 meses.',
-            'category': 'Saúde',
-            'type': 'bolsa',
-            'region': 'Brasil',
-            'deadline': '2024-02-28T00:00:00',
-            'amount': 'R$ 3.000/mês',
-            'source': 'CNPq',
-            'source_url': 'https://www.gov.br/cnpq/pt-br',
-            'relevance_score': 87.0,
-            'tags': ['Healthtech', 'Bolsa', 'P&D'],
-            'is_active': True,
-            'created_at': '2024-01-14T15:00:00',
-            'updated_at': '2024-01-14T15:00:00',
-            'is_favorite': True
-        },
-        {
-            'id': 3,
-            'external_id': 'eu_2024_003',
-            'title': 'Horizonte Europa - Green Deal',
-            'description': 'Funding para startups europeias focadas em soluções de sustentabilidade e energia limpa.',
-            'category': 'Energia',
-            'type': 'investimento',
-            'region': 'Europa',
-            'deadline': '2024-04-10T00:00:00',
-            'amount': '€ 2.000.000',
-            'source': 'União Europeia',
-            'source_url': 'https://ec.europa.eu/info/horizon-europe_en',
-            'relevance_score': 78.0,
-            'tags': ['Sustentabilidade', 'Europa', 'Green Deal'],
-            'is_active': True,
-            'created_at': '2024-01-13T09:00:00',
-            'updated_at': '2024-01-13T09:00:00',
-            'is_favorite': False
-        }
-    ]
-    
-    # Apply filters
-    filtered_opportunities = mock_opportunities
-    
+    """List active opportunities one page at a time.
+
+    ``sort=deadline`` orders by deadline and scores each page for the user;
+    ``sort=relevance`` reads the user's materialized ranking (UserRanking)
+    in score order. That table only holds the user's top-N, so filtered
+    requests, and users whose ranking is being rebuilt, are scored on the
+    fly instead. ``min_amount`` (in BRL) keeps only opportunities whose
+    normalized amount is known and at least that value; monthly amounts
+    count as twelve payments. The next page is
+    requested by passing the X-Next-Cursor response header back as ``cursor``.
+    """
+    query = db.query(Opportunity).filter(Opportunity.is_active == True)
+
     if category:
-        filtered_opportunities = [opp for opp in filtered_opportunities if opp['category'] == category]
+        query = query.filter(Opportunity.category == category)
     
     if type:
-        filtered_opportunities = [opp for opp in filtered_opportunities if opp['type'] == type]
+        query = query.filter(Opportunity.type == type)
     
     if region:
-        filtered_opportunities = [opp for opp in filtered_opportunities if opp['region'] == region]
-    
-    # Rank opportunities based on user profile
-    user_profile = {
-        'startup_segment': current_user.startup_segment,
-        'startup_trl': current_user.startup_trl,
-        'startup_area': current_user.startup_area,
-        'preferred_regions': current_user.preferred_regions or [],
-        'preferred_categories': current_user.preferred_categories or [],
-        'min_amount': current_user.min_amount
-    }
-    
-    ranked_opportunities = await crew_manager.run_ranking_pipeline(
-        filtered_opportunities, 
-        user_profile
-    )
-    
-    return ranked_opportunities[:limit]
+        query = query.filter(Opportunity.region == region)
+
+    if min_amount is not None:
+        query = query.filter(Opportunity.amount_brl >= min_amount)
+
+    if sort == "relevance":
+        filters = (category, type, region, min_amount)
+        if current_user.rankings_built_at is None:
+            # O rebuild roda depois da resposta; até lá a página é calculada na hora
+            background_tasks.add_task(request_user_rebuild, current_user.id)
+        elif not any(value is not None for value in filters):
+            return _ranked_page(db, query, current_user, response, cursor, limit)
+        # Carregar e pontuar os candidatos (e buscar vetores) bloqueia; fica fora do event loop
+        return await asyncio.to_thread(_live_ranked_page, db, query, current_user, filters, response, cursor, limit)
+
+    page = _deadline_page(query, cursor, limit)
+    if len(page) > limit:
+        page = page[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(page[-1])
+
+    favorite_ids = _favorite_ids(db, current_user, page)
+
+    # O ranking só anota os scores da página; a ordem continua sendo a do prazo
+    items = [_opportunity_to_dict(opp, opp.id in favorite_ids) for opp in page]
+    ranked = await crew_manager.run_ranking_pipeline(items, user_profile(current_user))
+    by_id = {item['id']: item for item in ranked}
+    return [by_id.get(item['id'], item) for item in items]
 
 @router.get("/{opportunity_id}", response_model=OpportunitySchema)
 def get_opportunity(
@@ -116,29 +217,16 @@ def get_opportunity(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Mock single opportunity
-    if opportunity_id == 1:
-        return {
-            'id': 1,
-            'external_id': 'finep_2024_001',
-            'title': 'FINEP - Subvenção Econômica para Startups de IA',
-            'description': 'Programa de apoio financeiro para startups desenvolvedoras de soluções de inteligência artificial com foco em impacto social.',
-            'category': 'Inteligência Artificial',
-            'type': 'edital',
-            'region': 'Brasil',
-            'deadline': '2024-03-15T00:00:00',
-            'amount': 'R$ 500.000',
-            'source': 'FINEP',
-            'source_url': 'https://www.finep.gov.br/chamadas-publicas',
-            'relevance_score': 95.0,
-            'tags': ['IA', 'Startup', 'Inovação', 'Subvenção'],
-            'is_active': True,
-            'created_at': '2024-01-15T10:00:00',
-            'updated_at': '2024-01-15T10:00:00',
-            'is_favorite': False
-        }
-    
-    raise HTTPException(status_code=404, detail="Opportunity not found")
+    opportunity = db.query(Opportunity).filter(Opportunity.id == opportunity_id).first()
+    if opportunity is None:
+        raise HTTPException(status_code=404, detail="Opportunity not found")
+
+    is_favorite = db.query(UserFavorite.id).filter(
+        UserFavorite.user_id == current_user.id,
+        UserFavorite.opportunity_id == opportunity_id
+    ).first() is not None
+
+    return _opportunity_to_dict(opportunity, is_favorite)
 
 @router.post("/{opportunity_id}/favorite")
 def toggle_favorite(
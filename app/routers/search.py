@@ -1,5 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Optional, Dict, Any
+import json
 
 from app.models import User
 from app.schemas import SearchQuery, SearchResponse
@@ -26,6 +28,31 @@ async def semantic_search(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+@router.post("/semantic/stream")
+async def semantic_search_stream(
+    search_query: SearchQuery,
+    current_user: User = Depends(get_current_user)
+):
+    """Semantic search over Server-Sent Events.
+
+    Sends a ``results`` event with the ranked opportunities, then one
+    ``token`` event per chunk of the generated answer, then ``done``.
+    """
+    async def events():
+        async for event in crew_manager.stream_semantic_search(
+            query=search_query.query,
+            filters=search_query.filters,
+            top_k=search_query.limit
+        ):
+            data = json.dumps(event["data"], ensure_ascii=False, default=str)
+            yield f"event: {event['event']}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/suggestions")
 def get_search_suggestions(
     q: Optional[str] = None,
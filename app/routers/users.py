@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -6,6 +6,8 @@ from app.database import get_db
 from app.models import User
 from app.schemas import User as UserSchema, UserUpdate
 from app.core.security import get_current_user
+from app.core.user_rankings import PROFILE_FIELDS, EMBEDDED_PROFILE_FIELDS, request_user_rebuild
+from app.core.amounts import amount_in_brl
 
 router = APIRouter()
 
@@ -16,17 +18,31 @@ def get_current_user_profile(current_user: User = Depends(get_current_user)):
 @router.put("/me", response_model=UserSchema)
 def update_user_profile(
     user_update: UserUpdate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Update user fields
     update_data = user_update.dict(exclude_unset=True)
+    # O embedding do perfil fica em cache por conteúdo: o texto novo gera outra chave
+    ranking_changed = any(
+        (field in PROFILE_FIELDS or field in EMBEDDED_PROFILE_FIELDS) and getattr(current_user, field) != value
+        for field, value in update_data.items()
+    )
     
     for field, value in update_data.items():
         setattr(current_user, field, value)
+    if "min_amount" in update_data:
+        current_user.min_amount_brl = amount_in_brl(update_data["min_amount"])
+    # O ranking materializado depende do perfil: a listagem usa o caminho ao vivo até o rebuild
+    if ranking_changed:
+        current_user.rankings_built_at = None
     
     db.commit()
     db.refresh(current_user)
+
+    if ranking_changed:
+        background_tasks.add_task(request_user_rebuild, current_user.id)
     
     return current_user
 
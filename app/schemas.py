@@ -34,6 +34,7 @@ class User(UserBase):
     preferred_regions: Optional[List[str]] = None
     preferred_categories: Optional[List[str]] = None
     min_amount: Optional[str] = None
+    min_amount_brl: Optional[float] = None
     alert_frequency: Optional[str] = None
 
     class Config:
@@ -68,6 +69,9 @@ class Opportunity(OpportunityBase):
     external_id: str
     relevance_score: float
     tags: Optional[List[str]] = None
+    amount_brl: Optional[float] = None
+    amount_currency: Optional[str] = None
+    amount_periodicity: Optional[str] = None
     is_active: bool
     created_at: datetime
     updated_at: datetime
@@ -88,6 +92,14 @@ class SearchResponse(BaseModel):
     total: int
     response_text: Optional[str] = None
 
+# Classification schemas
+class OpportunityClassification(BaseModel):
+    index: int
+    category: str
+    type: str
+    keywords: List[str] = []
+    relevance: float
+
 # Agent schemas
 class AgentStatus(BaseModel):
     name: str
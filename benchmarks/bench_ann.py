@@ -0,0 +1,88 @@
+"""
+Recall@k and QPS of the IVF mode of LocalVectorIndex against exact search.
+
+Uses synthetic vectors unless --vectors points to a .npy matrix (e.g.
+exported opportunity embeddings). The synthetic set imitates text
+embeddings rather than well separated blobs: every vector shares a common
+direction, topics overlap, and the per-row noise is larger than the
+distance between neighbouring clusters. Queries are held-out rows, not
+perturbed copies of indexed ones. --noise 0.5 --topics 0 gives the easy
+blob data, where any nprobe reaches recall 1.0.
+
+Run with: python -m benchmarks.bench_ann [--n 100000] [--dim 1536] [--nprobe 4,8,16,32]
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.core.local_vector_index import LocalVectorIndex
+
+
+def synthetic(n, dim, clusters=1000, topics=50, noise=4.0, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    if topics:
+        # Clusters de um mesmo tema ficam próximos, e todos dividem uma direção comum
+        topic_centers = rng.standard_normal((topics, dim)).astype(np.float32)
+        centers = topic_centers[rng.integers(topics, size=clusters)] + 0.6 * centers
+        centers += 1.5 * rng.standard_normal(dim).astype(np.float32)
+    labels = rng.integers(clusters, size=n)
+    data = centers[labels]
+    for start in range(0, n, 8192):
+        data[start:start + 8192] += noise * rng.standard_normal((min(8192, n - start), dim)).astype(np.float32)
+    return data
+
+
+def run_queries(index, queries, k):
+    start = time.perf_counter()
+    results = [[m["id"] for m in index.query_vectors(q.tolist(), top_k=k)] for q in queries]
+    return results, len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", help=".npy file with one vector per row")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", default="4,8,16,32")
+    parser.add_argument("--noise", type=float, default=4.0)
+    parser.add_argument("--topics", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.vectors:
+        data = np.load(args.vectors).astype(np.float32)
+    else:
+        data = synthetic(args.n + args.queries, args.dim, topics=args.topics, noise=args.noise)
+    rng = np.random.default_rng(1)
+    held_out = np.zeros(len(data), dtype=bool)
+    held_out[rng.choice(len(data), args.queries, replace=False)] = True
+    queries, data = data[held_out], data[~held_out]
+    vectors = [{"id": str(i), "values": row, "metadata": {}} for i, row in enumerate(data)]
+
+    with tempfile.TemporaryDirectory() as exact_dir, tempfile.TemporaryDirectory() as ivf_dir:
+        exact = LocalVectorIndex(exact_dir, ann="")
+        exact.upsert_vectors(vectors)
+        truth, exact_qps = run_queries(exact, queries, args.k)
+        print(f"{len(data)} x {data.shape[1]}, k={args.k}")
+        print(f"exact          recall 1.000  {exact_qps:>9.1f} QPS")
+
+        start = time.perf_counter()
+        ivf = LocalVectorIndex(ivf_dir, ann="ivf", nlist=args.nlist)
+        ivf.upsert_vectors(vectors)
+        print(f"ivf build      {time.perf_counter() - start:.1f}s, {len(ivf.ann.centroids)} lists")
+
+        for nprobe in (int(p) for p in args.nprobe.split(",")):
+            ivf.ann.nprobe = nprobe
+            found, qps = run_queries(ivf, queries, args.k)
+            recall = np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+            print(f"ivf nprobe={nprobe:<3} recall {recall:.3f}  {qps:>9.1f} QPS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Latency of the keyword-only (BM25) search path over a synthetic catalog.
+
+Run with: python -m benchmarks.bench_bm25 [--docs 20000] [--queries 500]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.core.bm25_index import BM25Index
+
+AGENCIES = ["FINEP", "CNPq", "FAPESP", "CAPES", "BNDES", "EMBRAPII", "SEBRAE", "FAPEMIG"]
+WORDS = (
+    "inovação tecnologia saúde agricultura energia startup pesquisa subvenção bolsa "
+    "chamada pública edital programa apoio empresas desenvolvimento sustentabilidade "
+    "inteligência artificial biotecnologia indústria digital fomento projeto recursos "
+    "mestrado doutorado pós-doutorado investimento aceleração incubadora"
+).split()
+
+
+def synthetic_catalog(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        agency = rng.choice(AGENCIES)
+        number = f"{rng.randint(1, 30):02d}/{rng.randint(2019, 2025)}"
+        yield {
+            "id": i,
+            "title": f"Edital {agency} {number} - " + " ".join(rng.choices(WORDS, k=5)),
+            "description": " ".join(rng.choices(WORDS, k=60)),
+            "tags": rng.sample(WORDS, 3),
+            "category": rng.choice(["Tecnologia", "Saúde", "Agronegócio"]),
+            "source": agency,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    index = BM25Index()
+    start = time.perf_counter()
+    index.add_documents(list(synthetic_catalog(args.docs)))
+    print(f"indexed {len(index)} docs in {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(1)
+    queries = [
+        f"Edital {rng.choice(AGENCIES)} {rng.randint(1, 30):02d}/{rng.randint(2019, 2025)}"
+        if i % 2 else " ".join(rng.choices(WORDS, k=3))
+        for i in range(args.queries)
+    ]
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, top_k=10)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    print(f"search: median {statistics.median(timings):.2f} ms, p95 {timings[int(len(timings) * 0.95)]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Embedding throughput against a local stub of the OpenAI embeddings API.
+
+Compares one embed_documents call over all texts with the token-batched,
+concurrent RAGSystem.create_embeddings.
+
+Run with: python -m benchmarks.bench_embeddings [--texts 2000] [--latency 0.2]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_openai import OpenAIEmbeddings
+
+from app.core.langchain_rag import RAGSystem
+
+DIMENSION = 1536
+
+
+def stub_server(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            time.sleep(latency)
+            payload = json.dumps({
+                "object": "list",
+                "model": body.get("model", "stub"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": [random.random() for _ in range(DIMENSION)]}
+                    for i in range(len(inputs))
+                ],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per stub request")
+    args = parser.parse_args()
+
+    server = stub_server(args.latency)
+    embeddings = OpenAIEmbeddings(
+        api_key="stub",
+        base_url=f"http://127.0.0.1:{server.server_port}/v1",
+        check_embedding_ctx_length=False,
+        chunk_size=2048
+    )
+    texts = [f"Edital {i}: apoio a startups de tecnologia " * random.randint(5, 60) for i in range(args.texts)]
+
+    start = time.perf_counter()
+    embeddings.embed_documents(texts)
+    single = time.perf_counter() - start
+
+    rag = RAGSystem(embeddings=embeddings, llm=object())
+    start = time.perf_counter()
+    result = rag.create_embeddings(texts)
+    batched = time.perf_counter() - start
+
+    print(f"single call: {len(texts) / single:>10.1f} texts/s")
+    print(f"batched:     {len(texts) / batched:>10.1f} texts/s  "
+          f"({sum(e is not None for e in result)} ok, {len(rag.last_embedding_failures)} failed batches)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
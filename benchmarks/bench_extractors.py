@@ -0,0 +1,57 @@
+"""
+Throughput and accuracy of the per-source extractors on recorded pages.
+
+Fixtures are pairs <source>.html / <source>.json in one directory, where the
+JSON holds the expected opportunities (at least title and external_id). The
+default is the set checked by tests/test_source_extractors.py.
+
+Run with: python -m benchmarks.bench_extractors [path/to/fixtures] [--repeat 20]
+"""
+
+import argparse
+import json
+import pathlib
+import time
+
+from app.agents.source_extractors import EXTRACTORS
+
+FIXTURES_DIR = pathlib.Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "extractors"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("fixtures_dir", nargs="?", default=str(FIXTURES_DIR))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    fixtures = pathlib.Path(args.fixtures_dir)
+    for source, extractor in sorted(EXTRACTORS.items()):
+        page_path = fixtures / f"{source}.html"
+        expected_path = fixtures / f"{source}.json"
+        if not page_path.exists() or not expected_path.exists():
+            print(f"{source:<10} no fixture")
+            continue
+
+        page = page_path.read_bytes()
+        expected = json.loads(expected_path.read_text(encoding="utf-8"))
+        base_url = f"https://{source}.example/"
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            extracted = extractor(page, base_url)
+        pages_per_second = args.repeat / (time.perf_counter() - start)
+
+        expected_ids = {item["external_id"] for item in expected}
+        extracted_ids = {item["external_id"] for item in extracted}
+        matched = len(expected_ids & extracted_ids)
+        precision = matched / len(extracted_ids) if extracted_ids else 0.0
+        recall = matched / len(expected_ids) if expected_ids else 0.0
+
+        print(
+            f"{source:<10} {pages_per_second:>8.1f} pages/s  "
+            f"precision {precision:.2f}  recall {recall:.2f}  ({len(extracted)} extracted)"
+        )
+
+
+if __name__ == "__main__":
+    main()
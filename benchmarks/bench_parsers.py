@@ -0,0 +1,40 @@
+"""
+Pages/second of each HTML extraction backend over saved source pages.
+
+Run with: python -m benchmarks.bench_parsers path/to/saved_pages [--repeat 5]
+"""
+
+import argparse
+import pathlib
+import time
+
+from app.core.html_extract import available_backends, listing_items, page_text
+
+
+def bench(label, fn, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            fn(page)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(pages) * repeat / elapsed:>10.1f} pages/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pages_dir", help="directory with saved *.html source pages")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = [path.read_bytes() for path in sorted(pathlib.Path(args.pages_dir).glob("*.html"))]
+    if not pages:
+        raise SystemExit(f"No .html files found in {args.pages_dir}")
+
+    print(f"{len(pages)} pages, {sum(len(p) for p in pages) / 1024:.0f} KiB, repeat={args.repeat}")
+    for backend in available_backends():
+        bench(f"full DOM ({backend})", lambda page: page_text(page, backend, max_chars=None), pages, args.repeat)
+        bench(f"listing only ({backend})", lambda page: listing_items(page, backend), pages, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Memory and recall of the quantized storage modes of LocalVectorIndex.
+
+For float32, float16 and int8 storage reports the bytes a query scans,
+recall@k against float32 search (with and without float32 re-scoring) and QPS.
+
+Run with: python -m benchmarks.bench_quantization [--n 50000] [--dim 1536] [--rescore 4]
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from app.core.local_vector_index import LocalVectorIndex
+from benchmarks.bench_ann import synthetic, run_queries
+
+
+def recall(found, truth):
+    return np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", help=".npy file with one vector per row")
+    parser.add_argument("--n", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, default=4)
+    args = parser.parse_args()
+
+    data = np.load(args.vectors).astype(np.float32) if args.vectors else synthetic(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    queries = data[rng.choice(len(data), args.queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    vectors = [{"id": str(i), "values": row, "metadata": {}} for i, row in enumerate(data)]
+    print(f"{len(data)} x {data.shape[1]}, k={args.k}")
+
+    truth = None
+    for mode in ("", "float16", "int8"):
+        with tempfile.TemporaryDirectory() as path:
+            index = LocalVectorIndex(path, ann="", quantization=mode, rescore=args.rescore)
+            index.upsert_vectors(vectors)
+            scanned = index.codes if index.codes is not None else index.matrix
+            scanned_bytes = scanned.nbytes + (index.scales.nbytes if mode == "int8" else 0)
+            found, qps = run_queries(index, queries, args.k)
+            truth = truth or found
+            full_bytes = os.path.getsize(index._matrix_path)
+
+            line = f"{mode or 'float32':<8} scan {scanned_bytes / 2**20:>8.1f} MiB ({scanned_bytes / full_bytes:>4.0%})"
+            line += f"  recall {recall(found, truth):.3f}  {qps:>8.1f} QPS"
+            if mode:
+                index.rescore = 1
+                raw, _ = run_queries(index, queries, args.k)
+                line += f"  (no re-scoring: recall {recall(raw, truth):.3f})"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
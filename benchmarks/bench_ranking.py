@@ -0,0 +1,116 @@
+"""
+Throughput of RankingEngine against the per-opportunity text round trip
+through ProfileMatcherTool / RelevanceScorerTool, and whether both give the
+same ordering (profile match first, relevance as tie-break). The engine is
+timed from columns (the user_rankings path), per profile with the
+opportunities already encoded (each user after the first in a chunk) and
+from dicts (RankingAgent).
+
+Run with: python -m benchmarks.bench_ranking [--opportunities 5000]
+"""
+
+import argparse
+import random
+import re
+import time
+from datetime import datetime, timedelta
+
+from app.agents.ranking_agent import ProfileMatcherTool, RelevanceScorerTool
+from app.core.ranking_engine import RankingEngine, OpportunityFeatures, ProfileVector, OPPORTUNITY_COLUMNS
+
+CATEGORIES = ["Tecnologia", "Saúde", "Agronegócio", "Energia", "Educação"]
+REGIONS = ["Brasil", "São Paulo", "Minas Gerais", "Europa", "Internacional"]
+AMOUNTS = ["R$ 50 mil", "R$ 2 milhões", "R$ 500.000", "€ 1 million", ""]
+SOURCES = ["FINEP", "CNPq", "FAPESP", "CAPES", "União Europeia", "Aceleradora X"]
+PROFILE = {
+    "startup_segment": "Tecnologia",
+    "startup_trl": 6,
+    "startup_area": "IA",
+    "preferred_regions": ["São Paulo", "Brasil"],
+    "preferred_categories": ["Tecnologia"],
+    "min_amount": "R$ 100 mil",
+}
+SCORE = re.compile(r"(\d+)/100")
+
+
+def fixtures(n, seed=0):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    return [{
+        "id": i,
+        "title": f"Oportunidade {i}",
+        "category": rng.choice(CATEGORIES),
+        "type": "edital",
+        "region": rng.choice(REGIONS),
+        "amount": rng.choice(AMOUNTS),
+        "source": rng.choice(SOURCES),
+        "created_at": now - timedelta(days=rng.randint(0, 30)),
+    } for i in range(n)]
+
+
+def legacy_rank(opportunities, profile):
+    matcher, scorer = ProfileMatcherTool(), RelevanceScorerTool()
+    scored = []
+    for opp in opportunities:
+        text = f"""
+        PERFIL:
+        Segmento: {profile['startup_segment']}
+        TRL: {profile['startup_trl']}
+        Regiões Preferidas: {', '.join(profile['preferred_regions'])}
+        Valor Mínimo: {profile['min_amount']}
+
+        OPORTUNIDADE:
+        Categoria: {opp['category']}
+        Região: {opp['region']}
+        Valor: {opp['amount']}
+        Fonte: {opp['source']}
+        """
+        match = int(SCORE.search(matcher.run(text)).group(1))
+        relevance = int(SCORE.search(scorer.run(text)).group(1))
+        scored.append((-match, -relevance, opp["id"]))
+    return [opp_id for _, _, opp_id in sorted(scored)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--opportunities", type=int, default=5000)
+    args = parser.parse_args()
+
+    opportunities = fixtures(args.opportunities)
+    columns = {c: [opp[c] if c in opp else None for opp in opportunities] for c in OPPORTUNITY_COLUMNS}
+    engine = RankingEngine()
+    profile = ProfileVector(PROFILE)
+
+    start = time.perf_counter()
+    legacy = legacy_rank(opportunities, PROFILE)
+    legacy_time = time.perf_counter() - start
+
+    # Caminho do user_rankings: colunas do banco, ordem e scores como arrays
+    start = time.perf_counter()
+    order = engine.rank_order(OpportunityFeatures(columns), profile)["order"]
+    engine_time = time.perf_counter() - start
+
+    # user_rankings codifica as oportunidades uma vez por lote e só pontua por usuário
+    features = OpportunityFeatures(columns)
+    start = time.perf_counter()
+    engine.rank_order(features, profile)
+    profile_time = time.perf_counter() - start
+
+    # Caminho do RankingAgent: dicts de entrada e cópias com o score na saída
+    start = time.perf_counter()
+    ranked = engine.rank(opportunities, PROFILE)
+    records_time = time.perf_counter() - start
+
+    same = legacy == [opportunities[i]["id"] for i in order.tolist()] == [opp["id"] for opp in ranked]
+    print(f"{len(opportunities)} opportunities")
+    print(f"legacy tools    {legacy_time * 1000:>9.1f} ms  {len(opportunities) / legacy_time:>12.0f} opp/s")
+    print(f"engine columns  {engine_time * 1000:>9.1f} ms  {len(opportunities) / engine_time:>12.0f} opp/s")
+    print(f"engine profile  {profile_time * 1000:>9.1f} ms  {len(opportunities) / profile_time:>12.0f} opp/s")
+    print(f"engine records  {records_time * 1000:>9.1f} ms  {len(opportunities) / records_time:>12.0f} opp/s")
+    print(f"speedup {legacy_time / engine_time:.0f}x (columns), {legacy_time / profile_time:.0f}x (profile), "
+          f"{legacy_time / records_time:.0f}x (records), "
+          f"same ordering: {same}")
+
+
+if __name__ == "__main__":
+    main()
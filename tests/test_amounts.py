@@ -0,0 +1,28 @@
+import pytest
+
+from app.core.amounts import parse_amount
+
+RATES = {"BRL": 1.0, "USD": 5.0, "EUR": 5.5}
+
+
+@pytest.mark.parametrize("text, amount, currency, periodicity, amount_brl", [
+    ("R$ 500.000", 500_000, "BRL", "total", 500_000),
+    ("Até R$ 2 milhões", 2_000_000, "BRL", "total", 2_000_000),
+    ("€ 1,5 milhão", 1_500_000, "EUR", "total", 8_250_000),
+    ("R$ 3.000/mês", 3_000, "BRL", "monthly", 36_000),
+    ("US$ 50k per year", 50_000, "USD", "yearly", 250_000),
+])
+def test_parse_amount(text, amount, currency, periodicity, amount_brl):
+    parsed = parse_amount(text, RATES)
+    assert parsed == {"amount": amount, "currency": currency, "amount_brl": amount_brl, "periodicity": periodicity}
+
+
+def test_monthly_amount_is_compared_per_year():
+    # Bolsa de R$ 3.000/mês paga R$ 36 mil no ano: passa de um mínimo de R$ 30 mil
+    assert parse_amount("R$ 3.000/mês", RATES)["amount_brl"] >= parse_amount("R$ 30 mil", RATES)["amount_brl"]
+    assert parse_amount("R$ 3.000/mês", RATES)["amount_brl"] < parse_amount("R$ 100 mil", RATES)["amount_brl"]
+
+
+def test_unreadable_amount():
+    assert parse_amount("a combinar", RATES) is None
+    assert parse_amount("€ 100 mil", {"BRL": 1.0}) is None
@@ -0,0 +1,26 @@
+from diskcache import Cache
+
+from app.core.answer_cache import AnswerCache
+
+
+def _answer_cache(tmp_path):
+    return AnswerCache(cache=Cache(str(tmp_path / "answers")), index=Cache(str(tmp_path / "answer_index")))
+
+
+def test_float_metadata_ids_are_invalidated_by_integer_id(tmp_path):
+    cache = _answer_cache(tmp_path)
+    # Pinecone devolve opportunity_id dos metadados como float
+    cache.set("model", "bolsas de pesquisa", [5.0, 7.0], "resposta")
+
+    assert cache.get("model", "Bolsas  de pesquisa", [5, 7]) == "resposta"
+    assert cache.invalidate([5]) == 1
+    assert cache.get("model", "bolsas de pesquisa", [5.0, 7.0]) is None
+
+
+def test_invalidate_leaves_unrelated_answers(tmp_path):
+    cache = _answer_cache(tmp_path)
+    cache.set("model", "editais", [1, 2], "a")
+    cache.set("model", "editais", [3], "b")
+
+    assert cache.invalidate([2]) == 1
+    assert cache.get("model", "editais", [3]) == "b"
@@ -0,0 +1,97 @@
+import asyncio
+from collections import Counter
+
+import httpx
+from diskcache import Cache
+
+from app.core.crawler import AsyncCrawler
+from app.core.http_cache import HttpCache, MISS, REVALIDATED
+
+
+def _crawler(handler, **kwargs):
+    kwargs.setdefault("backoff_base", 0)
+    return AsyncCrawler(transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_requests_are_limited_per_host_but_hosts_run_together():
+    in_flight = Counter()
+    peak = Counter()
+
+    async def handler(request):
+        host = request.url.host
+        in_flight[host] += 1
+        in_flight["total"] += 1
+        peak[host] = max(peak[host], in_flight[host])
+        peak["total"] = max(peak["total"], in_flight["total"])
+        await asyncio.sleep(0.01)
+        in_flight[host] -= 1
+        in_flight["total"] -= 1
+        return httpx.Response(200, content=b"ok")
+
+    sources = {f"{host}{i}": f"https://{host}.example/{i}" for host in ("finep", "cnpq") for i in range(6)}
+    results = asyncio.run(_crawler(handler, per_host_limit=2).crawl(sources))
+
+    assert all(result["status_code"] == 200 for result in results.values())
+    assert peak["finep.example"] == 2 and peak["cnpq.example"] == 2
+    assert peak["total"] == 4
+
+
+def test_processed_page_is_revalidated_with_etag(tmp_path):
+    cache = HttpCache(cache=Cache(str(tmp_path)))
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"ETag": '"v1"'}, content=b"<html>editais</html>")
+
+    url = "https://finep.example/chamadas"
+    first = asyncio.run(_crawler(handler, cache=cache).fetch_urls([url]))[0]
+    assert first["cache_status"] == MISS and first["changed"]
+
+    # Antes da confirmação o corpo ainda é necessário: nada de validadores
+    asyncio.run(_crawler(handler, cache=cache).fetch_urls([url]))
+    cache.mark_processed(url)
+    revalidated = asyncio.run(_crawler(handler, cache=cache).fetch_urls([url]))[0]
+
+    assert seen == [None, None, '"v1"']
+    assert revalidated["status_code"] == 304 and revalidated["error"] is None
+    assert revalidated["cache_status"] == REVALIDATED
+    assert not revalidated["changed"] and revalidated["processed"]
+
+
+def test_transient_errors_are_retried_and_client_errors_are_not():
+    calls = Counter()
+
+    def handler(request):
+        calls[request.url.path] += 1
+        if request.url.path == "/flaky" and calls["/flaky"] == 1:
+            return httpx.Response(503)
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        if request.url.path == "/down":
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, content=b"ok")
+
+    flaky, missing, down = asyncio.run(_crawler(handler, max_retries=2).fetch_urls([
+        "https://cnpq.example/flaky", "https://cnpq.example/missing", "https://cnpq.example/down"
+    ]))
+
+    assert flaky["status_code"] == 200 and flaky["error"] is None and flaky["attempts"] == 2
+    assert missing["status_code"] == 404 and missing["error"] and missing["attempts"] == 1
+    assert down["status_code"] is None and "connection refused" in down["error"] and down["attempts"] == 3
+
+
+def test_total_timeout_cancels_slow_pages():
+    async def handler(request):
+        if request.url.path == "/slow":
+            await asyncio.sleep(5)
+        return httpx.Response(200, content=b"ok")
+
+    fast, slow = asyncio.run(_crawler(handler, total_timeout=0.2).fetch_urls([
+        "https://capes.example/fast", "https://capes.example/slow"
+    ]))
+
+    assert fast["status_code"] == 200
+    assert slow["error"] == "total timeout exceeded" and slow["content"] == b""
@@ -0,0 +1,30 @@
+from diskcache import Cache
+
+from app.core.http_cache import HttpCache, HIT, MISS, REVALIDATED
+
+URL = "https://finep.example/chamadas"
+HEADERS = {"ETag": '"v1"'}
+
+
+def test_parsed_text_does_not_mark_page_processed(tmp_path):
+    cache = HttpCache(cache=Cache(str(tmp_path)))
+    assert cache.update(URL, 200, HEADERS, b"<html>1</html>")["cache_status"] == MISS
+    cache.store_parsed(URL, "texto")
+
+    result = cache.update(URL, 200, HEADERS, b"<html>1</html>")
+    assert result == {"cache_status": HIT, "parsed": "texto", "processed": False}
+    # Sem confirmação a coleta ainda precisa do corpo, então nada de 304
+    assert cache.conditional_headers(URL) == {}
+
+
+def test_mark_processed_enables_revalidation_until_body_changes(tmp_path):
+    cache = HttpCache(cache=Cache(str(tmp_path)))
+    cache.update(URL, 200, HEADERS, b"<html>1</html>")
+    cache.mark_processed(URL)
+
+    assert cache.conditional_headers(URL) == {"If-None-Match": '"v1"'}
+    assert cache.update(URL, 304, {}, b"") == {"cache_status": REVALIDATED, "parsed": None, "processed": True}
+
+    changed = cache.update(URL, 200, {"ETag": '"v2"'}, b"<html>2</html>")
+    assert changed["cache_status"] == MISS and not changed["processed"]
+    assert cache.conditional_headers(URL) == {}
@@ -0,0 +1,50 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app.core.migrations import upgrade_schema
+from app.models import Base
+
+# Esquema anterior às colunas de valor normalizado e aos índices da listagem
+OLD_SCHEMA = [
+    """CREATE TABLE users (
+        id INTEGER PRIMARY KEY, email VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL, name VARCHAR NOT NULL,
+        is_active BOOLEAN, created_at DATETIME, startup_name VARCHAR, startup_segment VARCHAR,
+        startup_trl INTEGER, startup_area VARCHAR, startup_description TEXT, preferred_regions JSON,
+        preferred_categories JSON, min_amount VARCHAR, alert_frequency VARCHAR
+    )""",
+    """CREATE TABLE opportunities (
+        id INTEGER PRIMARY KEY, external_id VARCHAR, title VARCHAR NOT NULL, description TEXT,
+        category VARCHAR, type VARCHAR, region VARCHAR, deadline DATETIME, amount VARCHAR,
+        source VARCHAR, source_url VARCHAR, relevance_score FLOAT, tags JSON, is_active BOOLEAN,
+        created_at DATETIME, updated_at DATETIME, pinecone_id VARCHAR
+    )""",
+    "CREATE INDEX ix_opportunities_deadline ON opportunities (deadline)",
+    "INSERT INTO users (id, email, hashed_password, name, min_amount) VALUES (1, 'a@b.c', 'x', 'A', 'R$ 100 mil')",
+    "INSERT INTO opportunities (id, title, amount, is_active) VALUES (1, 'Bolsa', 'R$ 3.000/mês', 1)",
+    "INSERT INTO opportunities (id, title, amount, is_active) VALUES (2, 'Edital', 'a combinar', 1)",
+]
+
+
+def test_upgrade_schema_adds_columns_indexes_and_backfills(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.exec_driver_sql(statement)
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    # Uma segunda execução não tem nada a fazer
+    upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        assert {c.name for c in table.columns} <= {c["name"] for c in inspector.get_columns(table.name)}
+        assert {i.name for i in table.indexes} <= {i["name"] for i in inspector.get_indexes(table.name)}
+    assert "ix_opportunities_deadline" not in {i["name"] for i in inspector.get_indexes("opportunities")}
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT id, amount_brl, amount_currency, amount_periodicity FROM opportunities ORDER BY id"
+        )).all()
+        min_amount_brl = conn.execute(text("SELECT min_amount_brl FROM users")).scalar()
+    assert [tuple(row) for row in rows] == [(1, 36000.0, "BRL", "monthly"), (2, None, None, None)]
+    assert min_amount_brl == 100000.0
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base
+from app.core.opportunity_store import upsert_opportunities, unindexed_opportunities, set_pinecone_ids
+
+
+def _session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def _opportunity(external_id, **fields):
+    return {"external_id": external_id, "title": f"Edital {external_id}", "amount": "R$ 100 mil", **fields}
+
+
+def test_rows_without_vector_stay_in_the_backlog(tmp_path):
+    db = _session(tmp_path)
+    stats = upsert_opportunities(db, [_opportunity("a"), _opportunity("b")])
+    # Só "a" ganhou vetor; "b" falhou no embedding
+    set_pinecone_ids(db, {stats["ids"]["a"]: f"opp_{stats['ids']['a']}"})
+
+    # Na execução seguinte nada mudou, mas "b" continua pendente
+    again = upsert_opportunities(db, [_opportunity("a"), _opportunity("b")])
+    assert again["unchanged"] == 2
+    assert [row["id"] for row in unindexed_opportunities(db)] == [stats["ids"]["b"]]
+
+
+def test_updated_row_needs_a_new_vector(tmp_path):
+    db = _session(tmp_path)
+    stats = upsert_opportunities(db, [_opportunity("a")])
+    set_pinecone_ids(db, {stats["ids"]["a"]: "opp_1"})
+    assert unindexed_opportunities(db) == []
+
+    upsert_opportunities(db, [_opportunity("a", description="novo texto")])
+    assert [row["description"] for row in unindexed_opportunities(db)] == ["novo texto"]
+
+
+def test_extended_deadline_reopens_an_expired_row(tmp_path):
+    db = _session(tmp_path)
+    past = datetime.utcnow() - timedelta(days=3)
+    stats = upsert_opportunities(db, [_opportunity("a", deadline=past)])
+    assert stats["inactive"] == ["a"]
+    assert unindexed_opportunities(db) == []
+
+    stats = upsert_opportunities(db, [_opportunity("a", deadline=past + timedelta(days=30))])
+    assert stats["updated"] == 1 and stats["inactive"] == []
+    assert [row["id"] for row in unindexed_opportunities(db)] == [stats["ids"]["a"]]
+
+
+def test_date_only_deadline_is_open_all_day(tmp_path):
+    db = _session(tmp_path)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    stats = upsert_opportunities(db, [_opportunity("a", deadline=today)])
+    assert stats["inactive"] == []
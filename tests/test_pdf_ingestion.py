@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip("pdfplumber")
+
+from app.core.pdf_ingestion import _page_facts
+
+
+def test_submission_deadline_preferred_over_later_dates():
+    facts = _page_facts(
+        "Publicação até 01/02/2025. Prazo para submissão de propostas: até 15/03/2025. "
+        "Resultado até 30/06/2025. Vigência até 31/12/2027."
+    )
+    assert facts["submission_deadlines"] == ["2025-03-15T00:00:00"]
+
+
+def test_period_counts_by_its_last_day():
+    facts = _page_facts("Inscrições de 01/02/2025 a 10/03/2025. Resultado até 01/05/2025")
+    assert facts["deadlines"] == ["2025-03-10T00:00:00", "2025-05-01T00:00:00"]
+    assert facts["submission_deadlines"] == ["2025-03-10T00:00:00"]
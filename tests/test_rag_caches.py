@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from diskcache import Cache
+
+from app.core import langchain_rag
+from app.core.answer_cache import AnswerCache
+from app.core.embedding_cache import EmbeddingCache
+from app.core.langchain_rag import RAGSystem
+
+OPPORTUNITIES = [
+    {"id": 1, "title": "Edital Saúde Digital", "category": "Saúde"},
+    {"id": 2, "title": "Bolsa de Inovação", "category": "Energia"},
+]
+DOCS = [{"id": "opp_1", "metadata": {"opportunity_id": 1.0, "title": "Edital Saúde Digital"}}]
+
+
+class FakeEmbeddings:
+    model = "fake-embeddings"
+
+    def __init__(self):
+        self.documents = []
+        self.queries = []
+
+    def embed_documents(self, texts):
+        self.documents.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [1.0, 0.0]
+
+
+class FakeLLM:
+    model_name = "fake-llm"
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return f" resposta {self.calls} "
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    monkeypatch.setattr(langchain_rag, "pinecone_client", SimpleNamespace(enabled=True, add_change_listener=lambda listener: None))
+    return RAGSystem(
+        embeddings=FakeEmbeddings(),
+        llm=FakeLLM(),
+        embedding_cache=EmbeddingCache(cache=Cache(str(tmp_path / "embeddings"))),
+        answer_cache=AnswerCache(cache=Cache(str(tmp_path / "answers")), index=Cache(str(tmp_path / "answer_index")))
+    )
+
+
+def test_cached_document_embeddings_skip_the_embedder(rag):
+    first = rag.process_documents(OPPORTUNITIES)
+    assert len(rag.embeddings.documents) == 2
+
+    changed = [OPPORTUNITIES[0], {**OPPORTUNITIES[1], "title": "Bolsa de Inovação 2025"}]
+    second = rag.process_documents(changed)
+
+    # Só o texto alterado volta ao provedor
+    assert rag.embeddings.documents[2:] == [rag.render_document(changed[1])]
+    assert second[0]["values"] == first[0]["values"]
+    assert [v["id"] for v in second] == ["opp_1", "opp_2"]
+
+
+def test_query_embedding_is_cached_by_normalized_query(rag):
+    assert rag.create_query_embedding("Editais de Saúde") == [1.0, 0.0]
+    assert rag.create_query_embedding("  editais  de saúde") == [1.0, 0.0]
+
+    assert rag.embeddings.queries == ["Editais de Saúde"]
+    assert rag.query_cache_counts["embedding_hits"] == 1
+
+
+def test_answer_cache_hit_until_context_opportunity_changes(rag):
+    assert rag.generate_response("editais de saúde", DOCS) == "resposta 1"
+    assert rag.generate_response("Editais de  saúde", DOCS) == "resposta 1"
+    assert rag.llm.calls == 1
+
+    assert rag.answer_cache.invalidate([1]) == 1
+    assert rag.generate_response("editais de saúde", DOCS) == "resposta 2"
+
+    # Um upsert do vetor da oportunidade também descarta a resposta
+    rag._on_index_change(["opp_1"])
+    assert rag.generate_response("editais de saúde", DOCS) == "resposta 3"
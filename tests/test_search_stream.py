@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("langchain")
+pytest.importorskip("crewai")
+
+from diskcache import Cache
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import crew_manager as crew_module
+from app.core.answer_cache import AnswerCache
+from app.core.embedding_cache import EmbeddingCache
+from app.core.langchain_rag import RAGSystem
+from app.core.security import get_current_user
+from app.models import User
+from app.routers import search
+
+DOCS = [{"id": "opp_7", "score": 0.9, "metadata": {"opportunity_id": 7.0, "title": "Edital Saúde Digital"}}]
+RESULTS = [{"id": 7, "title": "Edital Saúde Digital"}]
+
+
+class FakeEmbeddings:
+    model = "fake-embeddings"
+
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+class FakeStreamingLLM:
+    model_name = "fake-llm"
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = 0
+
+    async def astream(self, prompt):
+        self.calls += 1
+        for chunk in self.chunks:
+            yield chunk
+
+    def invoke(self, prompt):
+        return "".join(self.chunks)
+
+
+def _events(body):
+    events = []
+    for frame in body.split("\n\n"):
+        if not frame:
+            continue
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    llm = FakeStreamingLLM(["O edital ", "de saúde ", "fecha em maio."])
+    rag = RAGSystem(
+        embeddings=FakeEmbeddings(),
+        llm=llm,
+        embedding_cache=EmbeddingCache(cache=Cache(str(tmp_path / "embeddings"))),
+        answer_cache=AnswerCache(cache=Cache(str(tmp_path / "answers")), index=Cache(str(tmp_path / "answer_index")))
+    )
+    monkeypatch.setattr(crew_module, "rag_system", rag)
+    monkeypatch.setattr(crew_module.crew_manager, "_retrieve", lambda query, filters, top_k: (DOCS, RESULTS))
+
+    app = FastAPI()
+    app.include_router(search.router, prefix="/search")
+    app.dependency_overrides[get_current_user] = lambda: User(id=1, email="a@b.com", name="A")
+    return TestClient(app), llm
+
+
+def test_stream_sends_results_then_each_chunk_then_done(client):
+    test_client, llm = client
+    response = test_client.post("/search/semantic/stream", json={"query": "saúde", "limit": 5})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert _events(response.text) == [
+        ("results", {"query": "saúde", "results": RESULTS, "total": 1}),
+        ("token", {"text": "O edital "}),
+        ("token", {"text": "de saúde "}),
+        ("token", {"text": "fecha em maio."}),
+        ("done", {}),
+    ]
+    assert llm.calls == 1
+
+
+def test_repeated_question_is_streamed_from_the_answer_cache(client):
+    test_client, llm = client
+    test_client.post("/search/semantic/stream", json={"query": "saúde", "limit": 5})
+    response = test_client.post("/search/semantic/stream", json={"query": "Saúde ", "limit": 5})
+
+    tokens = [data["text"] for event, data in _events(response.text) if event == "token"]
+    assert tokens == ["O edital de saúde fecha em maio."]
+    assert _events(response.text)[-1] == ("done", {})
+    assert llm.calls == 1
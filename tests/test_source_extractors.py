@@ -0,0 +1,34 @@
+import json
+import pathlib
+from datetime import datetime
+
+import pytest
+
+from app.agents.source_extractors import EXTRACTORS, _external_id
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures" / "extractors"
+
+
+def _expected(source):
+    items = json.loads((FIXTURES / f"{source}.json").read_text(encoding="utf-8"))
+    for item in items:
+        item["deadline"] = datetime.strptime(item["deadline"], "%Y-%m-%d") if item["deadline"] else None
+    return items
+
+
+@pytest.mark.parametrize("source", sorted(EXTRACTORS))
+def test_extractor_matches_recorded_page(source):
+    page = (FIXTURES / f"{source}.html").read_bytes()
+    assert EXTRACTORS[source](page, f"https://{source}.example/") == _expected(source)
+
+
+def test_external_id_distinguishes_same_call_number():
+    first = _external_id("finep", "Programa A - Chamada Pública nº 04/2024", "https://finep.example/a")
+    second = _external_id("finep", "Programa B - Chamada Pública nº 04/2024", "https://finep.example/b")
+    assert first != second
+    assert first.startswith("finep_04_2024_")
+
+
+def test_external_id_distinguishes_cards_without_link():
+    base_url = "https://finep.example/"
+    assert _external_id("finep", "Encomenda A", base_url) != _external_id("finep", "Encomenda B", base_url)